@@ -13,6 +13,7 @@ NUMBER_OF_INTERSECTIONS = 1
 MIN = 5
 MAX = 6
 OUTPUT_FILE = "BasicIntersectionGraph.csv"
+CONFIRMATION_WAIT = 5  # sec waited on commits before printing progress
 
 
 # Opens the output file and writes the results in it for each data point
@@ -69,13 +70,13 @@ def run_experiment(peers: list, total_tx: int):
         for t in submit_tx:
             submit_tx[t][0].submit(submit_tx[t][1])
         start_confirmed = time.time()
-        confirmed = False
-        while not confirmed:
+        unconfirmed = dict(submit_tx)
+        while len(unconfirmed) > 0:
             print('.', end='', flush=True)
-            confirmed = True
-            for t in submit_tx:
-                if submit_tx[t][0].get_tx(submit_tx[t][1]) != '999':
-                    confirmed = False
+            # woken by block commits instead of reading every key over and over
+            for t in list(unconfirmed.keys()):
+                if unconfirmed[t][0].wait_for_txs([unconfirmed[t][1]], CONFIRMATION_WAIT)[0] is not None:
+                    del unconfirmed[t]
 
         confirmation_delays.append(time.time() - start_confirmed)
     print()
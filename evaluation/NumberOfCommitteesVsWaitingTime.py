@@ -1,14 +1,17 @@
 from src.util import make_intersecting_committees_on_host
+from src.util import make_container_pool, release_intersecting_committees
 from src.structures import Transaction
 from src.SawtoothPBFT import sawtooth_container_log_to
 from src.Intersection import intersection_log_to
 from src.SmartShardPeer import smart_shard_peer_log_to
 from src.api.api_util import get_plain_text
+from src.api.constants import TRANSACTIONS, WAIT_TIMEOUT, CONFIRMED, WAITED
 from pathlib import Path
 import time
 from random import choice
 import argparse
 import requests
+import json
 import gc
 
 # defaults
@@ -50,12 +53,14 @@ def make_graph_data(outfile: str, min: int, max: int, number_of_intersections: i
 def get_avg_for(number_of_committees: int, number_of_intersections: int, experiments: int, total_tx: int):
     waiting_time = []
 
+    containers = make_container_pool()  # containers are reset and reused between experiments
     for e in range(experiments):
         print("Setting up experiment {}".format(e))
-        peers = make_intersecting_committees_on_host(number_of_committees, number_of_intersections)
+        peers = make_intersecting_committees_on_host(number_of_committees, number_of_intersections, pool=containers)
         results = run_experiment(peers, total_tx)
         waiting_time += results["waitingTime"]
         print("Cleaning up experiment {}".format(e))
+        release_intersecting_committees(peers, containers)
         del peers
         gc.collect()
 
@@ -88,17 +93,31 @@ def run_experiment(peers: dict, total_tx: int):
             # show that experiment is running
             if time.time() % 30:
                 print(" .", end='', flush=True)
-        check_submitted_tx(waiting_time, submitted_tx, list(peers.keys())[0])
+        # wait for commits until the next submission is due
+        check_submitted_tx(waiting_time, submitted_tx, list(peers.keys())[0], max(next_sub - time.time(), 0))
     print()
     return {"waitingTime": waiting_time}
 
 
-def check_submitted_tx(waiting, sub, port):
-    url = URL_HOST.format(ip=IP_ADDRESS, port=str(port) + "/get/")
+# long polls the peer for the submitted transactions (sub is {time submitted: tx}) for up to timeout sec
+def check_submitted_tx(waiting, sub, port, timeout):
+    if len(sub) == 0:
+        time.sleep(timeout)
+        return
+    url = URL_HOST.format(ip=IP_ADDRESS, port=str(port) + "/wait/")
+    submitted = list(sub.keys())
+    start = time.time()
+    response = get_plain_text(requests.post(url, json={TRANSACTIONS: [sub[tx].to_json() for tx in submitted],
+                                                       WAIT_TIMEOUT: timeout}))
+    try:
+        results = json.loads(response)
+    except ValueError:
+        print("could not wait on transactions: {}".format(response))
+        return
     remove_from_sub = []
-    for tx in sub:
-        if sub[tx].value == get_plain_text(requests.post(url, json=sub[tx].to_json())):
-            waiting.append(time.time() - tx)
+    for tx, result in zip(submitted, results):
+        if result[CONFIRMED]:
+            waiting.append(start + result[WAITED] - tx)
             remove_from_sub.append(tx)
 
     for r in remove_from_sub:
@@ -1,5 +1,6 @@
 import argparse
 import gc
+import json
 import time
 from math import floor
 from pathlib import Path
@@ -10,8 +11,10 @@ from src.Intersection import intersection_log_to
 from src.SawtoothPBFT import sawtooth_container_log_to
 from src.SmartShardPeer import smart_shard_peer_log_to
 from src.api.api_util import get_plain_text
+from src.api.constants import QUORUM_ID, TRANSACTIONS, TRANSACTION_KEY, TRANSACTION_VALUE
 from src.structures import Transaction
 from src.util import make_intersecting_committees_on_host
+from src.util import make_container_pool, release_intersecting_committees
 
 
 # Quorums and Intersections to use
@@ -64,12 +67,14 @@ def make_graph_data(outfile: Path, number_of_tx: int, experiment_duration_secs:
 def get_avg_for(number_of_transactions: int, experiment_duration_secs: int, measurement_interval_secs: int,
                 number_of_intersections: int, experiments: int, committees: int):
     throughputPerE = {}
+    containers = make_container_pool()  # containers are reset and reused between experiments
     for e in range(experiments):
         print("Setting up experiment {}".format(e))
-        peers = make_intersecting_committees_on_host(committees, number_of_intersections)
+        peers = make_intersecting_committees_on_host(committees, number_of_intersections, pool=containers)
         results = run_experiment(peers, experiment_duration_secs, measurement_interval_secs, number_of_transactions)
         throughputPerE[e] = results["throughput"]
         print("Cleaning up experiment {}".format(e))
+        release_intersecting_committees(peers, containers)
         del peers
         gc.collect()
     throughput = {}
@@ -132,10 +137,19 @@ def run_experiment(peers: dict, experiment_duration_secs: int, measurement_inter
 
 
 def check_from_peers(submitted, confirmed, peers):
-    url = URL_HOST.format(ip=IP_ADDRESS, port=str(list(peers.keys())[0]) + "/get/")
+    url = URL_HOST.format(ip=IP_ADDRESS, port=str(list(peers.keys())[0]) + "/get/batch")
+    # read every key with one request, the peer forwards the keys of each quorum it is not in
+    request_json = {TRANSACTIONS: [{QUORUM_ID: tx[1].quorum_id, TRANSACTION_KEY: tx[1].key} for tx in submitted]}
+    response = get_plain_text(requests.post(url, json=request_json))
+    values = {}
+    try:
+        for result in json.loads(response):
+            values.setdefault(result[QUORUM_ID], {})[result[TRANSACTION_KEY]] = result[TRANSACTION_VALUE]
+    except (ValueError, TypeError, KeyError):
+        pass
     remove_from_sub = []
     for tx in submitted:
-        if tx[1].value == get_plain_text(requests.post(url, json=tx[1].to_json())):
+        if tx[1].value == values.get(tx[1].quorum_id, {}).get(tx[1].key):
             remove_from_sub.append(tx)
             txID = (tx[1].key.split('_'))[2]
             confirmed[int(txID)].append(floor(time.time()))
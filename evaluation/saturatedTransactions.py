@@ -15,6 +15,7 @@ from src.SmartShardPeer import smart_shard_peer_log_to
 from src.api.api_util import get_plain_text
 from src.structures import Transaction
 from src.util import make_intersecting_committees_on_host
+from src.util import stop_all_containers
 
 # Defaults
 NUMBER_OF_TX_MULT = 6
@@ -56,10 +57,10 @@ def get_avg_for(number_of_transactions: int, number_of_intersections: int, exper
         results = run_experiment(peers, number_of_transactions)
         throughputPer5[e] = results["throughput"]
         print("Cleaning up experiment {}".format(e))
-        os.echo("docker kill $(docker ps -q)")
-        os.echo("docker rm $(docker ps -a -q)")
         del peers
         gc.collect()
+        report = stop_all_containers()
+        print("Removed {c} containers in {t:.1f}s".format(c=report["containers"], t=report["seconds"]))
     throughput = []
     # For each experiment
     for e in range(experiments):
@@ -119,13 +120,18 @@ def run_experiment(peers: dict, number_of_transactions: int):
 
 
 def check_from_peers(submitted, confirmed, peers, peerList):
+    # read all of the txs of a quorum from one peer in that quorum with one bulk read
+    txs_by_quorum = {}
     for tx in submitted:
+        txs_by_quorum.setdefault(tx[1].quorum_id, []).append(tx)
+    for quorum_id, txs in txs_by_quorum.items():
         for peer in peerList:
             intersectionA = peers[peer].inter
-            if (intersectionA.committee_id_a == tx[1].quorum_id) or (intersectionA.committee_id_b == tx[1].quorum_id):
-                if intersectionA.get_tx(tx[1]) == tx[1].value:
-                    confirmed[tx] = tx
-                    break
+            if (intersectionA.committee_id_a == quorum_id) or (intersectionA.committee_id_b == quorum_id):
+                values = intersectionA.get_txs([tx[1] for tx in txs])
+                for tx, value in zip(txs, values):
+                    if value == tx[1].value:
+                        confirmed[tx] = tx
                 break
 
 
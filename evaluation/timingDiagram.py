@@ -13,6 +13,7 @@ from src.SmartShardPeer import smart_shard_peer_log_to
 from src.api.api_util import get_plain_text
 from src.structures import Transaction
 from src.util import make_intersecting_committees_on_host
+from src.util import make_container_pool, release_intersecting_committees
 
 # Defaults
 NUMBER_OF_TX = 20
@@ -47,12 +48,14 @@ def make_graph_data(outfile: Path, number_of_tx: int, experiment_duration_secs:
 def get_avg_for(number_of_transactions: int, experiment_duration_secs: int, measurement_interval_secs: int,
                 number_of_intersections: int, experiments: int, committees: int):
     throughputPerE = {}
+    containers = make_container_pool()  # containers are reset and reused between experiments
     for e in range(experiments):
         print("Setting up experiment {}".format(e))
-        peers = make_intersecting_committees_on_host(committees, number_of_intersections)
+        peers = make_intersecting_committees_on_host(committees, number_of_intersections, pool=containers)
         results = run_experiment(peers, experiment_duration_secs, measurement_interval_secs, number_of_transactions)
         throughputPerE[e] = results["throughput"]
         print("Cleaning up experiment {}".format(e))
+        release_intersecting_committees(peers, containers)
         del peers
         gc.collect()
     throughput = {}
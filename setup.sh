@@ -54,6 +54,8 @@ pip3 install docker
 pip3 install psutil
 pip3 install mock
 pip3 install flask
+pip3 install cryptography
+pip3 install pyzmq
 
 ######################################################
 #              build sawtooth image                  #
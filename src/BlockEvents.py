@@ -0,0 +1,312 @@
+from src.proto import decode_fields, string_field, bytes_field, varint_field, repeated_message_field
+from src.proto import repeated_string_field
+from src.intkey import INTKEY_NAMESPACE, decode_intkey_state
+from concurrent.futures import Future
+from collections import namedtuple
+import threading
+import logging
+import logging.handlers
+import os
+
+logging.basicConfig(
+    format='%(asctime)s %(levelname)-2s %(message)s',
+    level=logging.INFO,
+    datefmt='%H:%M:%S')
+block_events_logger = logging.getLogger(__name__)
+
+LOG_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+
+# the validator publishes events on its component endpoint
+# see https://sawtooth.hyperledger.org/docs/core/releases/latest/app_developers_guide/event_subscriptions.html
+VALIDATOR_EVENTS_URL = "tcp://{ip}:4004"
+BLOCK_COMMIT_EVENT = "sawtooth/block-commit"
+STATE_DELTA_EVENT = "sawtooth/state-delta"
+
+# validator message types (validator.proto)
+CLIENT_EVENTS = 500
+CLIENT_EVENTS_SUBSCRIBE_REQUEST = 501
+CLIENT_EVENTS_SUBSCRIBE_RESPONSE = 502
+CLIENT_EVENTS_UNSUBSCRIBE_REQUEST = 503
+SUBSCRIBE_OK = 1
+FILTER_REGEX_ANY = 3
+STATE_CHANGE_SET = 1
+
+SUBSCRIBE_TIMEOUT = 2  # sec to wait for the validator to accept a subscription
+RECEIVE_POLL = 0.5  # sec between checks for a stop request while waiting for events
+
+Event = namedtuple('Event', ['event_type', 'attributes', 'data'])
+
+
+def block_events_log_to(path, console_logging=False):
+    handler = logging.handlers.RotatingFileHandler(path, backupCount=5, maxBytes=LOG_FILE_SIZE)
+    formatter = logging.Formatter('%(asctime)s %(levelname)-2s %(message)s', datefmt='%H:%M:%S')
+    handler.setFormatter(formatter)
+    block_events_logger.propagate = console_logging
+    block_events_logger.setLevel(os.environ.get("LOGLEVEL", "INFO"))
+    block_events_logger.addHandler(handler)
+
+
+def encode_message(message_type: int, correlation_id: str, content: bytes):
+    return varint_field(1, message_type) + string_field(2, correlation_id) + bytes_field(3, content)
+
+
+def decode_message(data: bytes):
+    fields = decode_fields(data)
+    message_type = fields.get(1, [0])[0]
+    correlation_id = fields.get(2, [b''])[0].decode('utf-8')
+    content = fields.get(3, [b''])[0]
+    return message_type, correlation_id, content
+
+
+# asks for block commits and for every change to the intkey state
+def encode_subscribe_request(last_known_block_ids: list):
+    block_commit = string_field(1, BLOCK_COMMIT_EVENT)
+    address_filter = string_field(1, 'address') + string_field(2, '^{}.*'.format(INTKEY_NAMESPACE)) + \
+        varint_field(3, FILTER_REGEX_ANY)
+    state_delta = string_field(1, STATE_DELTA_EVENT) + repeated_message_field(2, [address_filter])
+    return repeated_message_field(1, [block_commit, state_delta]) + repeated_string_field(2, last_known_block_ids)
+
+
+def encode_event(event: Event):
+    attributes = [string_field(1, key) + string_field(2, value) for key, value in event.attributes.items()]
+    return string_field(1, event.event_type) + repeated_message_field(2, attributes) + bytes_field(3, event.data)
+
+
+def encode_event_list(events: list):
+    return repeated_message_field(1, [encode_event(e) for e in events])
+
+
+def decode_event_list(data: bytes):
+    events = []
+    for encoded in decode_fields(data).get(1, []):
+        fields = decode_fields(encoded)
+        attributes = {}
+        for attribute in fields.get(2, []):
+            attribute = decode_fields(attribute)
+            attributes[attribute.get(1, [b''])[0].decode('utf-8')] = attribute.get(2, [b''])[0].decode('utf-8')
+        events.append(Event(fields.get(1, [b''])[0].decode('utf-8'), attributes, fields.get(3, [b''])[0]))
+    return events
+
+
+# state-delta events carry a StateChangeList, returns {address: value} of every address that was set
+def decode_state_changes(data: bytes):
+    changes = {}
+    for encoded in decode_fields(data).get(1, []):
+        fields = decode_fields(encoded)
+        if fields.get(3, [STATE_CHANGE_SET])[0] == STATE_CHANGE_SET:
+            changes[fields.get(1, [b''])[0].decode('utf-8')] = fields.get(2, [b''])[0]
+    return changes
+
+
+def make_block_commit_event(block_num: int, block_id: str, previous_block_id='', state_root_hash=''):
+    return Event(BLOCK_COMMIT_EVENT, {'block_id': block_id, 'block_num': str(block_num),
+                                      'previous_block_id': previous_block_id, 'state_root_hash': state_root_hash}, b'')
+
+
+def make_state_delta_event(changes: dict):
+    encoded = [string_field(1, address) + bytes_field(2, value) + varint_field(3, STATE_CHANGE_SET)
+               for address, value in changes.items()]
+    return Event(STATE_DELTA_EVENT, {}, repeated_message_field(1, encoded))
+
+
+# event stream of one validator over zmq, needs pyzmq (pip3 install pyzmq)
+class ValidatorEventStream:
+
+    def __init__(self, url: str):
+        import zmq
+        self.__context = zmq.Context.instance()
+        self.__socket = self.__context.socket(zmq.DEALER)
+        self.__socket.setsockopt(zmq.LINGER, 0)
+        self.__socket.connect(url)
+        self.__url = url
+
+    # returns True if the validator accepted the subscription
+    def subscribe(self, last_known_block_ids: list):
+        request = encode_subscribe_request(last_known_block_ids)
+        correlation_id = os.urandom(16).hex()
+        self.__socket.send(encode_message(CLIENT_EVENTS_SUBSCRIBE_REQUEST, correlation_id, request))
+        if not self.__socket.poll(SUBSCRIBE_TIMEOUT * 1000):
+            block_events_logger.warning("{}: no answer to event subscription".format(self.__url))
+            return False
+        message_type, _, content = decode_message(self.__socket.recv())
+        status = decode_fields(content).get(1, [0])[0]
+        return message_type == CLIENT_EVENTS_SUBSCRIBE_RESPONSE and status == SUBSCRIBE_OK
+
+    # returns the next list of events or None if nothing arrived within timeout (sec)
+    def receive(self, timeout: float):
+        if not self.__socket.poll(timeout * 1000):
+            return None
+        message_type, _, content = decode_message(self.__socket.recv())
+        if message_type != CLIENT_EVENTS:
+            return []
+        return decode_event_list(content)
+
+    def close(self):
+        try:
+            self.__socket.send(encode_message(CLIENT_EVENTS_UNSUBSCRIBE_REQUEST, os.urandom(16).hex(), b''))
+        finally:
+            self.__socket.close()
+
+
+# sets the result of a future unless it was cancelled (ex: forget after a timeout), the waiter may cancel it at any time
+# so it is not enough to check it before setting the result
+def resolve(future: Future, result):
+    if future.set_running_or_notify_cancel():
+        future.set_result(result)
+
+
+# follows the block commits and intkey state changes of one validator and resolves futures as blocks commit
+# stream is anything with subscribe(last_known_block_ids), receive(timeout) and close() (ex: ValidatorEventStream)
+# NOTE: a key future only fires on a change after it was made, check the current state before waiting on a key
+# NOTE: a subscriber belongs to the process that started it, its thread does not survive a fork (the api runs in its
+# own process) and zmq sockets can not be shared with a child, so it is not alive in any other process
+class BlockEventSubscriber:
+
+    def __init__(self, stream):
+        self.__stream = stream
+        self.__lock = threading.Lock()
+        self.__height = 0
+        self.__block_id = None
+        self.__height_waiters = []  # (height, future)
+        self.__key_waiters = {}  # key: [(value, future)]
+        self.__listeners = []
+        self.__running = False
+        self.__thread = None
+        self.__pid = None  # process that started the subscriber
+
+    # last_known_block_id makes the validator resend every block committed after it, so nothing is missed between
+    # reading the head and subscribing
+    # height is the number of blocks in the chain when last_known_block_id was read
+    def start(self, last_known_block_id=None, height=0):
+        if not self.__stream.subscribe([] if last_known_block_id is None else [last_known_block_id]):
+            return False
+        self.__height = height
+        self.__block_id = last_known_block_id
+        self.__pid = os.getpid()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+        return True
+
+    # stops following events and closes the stream, in a forked child the thread and the stream belong to the parent
+    # so they are left alone
+    def stop(self):
+        self.__running = False
+        if self.__pid is not None and self.__pid != os.getpid():
+            return
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join()
+        self.__stream.close()
+
+    def alive(self):
+        return self.__running and self.__pid == os.getpid()
+
+    # number of blocks in the chain as seen by the events (0 until the first block commit event)
+    def height(self):
+        return self.__height
+
+    # listener(block_num, block_id) is called on every block commit
+    def add_listener(self, listener):
+        self.__listeners.append(listener)
+
+    # resolves with the height once the chain has at least height blocks
+    def wait_for_height(self, height: int):
+        future = Future()
+        with self.__lock:
+            if self.__height >= height:
+                future.set_result(self.__height)
+            else:
+                self.__height_waiters.append((height, future))
+        return future
+
+    # resolves with the new value the next time key is set (to value if one is given)
+    def wait_for_key(self, key: str, value=None):
+        future = Future()
+        with self.__lock:
+            self.__key_waiters.setdefault(key, []).append((None if value is None else str(value), future))
+        return future
+
+    # stops waiting on a future from wait_for_key (ex: after it timed out)
+    def forget(self, key: str, future: Future):
+        with self.__lock:
+            waiting = [(v, f) for v, f in self.__key_waiters.get(key, []) if f is not future]
+            if waiting:
+                self.__key_waiters[key] = waiting
+            else:
+                self.__key_waiters.pop(key, None)
+        future.cancel()
+
+    # events that can not be handled stop the subscriber the same as a failed stream, a waiter could miss its event
+    # otherwise and hang until its timeout instead of polling
+    def __run(self):
+        try:
+            while self.__running:
+                events = self.__stream.receive(RECEIVE_POLL)
+                if events:
+                    self.handle(events)
+        except Exception as e:
+            block_events_logger.error("event stream failed: {}".format(e))
+        finally:
+            self.__running = False
+            # nobody will resolve the futures anymore, let the waiters fall back to polling
+            with self.__lock:
+                waiters = [f for _, f in self.__height_waiters] + \
+                          [f for w in self.__key_waiters.values() for _, f in w]
+                self.__height_waiters = []
+                self.__key_waiters = {}
+            for future in waiters:
+                future.cancel()
+
+    # the state changes of a block are applied before its commit so a key waiter never sees a height that does not
+    # hold its value yet
+    def handle(self, events: list):
+        for event in events:
+            if event.event_type == STATE_DELTA_EVENT:
+                self.__on_state_delta(event)
+        for event in events:
+            if event.event_type == BLOCK_COMMIT_EVENT:
+                self.__on_block_commit(int(event.attributes['block_num']), event.attributes['block_id'])
+
+    def __on_block_commit(self, block_num: int, block_id: str):
+        resolved = []
+        with self.__lock:
+            if block_num + 1 > self.__height:
+                self.__height = block_num + 1
+                self.__block_id = block_id
+            waiting = []
+            for height, future in self.__height_waiters:
+                if self.__height >= height:
+                    resolved.append(future)
+                else:
+                    waiting.append((height, future))
+            self.__height_waiters = waiting
+            height = self.__height
+        for future in resolved:
+            resolve(future, height)
+        for listener in self.__listeners:
+            try:
+                listener(block_num, block_id)
+            except Exception as e:  # one broken listener does not keep the others or the waiters from their blocks
+                block_events_logger.error("block commit listener failed: {}".format(e))
+
+    def __on_state_delta(self, event: Event):
+        resolved = []
+        with self.__lock:
+            for address, data in decode_state_changes(event.data).items():
+                if not address.startswith(INTKEY_NAMESPACE):
+                    continue
+                for key, value in decode_intkey_state(data).items():
+                    if key not in self.__key_waiters:
+                        continue
+                    waiting = []
+                    for expected, future in self.__key_waiters[key]:
+                        if expected is None or expected == str(value):
+                            resolved.append((future, str(value)))
+                        else:
+                            waiting.append((expected, future))
+                    if waiting:
+                        self.__key_waiters[key] = waiting
+                    else:
+                        del self.__key_waiters[key]
+        for future, value in resolved:
+            resolve(future, value)
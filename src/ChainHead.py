@@ -0,0 +1,108 @@
+from concurrent.futures import TimeoutError as FutureTimeoutError, CancelledError
+import threading
+import time
+
+# how long (sec) a head read is reused before the REST API is asked again
+CHAIN_HEAD_TTL = 0.25
+# how often (sec) wait_for_height checks the head
+CHAIN_HEAD_POLL = 0.5
+# while waiting on block commit events the head is still read this often (sec) in case an event is lost
+EVENT_FALLBACK_POLL = 5
+# only the newest block is needed to know the height of the chain
+CHAIN_HEAD_REQUEST = 'http://localhost:8008/blocks?limit=1'
+
+
+# tracks the head of one peers blockchain with /blocks?limit=1 instead of downloading (and counting) every block
+# sawtooth_api is a function that takes a REST API URL and returns the decoded json (ex: SawtoothContainer.sawtooth_api)
+# block_events is an optional function that returns a started BlockEventSubscriber (or None when events are not
+# available), when there is one wait_for_height is woken by block commits instead of polling
+class ChainHead:
+
+    def __init__(self, sawtooth_api, ttl=CHAIN_HEAD_TTL, block_events=None):
+        self.__sawtooth_api = sawtooth_api
+        self.__block_events = block_events
+        self.__ttl = ttl
+        self.__lock = threading.Lock()
+        self.__block_num = -1  # no blocks yet, not even genesis
+        self.__block_id = None
+        self.__read_at = None
+
+    # reads the head from the REST API now, returns (block number, block id)
+    def refresh(self):
+        blocks = self.__sawtooth_api(CHAIN_HEAD_REQUEST)
+        data = blocks.get('data', []) if isinstance(blocks, dict) else []
+        with self.__lock:
+            if len(data) > 0:
+                self.__block_num = int(data[0]['header']['block_num'])
+                self.__block_id = data[0]['header_signature']
+            self.__read_at = time.time()
+            return self.__block_num, self.__block_id
+
+    # returns (block number, block id) of the head, block number is -1 if there are no blocks
+    def head(self):
+        with self.__lock:
+            if self.__read_at is not None and time.time() - self.__read_at < self.__ttl:
+                return self.__block_num, self.__block_id
+        return self.refresh()
+
+    # number of blocks in the chain (including genesis), the same as len(blocks()['data'])
+    def height(self):
+        block_num, _ = self.head()
+        return block_num + 1
+
+    def block_id(self):
+        _, block_id = self.head()
+        return block_id
+
+    # number of blocks in the chain now, unlike height the head is not up to ttl old: it is kept current by the block
+    # commit events when they are followed, otherwise it is read from the REST API
+    # for callers that must know of every new block (ex: values cached until the next block)
+    def current_height(self):
+        subscriber = self.__block_events() if self.__block_events is not None else None
+        if subscriber is not None and subscriber.alive():
+            return self.height()
+        block_num, _ = self.refresh()
+        return block_num + 1
+
+    # takes a head seen some other way (ex: a block commit event), older heads are ignored
+    def observe(self, block_num: int, block_id: str):
+        with self.__lock:
+            if block_num >= self.__block_num:
+                self.__block_num = block_num
+                self.__block_id = block_id
+                self.__read_at = time.time()
+
+    # forgets the cached head so the next read goes to the REST API
+    def invalidate(self):
+        with self.__lock:
+            self.__read_at = None
+
+    # blocks until the chain has at least height blocks, returns False if that takes longer then timeout (sec)
+    def wait_for_height(self, height: int, timeout: float, poll=CHAIN_HEAD_POLL):
+        end = time.time() + timeout
+        block_num, _ = self.refresh()
+        if block_num + 1 >= height:
+            return True
+        subscriber = self.__block_events() if self.__block_events is not None else None
+        if subscriber is not None:
+            future = subscriber.wait_for_height(height)
+            while True:
+                try:
+                    future.result(timeout=max(min(end - time.time(), EVENT_FALLBACK_POLL), 0))
+                    return True
+                except FutureTimeoutError:
+                    pass
+                except CancelledError:
+                    break  # the event stream went away, poll for the rest of the wait
+                block_num, _ = self.refresh()
+                if block_num + 1 >= height:
+                    return True
+                if time.time() >= end:
+                    return False
+        while True:
+            block_num, _ = self.refresh()
+            if block_num + 1 >= height:
+                return True
+            if time.time() >= end:
+                return False
+            time.sleep(max(min(poll, end - time.time()), 0))
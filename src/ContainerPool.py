@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import logging
+import time
+
+container_pool_logger = logging.getLogger(__name__)
+
+# containers created, reset or dropped at the same time
+POOL_WORKERS = 16
+
+
+# keeps idle sawtooth containers (keyed by docker network) warm so experiments can reuse them instead of running a new
+# container for every peer every time
+# factory(network) makes a new container (ex: lambda network: SawtoothContainer(network, host_keys=True)), anything
+# handed out by the pool must have reset() (ex: SawtoothContainer.reset) so it can be recycled on release
+# max_idle is the most idle containers kept per network, extras are dropped (stopped by their __del__) on release
+class ContainerPool:
+
+    def __init__(self, factory, max_idle=None, workers=POOL_WORKERS):
+        self.__factory = factory
+        self.__max_idle = max_idle
+        self.__workers = workers
+        self.__lock = threading.Lock()
+        self.__idle = {}  # network: [container]
+        self.__created = 0
+        self.__reused = 0
+
+    # number of idle containers for network
+    def idle(self, network):
+        with self.__lock:
+            return len(self.__idle.get(network, []))
+
+    # how many containers were made new and how many were handed out again
+    def stats(self):
+        with self.__lock:
+            return {'created': self.__created, 'reused': self.__reused,
+                    'idle': sum(len(c) for c in self.__idle.values())}
+
+    # creates containers until there are at least count idle ones for network
+    def warm(self, count: int, network):
+        missing = count - self.idle(network)
+        if missing <= 0:
+            return
+        containers = self.__create(missing, network)
+        with self.__lock:
+            self.__idle.setdefault(network, []).extend(containers)
+
+    # hands out count containers for network, idle ones first and new ones for the rest
+    def acquire(self, count: int, network):
+        with self.__lock:
+            idle = self.__idle.get(network, [])
+            taken, self.__idle[network] = idle[:count], idle[count:]
+            self.__reused += len(taken)
+        start = time.time()
+        containers = taken + self.__create(count - len(taken), network)
+        container_pool_logger.info("pool handed out {c} containers ({r} reused) in {t:.1f}s".format(
+            c=count, r=len(taken), t=time.time() - start))
+        return containers
+
+    # resets containers and keeps them for the next acquire, containers that fail to reset are dropped
+    def release(self, containers: list, network):
+        if len(containers) == 0:
+            return
+
+        def reset(container):
+            try:
+                container.reset()
+                return container
+            except Exception as e:
+                container_pool_logger.error("could not reset container, dropping it: {}".format(e))
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(len(containers), self.__workers)) as executor:
+            recycled = [c for c in executor.map(reset, containers) if c is not None]
+        with self.__lock:
+            idle = self.__idle.setdefault(network, [])
+            idle.extend(recycled)
+            if self.__max_idle is not None and len(idle) > self.__max_idle:
+                del idle[self.__max_idle:]
+
+    # drops every idle container
+    def clear(self):
+        with self.__lock:
+            self.__idle = {}
+
+    def __create(self, count: int, network):
+        if count <= 0:
+            return []
+        with ThreadPoolExecutor(max_workers=min(count, self.__workers)) as executor:
+            containers = list(executor.map(lambda _: self.__factory(network), range(count)))
+        with self.__lock:
+            self.__created += count
+        return containers
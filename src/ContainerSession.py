@@ -0,0 +1,119 @@
+import threading
+import logging
+import struct
+import shlex
+import os
+
+container_session_logger = logging.getLogger(__name__)
+
+# sec to wait for a command run through a session to finish
+SESSION_TIMEOUT = 120
+# printed after every command so the end of its output can be found in the stream
+DONE_MARKER = "__SMARTSHARDS_DONE_{token}__"
+# docker multiplexes stdout and stderr of an exec without a tty into frames with an 8 byte header
+# see https://docs.docker.com/engine/api/v1.24/#attach-to-a-container
+FRAME_HEADER = '>BxxxL'
+FRAME_HEADER_SIZE = 8
+
+
+# the command may have been run (ex: its output could not be read), do not run it again some other way
+class ContainerSessionError(Exception):
+    pass
+
+
+# nothing of the command reached the shell so it was not run and can be run some other way (ex: exec_run)
+class CommandNotSent(ContainerSessionError):
+    pass
+
+
+# turns a command written for exec_run (split like a shell would but never run by one) into a shell line that runs
+# the exact same argv, so commands behave the same through a session and through exec_run
+def quote_command(command: str):
+    return ' '.join(shlex.quote(arg) for arg in shlex.split(command))
+
+
+# one long running shell inside a container that takes commands over a single attached stream, so running a command
+# does not cost a docker exec (create, start, inspect) every time
+# sock is the attached socket of the shell, use ContainerSession.open to start one in a container
+class ContainerSession:
+
+    def __init__(self, sock, timeout=SESSION_TIMEOUT):
+        self.__socket = sock
+        self.__socket.settimeout(timeout)
+        self.__lock = threading.Lock()
+        self.__buffer = b''
+        self.__closed = False
+
+    # api is a docker APIClient (ex: docker.from_env().api)
+    @classmethod
+    def open(cls, api, container_id: str, timeout=SESSION_TIMEOUT):
+        exec_id = api.exec_create(container_id, ['/bin/sh'], stdin=True, stdout=True, stderr=True, tty=False)['Id']
+        sock = api.exec_start(exec_id, socket=True)
+        # docker-py hands back a SocketIO wrapper, the session reads and writes the socket under it
+        return cls(getattr(sock, '_sock', sock), timeout)
+
+    def closed(self):
+        return self.__closed
+
+    def close(self):
+        self.__closed = True
+        try:
+            self.__socket.close()
+        except OSError:
+            pass
+
+    # runs command and returns its output (stdout and stderr) the same way exec_run would
+    def run(self, command: str):
+        token = os.urandom(8).hex()
+        marker = DONE_MARKER.format(token=token).encode('utf-8')
+        line = "{command} </dev/null 2>&1; printf '\\n%s\\n' '{marker}'\n".format(command=quote_command(command),
+                                                                                 marker=marker.decode('utf-8'))
+        with self.__lock:
+            self.__send(line)
+            return self.__read_until(b'\n' + marker + b'\n').decode('utf-8').strip()
+
+    # starts command in the background and returns right away, the same way exec_run(detach=True) would
+    def run_service(self, command: str):
+        with self.__lock:
+            self.__send("{command} </dev/null >/dev/null 2>&1 &\n".format(command=quote_command(command)))
+
+    # the shell runs whatever part of a line it got once the stream closes, so it is only safe to run the command
+    # elsewhere when not a byte of it was sent
+    def __send(self, line: str):
+        if self.__closed:
+            raise CommandNotSent("session is closed")
+        data = line.encode('utf-8')
+        sent = 0
+        try:
+            while sent < len(data):
+                sent += self.__socket.send(data[sent:])
+        except OSError as e:
+            self.close()
+            if sent == 0:
+                raise CommandNotSent("could not send command: {}".format(e)) from e
+            raise ContainerSessionError("command only partly sent: {}".format(e)) from e
+
+    def __read_until(self, marker: bytes):
+        while marker not in self.__buffer:
+            self.__buffer += self.__read_frame()
+        output, self.__buffer = self.__buffer.split(marker, 1)
+        return output
+
+    def __read_frame(self):
+        header = self.__read_exactly(FRAME_HEADER_SIZE)
+        _, size = struct.unpack(FRAME_HEADER, header)
+        return self.__read_exactly(size)
+
+    def __read_exactly(self, size: int):
+        data = b''
+        while len(data) < size:
+            try:
+                chunk = self.__socket.recv(size - len(data))
+            except OSError as e:  # includes socket.timeout
+                self.close()
+                raise ContainerSessionError("could not read command output: {}".format(e)) from e
+            if len(chunk) == 0:
+                self.close()
+                raise ContainerSessionError("shell in container exited")
+            data += chunk
+        return data
@@ -1,3 +1,6 @@
+from src.ReadCache import ReadCache, READ_CACHE_SIZE
+from src.intkey import INTKEY_BATCH_SIZE
+from concurrent.futures import ThreadPoolExecutor
 import os
 import logging
 import logging.handlers
@@ -20,139 +23,287 @@ def intersection_log_to(path, console_logging=False):
     intersection_logger.addHandler(handler)
 
 
+# raised when work on some of the committees of a peer failed
+# errors: {committee id: exception} of every committee that failed
+# results: {committee id: result} of every committee that did not
+class IntersectionError(Exception):
+
+    def __init__(self, errors: dict, results: dict):
+        self.errors = errors
+        self.results = results
+        super().__init__('; '.join('{}: {}'.format(committee_id, e) for committee_id, e in errors.items()))
+
+
+# runs every call of work ({committee id: function with no arguments}) at the same time, the committees of a peer
+# are independent so nothing is gained by waiting for one before starting the next
+# returns {committee id: result}, raises IntersectionError once every call finished if any of them failed
+def run_per_committee(work: dict):
+    if len(work) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(work)) as executor:
+        futures = {committee_id: executor.submit(fn) for committee_id, fn in work.items()}
+    results, errors = {}, {}
+    for committee_id, future in futures.items():
+        try:
+            results[committee_id] = future.result()
+        except Exception as e:
+            intersection_logger.error('PEER: committee {c} failed: {e}'.format(c=committee_id, e=e))
+            errors[committee_id] = e
+    if errors:
+        raise IntersectionError(errors, results)
+    return results
+
+
+# a peer that is a member of more then one committee, one sawtooth container per committee
+# made either with two committees a and b (Intersection(container_a, container_b, id_a, id_b)) or with any number of
+# committees (Intersection(instances={committee_id: container, ...}))
+# requests for a committee are sent to its container with one lookup, committee ids are always compared as strings
+# committed values read with get_tx/get_txs are cached per committee (read_cache_size keys) until the next block
 class Intersection:
 
-    def __init__(self, sawtooth_container_a, sawtooth_container_b, Aid, Bid):
-        self.instance_a = sawtooth_container_a
-        self.instance_b = sawtooth_container_b
-        self.committee_id_a = str(Aid) if Aid is not None else None
-        self.committee_id_b = str(Bid) if Bid is not None else None
+    def __init__(self, sawtooth_container_a=None, sawtooth_container_b=None, Aid=None, Bid=None, instances=None,
+                 read_cache_size=READ_CACHE_SIZE):
+        self.__read_cache_size = read_cache_size
+        self.__caches = {}
+        # [committee id, container] in the order the committees were given, a and b are the first two
+        if instances is None:
+            self.__members = [[str(Aid) if Aid is not None else None, sawtooth_container_a],
+                              [str(Bid) if Bid is not None else None, sawtooth_container_b]]
+        else:
+            self.__members = [[str(committee_id), container] for committee_id, container in instances.items()]
+        self.__index()
 
     def __del__(self):
-        del self.instance_a
-        del self.instance_b
+        self.__members = []
+        self.__instances = {}
 
-    def make_genesis(self, committee_id, val_keys, user_keys):
-        if str(committee_id) == self.committee_id_a:
-            self.instance_a.make_genesis(val_keys, user_keys)
-        elif str(committee_id) == self.committee_id_b:
-            self.instance_b.make_genesis(val_keys, user_keys)
-        else:
-            intersection_logger.error('PEER: make_genesis for unknown quorum, '
+    # rebuilds the committee id to container table after the members changed
+    def __index(self):
+        self.__instances = {committee_id: container for committee_id, container in self.__members
+                            if committee_id is not None}
+        # a committee keeps its cache as long as it keeps its container
+        self.__caches = {committee_id: self.__caches[committee_id]
+                         if committee_id in self.__caches and self.__caches[committee_id][0] is container
+                         else (container, ReadCache(self.__read_cache_size))
+                         for committee_id, container in self.__instances.items()}
+
+    def __member(self, position: int, field: int):
+        if position < len(self.__members):
+            return self.__members[position][field]
+        return None
+
+    def __set_member(self, position: int, field: int, value):
+        while len(self.__members) <= position:
+            self.__members.append([None, None])
+        self.__members[position][field] = value
+        self.__index()
+
+    @property
+    def instance_a(self):
+        return self.__member(0, 1)
+
+    @instance_a.setter
+    def instance_a(self, container):
+        self.__set_member(0, 1, container)
+
+    @property
+    def instance_b(self):
+        return self.__member(1, 1)
+
+    @instance_b.setter
+    def instance_b(self, container):
+        self.__set_member(1, 1, container)
+
+    @property
+    def committee_id_a(self):
+        return self.__member(0, 0)
+
+    @committee_id_a.setter
+    def committee_id_a(self, committee_id):
+        self.__set_member(0, 0, str(committee_id) if committee_id is not None else None)
+
+    @property
+    def committee_id_b(self):
+        return self.__member(1, 0)
+
+    @committee_id_b.setter
+    def committee_id_b(self, committee_id):
+        self.__set_member(1, 0, str(committee_id) if committee_id is not None else None)
+
+    # ids of every committee this peer is in, in the order they were given
+    def committee_ids(self):
+        return list(self.__instances.keys())
+
+    # container of committee_id (None if the peer is not in it)
+    def instance(self, committee_id):
+        return self.__instances.get(str(committee_id))
+
+    # {committee id: container} of every committee this peer is in
+    def instances(self):
+        return dict(self.__instances)
+
+    # looks up the container of quorum_id and logs an error if the peer is not in it
+    def __instance_for(self, quorum_id, request: str):
+        instance = self.__instances.get(str(quorum_id))
+        if instance is None and str(quorum_id) not in self.__instances:
+            intersection_logger.error('PEER: {request} for unknown quorum, '
                                       'known quorums:{known} requested quorum:{unknown}'.format(
-                                        known=[self.committee_id_a, self.committee_id_b],
-                                        unknown=committee_id))
+                                        request=request, known=self.committee_ids(), unknown=quorum_id))
+        return instance
 
-    def start_sawtooth(self, committee_a_ips, committee_b_ips):
-        self.instance_a.join_sawtooth(committee_a_ips)
-        self.instance_b.join_sawtooth(committee_b_ips)
+    def make_genesis(self, committee_id, val_keys, user_keys):
+        instance = self.__instance_for(committee_id, 'make_genesis')
+        if instance is not None:
+            instance.make_genesis(val_keys, user_keys)
+
+    # takes the ips of each committee in the same order as the committees were given, every committee is joined at
+    # the same time (raises IntersectionError if joining any of them failed)
+    def start_sawtooth(self, *committee_ips):
+        work = {}
+        for (committee_id, instance), ips in zip(self.__members, committee_ips):
+            if instance is not None:
+                work[committee_id] = lambda instance=instance, ips=ips: instance.join_sawtooth(ips)
+        run_per_committee(work)
 
     def submit(self, tx):
-        if str(tx.quorum_id) == self.committee_id_a:
-            self.instance_a.submit_tx(tx.key, tx.value)
+        instance = self.__instance_for(tx.quorum_id, 'tx submitted')
+        if instance is not None:
+            instance.submit_tx(tx.key, tx.value)
 
-        elif str(tx.quorum_id) == self.committee_id_b:
-            self.instance_b.submit_tx(tx.key, tx.value)
-        else:
-            intersection_logger.error('PEER: tx submitted for unknown quorum, '
-                                      'known quorums:{known} requested quorum:{unknown}'.format(
-                                        known=[self.committee_id_a, self.committee_id_b],
-                                        unknown=tx.quorum_id))
+    # submits many transactions at once, each quorum gets one request holding all of its transactions packed in batches
+    # of batch_size (see SawtoothContainer.submit_txs)
+    # returns the batch id of each transaction in the same order as txs (None if the tx could not be submitted, the
+    # ValueError of a tx that is not a valid intkey transaction)
+    def submit_txs(self, txs: list, batch_size=INTKEY_BATCH_SIZE):
+        by_quorum = {}
+        for index, tx in enumerate(txs):
+            by_quorum.setdefault(str(tx.quorum_id), []).append(index)
+        batch_ids = [None] * len(txs)
+        for quorum_id, indices in by_quorum.items():
+            instance = self.__instance_for(quorum_id, 'txs submitted')
+            if instance is None:
+                continue
+            ids = instance.submit_txs([txs[i] for i in indices], batch_size=batch_size)
+            for index, batch_id in zip(indices, ids):
+                batch_ids[index] = batch_id
+        return batch_ids
+
+    # blocks until every tx (of any of this peers committees) holds its value or timeout (sec) runs out, the committees
+    # are waited on at the same time
+    # returns the time (time.time()) each tx was seen committed in the same order as txs (None if it was not)
+    def wait_for_txs(self, txs: list, timeout: float):
+        by_quorum = {}
+        for index, tx in enumerate(txs):
+            by_quorum.setdefault(str(tx.quorum_id), []).append(index)
+        work = {}
+        for quorum_id, indices in by_quorum.items():
+            instance = self.__instance_for(quorum_id, 'txs waited on')
+            if instance is not None:
+                work[quorum_id] = lambda i=instance, w={txs[n].key: txs[n].value for n in indices}: \
+                    i.wait_for_txs(w, timeout)
+        confirmed = run_per_committee(work)
+        return [confirmed[str(tx.quorum_id)][tx.key] if str(tx.quorum_id) in confirmed else None for tx in txs]
+
+    # returns {batch id: status} of batches submitted to quorum_id (see SawtoothContainer.batch_statuses)
+    def batch_statuses(self, quorum_id, batch_ids: list, wait=None):
+        instance = self.__instance_for(quorum_id, 'batch statuses')
+        if instance is None:
+            return None
+        return instance.batch_statuses(batch_ids, wait)
 
     def get_tx(self, tx):
-        if str(tx.quorum_id) == self.committee_id_a:
-            return self.instance_a.get_tx(tx.key)
+        instance = self.__instance_for(tx.quorum_id, 'tx requested')
+        if instance is None:
+            return None
+        cache = self.__caches[str(tx.quorum_id)][1]
+        height = instance.chain_head().current_height()
+        hit, value = cache.get(tx.key, height)
+        if hit:
+            return value
+        value = instance.get_tx(tx.key)
+        if value is not None:
+            cache.put(tx.key, value, height)
+        return value
 
-        elif str(tx.quorum_id) == self.committee_id_b:
-            return self.instance_b.get_tx(tx.key)
-        else:
-            intersection_logger.error('PEER: tx submitted for unknown quorum, '
-                                      'known quorums:{known} requested quorum:{unknown}'.format(
-                                        known=[self.committee_id_a, self.committee_id_b],
-                                        unknown=tx.quorum_id))
-        return None
+    # reads many transactions at once, each quorum gets one bulk read
+    # returns the value of each transaction in the same order as txs (None if the tx is not set or the quorum is
+    # unknown)
+    def get_txs(self, txs: list):
+        by_quorum = {}
+        for index, tx in enumerate(txs):
+            by_quorum.setdefault(str(tx.quorum_id), []).append(index)
+        values = [None] * len(txs)
+        for quorum_id, indices in by_quorum.items():
+            instance = self.__instance_for(quorum_id, 'txs requested')
+            if instance is None:
+                continue
+            cache = self.__caches[quorum_id][1]
+            height = instance.chain_head().current_height()
+            missing = []
+            for index in indices:
+                hit, value = cache.get(txs[index].key, height)
+                if hit:
+                    values[index] = value
+                else:
+                    missing.append(index)
+            if len(missing) == 0:
+                continue
+            found = instance.get_txs([txs[i].key for i in missing])
+            for index in missing:
+                values[index] = found[txs[index].key]
+                cache.put(txs[index].key, values[index], height)
+        return values
 
     def ip(self, quorum_id):
-        if str(quorum_id) == self.committee_id_a:
-            return self.instance_a.ip()
-        elif str(quorum_id) == self.committee_id_b:
-            return self.instance_b.ip()
-        else:
-            intersection_logger.error('PEER: ip request for unknown quorum, '
-                                      'known quorums:{known} requested quorum:{unknown}'.format(
-                                        known=[self.committee_id_a, self.committee_id_b],
-                                        unknown=quorum_id))
+        instance = self.__instance_for(quorum_id, 'ip request')
+        if instance is not None:
+            return instance.ip()
+        return None
 
     def user_key(self, quorum_id):
-        if str(quorum_id) == self.committee_id_a:
-            return self.instance_a.user_key()
-        elif str(quorum_id) == self.committee_id_b:
-            return self.instance_b.user_key()
-        else:
-            intersection_logger.error('PEER: user key request for unknown quorum, '
-                                      'known quorums:{known} requested quorum:{unknown}'.format(
-                                        known=[self.committee_id_a, self.committee_id_b],
-                                        unknown=quorum_id))
+        instance = self.__instance_for(quorum_id, 'user key request')
+        if instance is not None:
+            return instance.user_key()
         return None
 
     def val_key(self, quorum_id):
-        if str(quorum_id) == self.committee_id_a:
-            return self.instance_a.val_key()
-        elif str(quorum_id) == self.committee_id_b:
-            return self.instance_b.val_key()
-        else:
-            intersection_logger.error('PEER: validator key request for unknown quorum, '
-                                      'known quorums:{known} requested quorum:{unknown}'.format(
-                                        known=[self.committee_id_a, self.committee_id_b],
-                                        unknown=quorum_id))
+        instance = self.__instance_for(quorum_id, 'validator key request')
+        if instance is not None:
+            return instance.val_key()
         return None
 
     def blocks(self, quorum_id):
-        if str(quorum_id) == self.committee_id_a:
-            return self.instance_a.blocks()['data']
-        elif str(quorum_id) == self.committee_id_b:
-            return self.instance_b.blocks()['data']
-        else:
-            intersection_logger.error('PEER: blocks request for unknown quorum, '
-                                      'known quorums:{known} requested quorum:{unknown}'.format(
-                                        known=[self.committee_id_a, self.committee_id_b],
-                                        unknown=quorum_id))
+        instance = self.__instance_for(quorum_id, 'blocks request')
+        if instance is not None:
+            return instance.blocks()['data']
         return None
 
     def sawtooth_api(self, quorum_id, request):
-        if str(quorum_id) == self.committee_id_a:
-            return self.instance_a.sawtooth_api(request)
-        elif str(quorum_id) == self.committee_id_b:
-            return self.instance_b.sawtooth_api(request)
-        else:
-            intersection_logger.error('PEER: sawtooth api request for unknown quorum, '
-                                      'known quorums:{known} requested quorum:{unknown}'.format(
-                                        known=[self.committee_id_a, self.committee_id_b],
-                                        unknown=quorum_id))
+        instance = self.__instance_for(quorum_id, 'sawtooth api request')
+        if instance is not None:
+            return instance.sawtooth_api(request)
         return None
 
     def peer_join(self, committee_id, committee_ips):
-        if str(committee_id) == self.committee_id_a:
-            self.instance_a.join_sawtooth(committee_ips)
-        elif str(committee_id) == self.committee_id_b:
-            self.instance_b.join_sawtooth(committee_ips)
-        else:
-            intersection_logger.error('PEER: peer tried to start in {q}, but peer is not in {q}. Peer in {a}, {b}'
-                                      .format(q=committee_id, a=self.committee_id_a, b=self.committee_id_b))
+        instance = self.__instance_for(committee_id, 'peer join')
+        if instance is not None:
+            instance.join_sawtooth(committee_ips)
 
     def update_committee(self, committee_id, val_keys):
         # Needed after a peer is deleted and when a peer joins
-        if str(committee_id) == self.committee_id_a:
-            self.instance_a.update_committee(val_keys)
-        else:
-            self.instance_b.update_committee(val_keys)
+        instance = self.__instance_for(committee_id, 'committee update')
+        if instance is not None:
+            instance.update_committee(val_keys)
+
+    # {committee id: hits, misses, evictions and size of its read cache}
+    def read_cache_stats(self):
+        return {committee_id: cache.stats() for committee_id, (_, cache) in self.__caches.items()}
 
     def in_committee(self, committee_id):
-        if str(committee_id) == self.committee_id_a or str(committee_id) == self.committee_id_b:
-            return True
-        return False
+        return str(committee_id) in self.__instances
 
     def attached_network(self):
-        if self.instance_a.attached_network() != self.instance_b.attached_network():
-            intersection_logger.warning('PEER: containers attached to different networks, only a is given')
-        return self.instance_a.attached_network()
+        networks = [i.attached_network() for i in self.__instances.values() if i is not None]
+        if len(set(networks)) > 1:
+            intersection_logger.warning('PEER: containers attached to different networks, only the first is given')
+        return networks[0] if networks else None
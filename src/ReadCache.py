@@ -0,0 +1,61 @@
+from collections import OrderedDict
+import threading
+
+# most keys kept per committee
+READ_CACHE_SIZE = 4096
+
+
+# least recently used cache of committed intkey values of one committee
+# every value is tagged with the height of the chain it was read at and is only returned while the chain is still at
+# that height, a new block may have changed any key so everything read before it is stale
+class ReadCache:
+
+    def __init__(self, capacity=READ_CACHE_SIZE):
+        self.__capacity = capacity
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict()  # key: (height, value)
+        self.__height = None  # newest height anything was read at
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    # returns (True, value) if key was read at height, otherwise (False, None)
+    def get(self, key: str, height: int):
+        with self.__lock:
+            self.__advance(height)
+            entry = self.__entries.get(key)
+            if entry is None or entry[0] != height:
+                self.__misses += 1
+                return False, None
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return True, entry[1]
+
+    # keeps value of key as read at height
+    def put(self, key: str, value, height: int):
+        with self.__lock:
+            self.__advance(height)
+            if self.__height is not None and height < self.__height:
+                return  # already stale
+            self.__entries[key] = (height, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__capacity:
+                self.__entries.popitem(last=False)
+                self.__evictions += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__height = None
+
+    def stats(self):
+        with self.__lock:
+            return {'hits': self.__hits, 'misses': self.__misses, 'evictions': self.__evictions,
+                    'size': len(self.__entries)}
+
+    # drops every entry once the chain grew, they can not be used again
+    def __advance(self, height: int):
+        if self.__height is None or height > self.__height:
+            if self.__height is not None:
+                self.__entries.clear()
+            self.__height = height
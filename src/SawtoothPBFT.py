@@ -3,10 +3,23 @@ from json import JSONDecodeError
 import docker
 import json
 import time
+import base64
 import logging
 import logging.handlers
 import os
-from pathlib import Path
+from urllib.parse import urlsplit
+from src.SawtoothRest import SawtoothRestClient, SawtoothRestError, SawtoothRestResponseError
+from src.intkey import make_batch_list, BATCH_CONTENT_TYPE, INTKEY_NAMESPACE, intkey_address, decode_intkey_state
+from src.intkey import check_intkey_transaction, INTKEY_BATCH_SIZE
+from src.signing import Secp256k1Signer
+from src.ChainHead import ChainHead, CHAIN_HEAD_POLL
+from src.ContainerSession import ContainerSession, ContainerSessionError, CommandNotSent
+from src.BlockEvents import BlockEventSubscriber, ValidatorEventStream, VALIDATOR_EVENTS_URL
+from src.Teardown import teardown_manager, EXPERIMENT_LABEL, DEFAULT_EXPERIMENT
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures, FIRST_COMPLETED
+import threading
+from src.structures import Transaction
+from src.archive import make_file_archive
 
 logging.basicConfig(
     format='%(asctime)s %(levelname)-2s %(message)s',
@@ -17,12 +30,21 @@ sawtooth_logger = logging.getLogger(__name__)
 # name of the docker image to run
 DOCKER_IMAGE = "sawtooth:final"
 DEFAULT_DOCKER_NETWORK = 'bridge'
+# how sawtooth_api reaches the REST API of a container
+# direct: HTTP from the host to the container ip (needs the container ip to be routable from the host)
+# exec: curl run inside the container (one docker exec per request)
+API_MODE_DIRECT = 'direct'
+API_MODE_EXEC = 'exec'
+DEFAULT_API_MODE = API_MODE_DIRECT
 IDEAL_VIEW_CHANGE_MILSEC = 30000  # 30 sec
 COMMIT_VIEW_CHANGE_MILSEC = 15000  # 15 sec
 # key locations in container
 USER_KEY = {"priv": "/root/.sawtooth/keys/root.priv", "pub": "/root/.sawtooth/keys/root.pub"}
 VALIDATOR_KEY = {"priv": "/etc/sawtooth/keys/validator.priv", "pub": "/etc/sawtooth/keys/validator.pub"}
 ADMIN_KEY = {"admin": "/admin.priv"}
+# file modes of keys written from the host (the same as sawtooth keygen and sawadm keygen leave them)
+PRIVATE_KEY_MODE = 0o600
+PUBLIC_KEY_MODE = 0o644
 # these commands are used to create the genesis block for a PBFT committee, they are listed in the order they should be
 # run, they only need to be executed once on one peer
 # the sawset genesis command need to have the user keys added to the end in the format '["user_key", "user_key"]'
@@ -79,18 +101,51 @@ BLOCKCHAIN_CATCHUP = 15
 # --peers tcp://172.17.0.3:8800,tcp://172.17.0.4:8800, ...
 # this dose not include the peer that the commands are being executed on
 # all commands should end with a &
+# the component endpoint is bound to the container ip (not 127.0.0.1) so the host can subscribe to block events (see
+# block_events), the services in the container connect to it there as well
+# the REST API takes only one bind (it uses the first), it listens on every address so the host reaches it on the
+# container ip (API_MODE_DIRECT) and curl and the sawtooth/intkey CLIs in the container still reach it on localhost
 SAWTOOTH_START_COMMANDS = {"validator": 'sawtooth-validator  \
-                            --bind component:tcp://127.0.0.1:4004 \
+                            --bind component:tcp://{ip}:4004 \
                             --bind network:tcp://{ip}:8800 \
                             --bind consensus:tcp://{ip}:5050 \
                             --endpoint tcp://{ip}:8800 \
                             --maximum-peer-connectivity 10000 \
                             --peers {peers}',
-                           "api": 'sawtooth-rest-api -v',
-                           "settings_processor": 'settings-tp -v',
-                           "client": 'intkey-tp-python -v',
+                           "api": 'sawtooth-rest-api -v --bind 0.0.0.0:8008 --connect tcp://{ip}:4004',
+                           "settings_processor": 'settings-tp -v --connect tcp://{ip}:4004',
+                           "client": 'intkey-tp-python -v --connect tcp://{ip}:4004',
                            "pbft": 'pbft-engine -vv --connect tcp://{ip}:5050'}
 
+# puts a container back to how it was before make_genesis/start_sawtooth (keys are kept), see SawtoothContainer.reset
+# services are matched by name so the shell of a command session is not killed with them
+SAWTOOTH_RESET_COMMANDS = ["pkill -9 -f "
+                           "'sawtooth-validator|sawtooth-rest-api|settings-tp|intkey-tp-python|pbft-engine'",
+                           '/bin/sh -c "rm -rf /var/lib/sawtooth/* /var/log/sawtooth/* config-genesis.batch '
+                           'config-consensus.batch pbft-settings.batch {admin}"'.format(admin=ADMIN_KEY['admin'])]
+
+# what 'intkey show' reports for a key that has not been set
+INTKEY_MISSING_VALUE = "No such key"
+
+# keys are read with one /state/{address} request each, at most this many at a time (less then REST_POOL_SIZE so
+# the lookups reuse the keep-alive connections), or by paging through every intkey address with
+# /state?address=<intkey prefix> when that takes less requests (see get_txs)
+STATE_LOOKUP_WORKERS = 8
+STATE_LOOKUP_LIMIT = 8  # this many keys or less are always read one by one
+STATE_PAGE_SIZE = 1000  # largest page the REST API will return
+
+# what /batch_statuses reports for a batch (a batch the validator has never seen is UNKNOWN)
+BATCH_COMMITTED = "COMMITTED"
+BATCH_INVALID = "INVALID"
+BATCH_PENDING = "PENDING"
+BATCH_UNKNOWN = "UNKNOWN"
+# longest (sec) /batch_statuses is asked to wait for batches to commit, it must stay below REST_READ_TIMEOUT
+BATCH_STATUS_MAX_WAIT = 20
+
+# after a failed subscription to a validators events (ex: validator still starting) wait this long (sec) before
+# trying again, polling is used in the meantime
+EVENTS_RETRY = 30
+
 LOG_FILE_SIZE = 25 * 1024 * 1024  # 5MB
 
 
@@ -112,26 +167,79 @@ def append_keys(keys, command, admin_key=ADMIN_KEY["admin"]):
 class SawtoothContainer:
     __client = docker.from_env()
     __admin_key = None
+    __admin_key_lock = threading.Lock()  # committees can be made concurrently, only one genesis may pick the key
 
     # starts a sawtooth container and generates root and validator keys
     # does not start PBFT
-    def __init__(self, network=DEFAULT_DOCKER_NETWORK):
+    # command_session: run commands through one long running shell in the container instead of one docker exec each
+    # host_keys: generate the keys on the host and copy them in before the container starts instead of running keygen
+    # and reading the keys back with docker exec
+    # experiment: value of the experiment label on the container, used to tear down one experiment (see Teardown)
+    def __init__(self, network=DEFAULT_DOCKER_NETWORK, api_mode=DEFAULT_API_MODE, command_session=False,
+                 host_keys=False, experiment=DEFAULT_EXPERIMENT):
         self.__container_network = network
-        self.__container = self.__client.containers.run(DOCKER_IMAGE, detach=True, network=self.__container_network)
+        labels = {EXPERIMENT_LABEL: experiment}
+        self.__user_priv = None
+        if host_keys:
+            user, validator = Secp256k1Signer.generate(), Secp256k1Signer.generate()
+            self.__container = self.__client.containers.create(DOCKER_IMAGE, detach=True, labels=labels,
+                                                               network=self.__container_network)
+            self.__container.put_archive('/', make_file_archive({
+                USER_KEY["priv"]: (user.private_key_hex(), PRIVATE_KEY_MODE),
+                USER_KEY["pub"]: (user.public_key_hex(), PUBLIC_KEY_MODE),
+                VALIDATOR_KEY["priv"]: (validator.private_key_hex(), PRIVATE_KEY_MODE),
+                VALIDATOR_KEY["pub"]: (validator.public_key_hex(), PUBLIC_KEY_MODE)}))
+            self.__container.start()
+        else:
+            self.__container = self.__client.containers.run(DOCKER_IMAGE, detach=True, labels=labels,
+                                                            network=self.__container_network)
+        self.__session = None
+        if command_session:
+            self.__session = ContainerSession.open(self.__client.api, self.__container.id)
         self.__ip_addr = self.run_command('hostname -i')
-        self.run_command('sawtooth keygen')
-        self.run_command('sawadm keygen')
-        self.__val_key = self.run_command('cat {val_pub}'.format(val_pub=VALIDATOR_KEY["pub"]))
-        self.__user_key = self.run_command('cat {user_pub}'.format(user_pub=USER_KEY["pub"]))
+        self.__api_mode = api_mode
+        self.__rest = SawtoothRestClient(self.__ip_addr) if api_mode == API_MODE_DIRECT else None
+        self.__signer = None
+        self.__events = None
+        self.__events_lock = threading.Lock()
+        self.__events_failed_at = None
+        self.__state_size = None  # intkey addresses seen by the last scan of the state, see get_txs
+        self.__chain_head = ChainHead(self.sawtooth_api, block_events=self.block_events)
+        if host_keys:
+            self.__signer = user
+            self.__user_priv = user.private_key_hex()
+            self.__val_key = validator.public_key_hex()
+            self.__user_key = user.public_key_hex()
+        else:
+            self.run_command('sawtooth keygen')
+            self.run_command('sawadm keygen')
+            self.__val_key = self.run_command('cat {val_pub}'.format(val_pub=VALIDATOR_KEY["pub"]))
+            self.__user_key = self.run_command('cat {user_pub}'.format(user_pub=USER_KEY["pub"]))
 
+    # __init__ can fail part way (ex: the session could not be opened) so only what was made is cleaned up, the
+    # container first so it is torn down even if closing the rest fails
     def __del__(self):
-        self.__container.stop(timeout=0)
-        self.__client.close()
-        sawtooth_logger.info('{ip}: shutdown'.format(ip=self.ip()))
+        container = getattr(self, '_SawtoothContainer__container', None)
+        if container is not None:
+            # the container is killed and removed in the background, use teardown_manager().drain() to wait for it
+            teardown_manager().enqueue(container)
+        events = getattr(self, '_SawtoothContainer__events', None)
+        if events is not None:
+            events.stop()
+        rest = getattr(self, '_SawtoothContainer__rest', None)
+        if rest is not None:
+            rest.close()
+        session = getattr(self, '_SawtoothContainer__session', None)
+        if session is not None:
+            session.close()
+        sawtooth_logger.info('{ip}: shutdown'.format(ip=getattr(self, '_SawtoothContainer__ip_addr', None)))
 
     # makes a new genesis block, runs on one and only one peer in a committee
     def make_genesis(self, validator_keys: list, user_keys: list):
-        self.set_admin_key(self.run_command('cat {user_pub}'.format(user_pub=USER_KEY["priv"])))
+        if self.__user_priv is not None:
+            self.set_admin_key(self.__user_priv)
+        else:
+            self.set_admin_key(self.run_command('cat {user_pub}'.format(user_pub=USER_KEY["priv"])))
         genesis_command = append_keys(user_keys, SAWTOOTH_GENESIS_COMMANDS["genesis"])
         self.run_command(genesis_command)
 
@@ -154,9 +262,9 @@ class SawtoothContainer:
             ips[i] = "tcp://{}:8800".format(ips[i])
         self.set_admin_key()
         self.run_service(SAWTOOTH_START_COMMANDS["validator"].format(ip=self.ip(), peers=', '.join(ips)))
-        self.run_service(SAWTOOTH_START_COMMANDS["api"])
-        self.run_service(SAWTOOTH_START_COMMANDS["settings_processor"])
-        self.run_service(SAWTOOTH_START_COMMANDS["client"])
+        self.run_service(SAWTOOTH_START_COMMANDS["api"].format(ip=self.ip()))
+        self.run_service(SAWTOOTH_START_COMMANDS["settings_processor"].format(ip=self.ip()))
+        self.run_service(SAWTOOTH_START_COMMANDS["client"].format(ip=self.ip()))
         self.run_service(SAWTOOTH_START_COMMANDS["pbft"].format(ip=self.ip()))
 
     # joins a PBFT committee that already exists
@@ -164,6 +272,21 @@ class SawtoothContainer:
         assert (len(ips) >= 4)  # any less and joining is not possible
         self.start_sawtooth(ips)
 
+    # kills the sawtooth services and wipes the chain so the container can join a new committee, keys are kept
+    # used to recycle containers between experiments (see ContainerPool)
+    def reset(self):
+        with self.__events_lock:
+            if self.__events is not None:
+                self.__events.stop()
+            self.__events = None
+            self.__events_failed_at = None
+        self.__state_size = None
+        for command in SAWTOOTH_RESET_COMMANDS:
+            self.run_command(command)
+        # the old head belongs to a chain that is gone, start over
+        self.__chain_head = ChainHead(self.sawtooth_api, block_events=self.block_events)
+        sawtooth_logger.info('{ip}: reset'.format(ip=self.ip()))
+
     # this re-config the committee so that all peers in keys can vote
     def update_committee(self, validator_keys: list, stop_on_failure=False):
         if len(validator_keys) < 4:
@@ -227,40 +350,160 @@ class SawtoothContainer:
         self.join_sawtooth(ips)
 
     def __update_on_chain_settings(self, command: str):
-        current_chain_size = len(self.blocks()['data'])
+        current_chain_size = self.__chain_head.refresh()[0] + 1
         logging.info("{ip}: waiting for chain to increase from {b}".format(ip=self.ip(), b=current_chain_size))
         self.run_command(command)
-        # wait for update
-        start = time.time()
-        retry_attempted = False
-        while len(self.blocks()['data']) <= current_chain_size:
-            logging.info("{ip}: current length {b}".format(ip=self.ip(), b=len(self.blocks()['data'])))
-            end = time.time()
-            if end - start > UPDATE_TIMEOUT * 0.75 and retry_attempted is False:
-                sawtooth_logger.critical("------ UPDATE RETRY ------")
-                self.run_command(command)
-                retry_attempted = True
-                time.sleep(1)
-            if end - start > UPDATE_TIMEOUT:
-                sawtooth_logger.critical("------ UPDATE TIMEOUT ------")
-                return False
-            time.sleep(1)
-        return True
+        # wait for update, retry once if it has not shown up after 3/4 of the timeout
+        if self.__chain_head.wait_for_height(current_chain_size + 1, UPDATE_TIMEOUT * 0.75, poll=1):
+            return True
+        sawtooth_logger.critical("------ UPDATE RETRY ------")
+        self.run_command(command)
+        if self.__chain_head.wait_for_height(current_chain_size + 1, UPDATE_TIMEOUT * 0.25, poll=1):
+            return True
+        logging.info("{ip}: current length {b}".format(ip=self.ip(), b=self.__chain_head.height()))
+        sawtooth_logger.critical("------ UPDATE TIMEOUT ------")
+        return False
 
     def submit_tx(self, key: str, val: str):
-        self.run_command('intkey set {key} {val}'.format(key=key, val=val))
+        if self.__api_mode != API_MODE_DIRECT:
+            self.run_command('intkey set {key} {val}'.format(key=key, val=val))
+            return
+        try:
+            result = self.submit_txs([Transaction(key=key, value=val)])[0]
+        except SawtoothRestError as e:
+            result = e
+        if isinstance(result, Exception):
+            sawtooth_logger.error("{ip}: could not submit {k}:{v} {e}".format(ip=self.ip(), k=key, v=val, e=result))
+
+    # signs the transactions on the host and posts them to /batches in one request, packed in batches of batch_size
+    # the validator rejects a batch as a whole, with batch_size=1 every transaction is a batch of its own so one it
+    # rejects (ex: setting a key that is already set) does not take the others with it
+    # returns the batch id of each transaction (in the same order as txs) or the ValueError of a transaction that is not
+    # a valid intkey transaction (it is not sent), raises SawtoothRestError if the REST API does not accept the batches
+    def submit_txs(self, txs: list, batch_size=INTKEY_BATCH_SIZE):
+        results = [None] * len(txs)
+        valid = []
+        for index, tx in enumerate(txs):
+            try:
+                check_intkey_transaction(tx)
+                valid.append(index)
+            except ValueError as e:
+                results[index] = e
+        if len(valid) == 0:
+            return results
+        if self.__api_mode != API_MODE_DIRECT:
+            for index in valid:
+                self.run_command('intkey set {key} {val}'.format(key=txs[index].key, val=txs[index].value))
+            return results
+        batch_list, batch_ids = make_batch_list(self.signer(), [txs[i] for i in valid], batch_size=batch_size)
+        sawtooth_logger.info("{ip}: submitting {t} txs".format(ip=self.ip(), t=len(valid)))
+        self.__rest.post('/batches', batch_list, content_type=BATCH_CONTENT_TYPE)
+        for index, batch_id in zip(valid, batch_ids):
+            results[index] = batch_id
+        return results
+
+    # returns {batch id: status} (BATCH_COMMITTED, BATCH_INVALID, BATCH_PENDING or BATCH_UNKNOWN) for batch ids made
+    # by submit_txs, with wait (sec) the validator answers once every batch is committed or wait runs out
+    def batch_statuses(self, batch_ids: list, wait=None):
+        statuses = {batch_id: BATCH_UNKNOWN for batch_id in batch_ids}
+        ids = [batch_id for batch_id in statuses if batch_id is not None]
+        if len(ids) == 0:
+            return statuses
+        query = '' if not wait else '?wait={}'.format(int(min(wait, BATCH_STATUS_MAX_WAIT)))
+        if self.__api_mode == API_MODE_DIRECT:
+            # posting the ids keeps a long list of them out of the url
+            result = self.__rest.request('POST', '/batch_statuses' + query, json=ids)
+        else:
+            query = '?id={i}{w}'.format(i=','.join(ids), w=query.replace('?', '&'))
+            result = self.sawtooth_api('http://localhost:8008/batch_statuses' + query)
+        for entry in result.get('data', []):
+            statuses[entry['id']] = entry['status']
+        return statuses
 
     def get_tx(self, key):
+        if self.__api_mode == API_MODE_DIRECT:
+            value = self.get_txs([key])[key]
+            return INTKEY_MISSING_VALUE if value is None else value
         value = self.run_command('intkey show {key}'.format(key=key))
         value = value.split(':')[1].strip()
         return value
 
+    # reads many intkey keys at once from the state on the host, returns {key: value} with value as a string
+    # (the same as get_tx) or None when the key is not set
+    # keys are looked up one by one unless paging through the intkey namespace takes less requests, the size of the
+    # namespace is taken from the last scan (the first read of more than STATE_LOOKUP_LIMIT keys scans)
+    def get_txs(self, keys: list):
+        if self.__api_mode != API_MODE_DIRECT:
+            values = {key: self.get_tx(key) for key in keys}
+            return {key: None if value == INTKEY_MISSING_VALUE else value for key, value in values.items()}
+        values = {key: None for key in keys}
+        addresses = {intkey_address(key) for key in values}
+        if len(addresses) <= STATE_LOOKUP_LIMIT or \
+                (self.__state_size is not None and len(addresses) < self.__state_size / STATE_PAGE_SIZE):
+            entries = self.__state_entries(addresses)
+        else:
+            entries = self.__state_scan(INTKEY_NAMESPACE, addresses)
+        for data in entries:
+            for key, value in decode_intkey_state(base64.b64decode(data)).items():
+                if key in values:
+                    values[key] = str(value)
+        return values
+
+    # returns the (base64) data stored at each address that is set, up to STATE_LOOKUP_WORKERS addresses are read at
+    # once so reading many keys costs about as many round trips as reading STATE_LOOKUP_WORKERS of them
+    def __state_entries(self, addresses):
+        addresses = list(addresses)
+        if len(addresses) <= 1:
+            entries = [self.__state_entry(address) for address in addresses]
+        else:
+            with ThreadPoolExecutor(max_workers=min(len(addresses), STATE_LOOKUP_WORKERS)) as executor:
+                entries = list(executor.map(self.__state_entry, addresses))
+        return [data for data in entries if data is not None]
+
+    # the (base64) data stored at address, None if nothing is stored there yet
+    def __state_entry(self, address: str):
+        try:
+            return self.__rest.get('/state/{}'.format(address))['data']
+        except SawtoothRestResponseError as e:
+            if e.status_code != 404:  # 404 just means nothing is stored at the address yet
+                raise
+        return None
+
+    # returns the (base64) data stored at addresses (all under prefix) that are set, all pages are read from the same
+    # state root, paging stops once every address was seen
+    def __state_scan(self, prefix: str, addresses: set):
+        entries = []
+        seen = 0
+        remaining = set(addresses)
+        request = '/state?address={p}&limit={l}'.format(p=prefix, l=STATE_PAGE_SIZE)
+        page = self.__rest.get(request)
+        while True:
+            seen += len(page['data'])
+            for entry in page['data']:
+                if entry['address'] in remaining:
+                    remaining.discard(entry['address'])
+                    entries.append(entry['data'])
+            next_position = page.get('paging', {}).get('next_position')
+            if next_position is None or len(remaining) == 0:
+                # a scan that stopped early saw only part of the namespace
+                self.__state_size = seen if self.__state_size is None else max(self.__state_size, seen)
+                return entries
+            page = self.__rest.get('{r}&head={h}&start={s}'.format(r=request, h=page['head'], s=next_position))
+
     def val_key(self):
         return self.__val_key
 
     def user_key(self):
         return self.__user_key
 
+    # signs transactions with this containers user key, the private key is read from the container once (containers
+    # with host keys already hold it)
+    def signer(self):
+        if self.__signer is None:
+            self.__signer = Secp256k1Signer.from_hex(self.run_command('cat {user_priv}'.format(
+                user_priv=USER_KEY["priv"])))
+        return self.__signer
+
     def admin_key(self):
         return self.__admin_key
 
@@ -268,10 +511,16 @@ class SawtoothContainer:
         return self.__container.id
 
     def set_admin_key(self, key=None):
-        if SawtoothContainer.__admin_key is None:
-            SawtoothContainer.__admin_key = key
-        self.run_command('/bin/sh -c "echo {key} > {file}"'.format(key=SawtoothContainer.__admin_key,
-                                                                   file=ADMIN_KEY['admin']))
+        with SawtoothContainer.__admin_key_lock:
+            if SawtoothContainer.__admin_key is None:
+                SawtoothContainer.__admin_key = key
+        if self.__user_priv is not None:
+            # containers with host keys never need an exec for keys
+            self.__container.put_archive('/', make_file_archive({
+                ADMIN_KEY['admin']: (SawtoothContainer.__admin_key, PRIVATE_KEY_MODE)}))
+        else:
+            self.run_command('/bin/sh -c "echo {key} > {file}"'.format(key=SawtoothContainer.__admin_key,
+                                                                       file=ADMIN_KEY['admin']))
 
     def id(self):
         if self.__container is None:
@@ -290,6 +539,96 @@ class SawtoothContainer:
         except AttributeError:
             return "no ip for {}".format(self.__container)
 
+    # tracks the newest block of this peers blockchain, use it instead of counting blocks()
+    def chain_head(self):
+        return self.__chain_head
+
+    # subscribes to this peers block commit and state change events the first time it is called, returns None when
+    # events can not be used (no pyzmq, validator not running or container not reachable from the host)
+    def block_events(self):
+        with self.__events_lock:
+            if self.__events is not None and self.__events.alive():
+                return self.__events
+            if self.__events is not None:
+                # the stream failed (or was made by the process this one was forked from), let go of it before
+                # subscribing again
+                try:
+                    self.__events.stop()
+                except Exception as e:
+                    sawtooth_logger.warning("{ip}: could not close block events {e}".format(ip=self.ip(), e=e))
+                self.__events = None
+            if self.__api_mode != API_MODE_DIRECT:
+                return None
+            if self.__events_failed_at is not None and time.time() - self.__events_failed_at < EVENTS_RETRY:
+                return None
+            try:
+                stream = ValidatorEventStream(VALIDATOR_EVENTS_URL.format(ip=self.ip()))
+            except ImportError:
+                sawtooth_logger.warning("{ip}: pyzmq not installed, polling for blocks".format(ip=self.ip()))
+                self.__events_failed_at = float('inf')
+                return None
+            subscriber = BlockEventSubscriber(stream)
+            block_num, block_id = self.__chain_head.head()
+            if not subscriber.start(block_id, block_num + 1):
+                stream.close()
+                self.__events_failed_at = time.time()
+                return None
+            subscriber.add_listener(self.__chain_head.observe)
+            self.__events = subscriber
+            sawtooth_logger.info("{ip}: subscribed to block events".format(ip=self.ip()))
+            return self.__events
+
+    # blocks until key is set to value, returns False if that takes longer then timeout (sec)
+    def wait_for_tx(self, key: str, value: str, timeout: float):
+        return self.wait_for_txs({key: value}, timeout)[key] is not None
+
+    # blocks until every key of values ({key: value}) is set to its value or timeout (sec) runs out
+    # returns {key: time (time.time()) the key was seen set to its value, None if it was not within timeout}
+    def wait_for_txs(self, values: dict, timeout: float):
+        end = time.time() + timeout
+        values = {key: str(value) for key, value in values.items()}
+        confirmed = {key: None for key in values}
+
+        def check():
+            found = self.get_txs([key for key in values if confirmed[key] is None])
+            now = time.time()
+            for key, value in found.items():
+                if value == values[key]:
+                    confirmed[key] = now
+            return all(at is not None for at in confirmed.values())
+
+        subscriber = self.block_events()
+        if subscriber is not None:
+            # wait before reading so a commit in between is not missed
+            futures = {subscriber.wait_for_key(key, value): key for key, value in values.items()}
+            done = check()
+            pending = {future: key for future, key in futures.items() if confirmed[key] is None}
+            streaming = True
+            while not done and streaming and len(pending) > 0:
+                finished, _ = wait_futures(pending, timeout=max(end - time.time(), 0), return_when=FIRST_COMPLETED)
+                if len(finished) == 0:
+                    break  # timed out
+                for future in finished:
+                    key = pending.pop(future)
+                    if future.cancelled():
+                        streaming = False  # the event stream went away, wait on the chain head for the rest
+                    else:
+                        confirmed[key] = time.time()
+                done = all(at is not None for at in confirmed.values())
+            for future, key in pending.items():
+                subscriber.forget(key, future)
+            if done or streaming:
+                return confirmed
+        while True:
+            height = self.__chain_head.height()
+            if check():
+                break
+            remaining = end - time.time()
+            if remaining <= 0:
+                break
+            self.__chain_head.wait_for_height(height + 1, remaining, poll=CHAIN_HEAD_POLL)
+        return confirmed
+
     # return the blocks in this peers blockchain
     def blocks(self):
         blocks = self.sawtooth_api('http://localhost:8008/blocks')
@@ -306,18 +645,66 @@ class SawtoothContainer:
     # run a command in a container, will return the output of the command
     def run_command(self, command: str):
         sawtooth_logger.info("{ip}:running command:  {command}".format(ip=self.ip(), command=command))
-        result = self.__container.exec_run(command).output.decode('utf-8').strip()
+        result = None
+        if self.__session is not None:
+            try:
+                result = self.__session.run(command)
+            except CommandNotSent as e:
+                self.__session_failed(e)
+            except ContainerSessionError as e:
+                # the shell may have run the command already, running it again could do it twice (ex: intkey set)
+                self.__session_failed(e)
+                raise
+        if result is None:
+            result = self.__container.exec_run(command).output.decode('utf-8').strip()
         sawtooth_logger.info("{ip}:command result:  {result}".format(ip=self.ip(), result=result))
         return result
 
     # start a service inside the container, will not return any output
     def run_service(self, service_start_command: str):
         sawtooth_logger.info("{ip}:starting service:  {request}".format(ip=self.ip(), request=service_start_command))
+        if self.__session is not None:
+            try:
+                self.__session.run_service(service_start_command)
+                return
+            except CommandNotSent as e:
+                self.__session_failed(e)
+            except ContainerSessionError as e:
+                self.__session_failed(e)
+                raise
         self.__container.exec_run(service_start_command, detach=True)
 
+    # a broken session is dropped and every command after it goes through exec_run, the command that found it broken
+    # only goes through exec_run as well if it was never sent (CommandNotSent)
+    def __session_failed(self, error):
+        sawtooth_logger.warning("{ip}: command session failed, using exec: {e}".format(ip=self.ip(), e=error))
+        self.__session.close()
+        self.__session = None
+
     # gets some json from the peer via a URL (ex: http://localhost:8008/blocks)
     def sawtooth_api(self, request: str):
         sawtooth_logger.info("{ip}:api request:  {request}".format(ip=self.ip(), request=request))
+        if self.__api_mode == API_MODE_DIRECT:
+            return self.__sawtooth_api_direct(request)
+        return self.__sawtooth_api_exec(request)
+
+    # the host of the URL is ignored, only the path and query are sent to this containers REST API
+    def __sawtooth_api_direct(self, request: str):
+        url = urlsplit(request)
+        path = url.path if url.query == '' else "{p}?{q}".format(p=url.path, q=url.query)
+        try:
+            result = self.__rest.get(path)
+        except SawtoothRestResponseError as e:
+            # sawtooth reports errors as json (ex: {"error": {...}}), pass it on the same way curl would
+            sawtooth_logger.warning("{ip}: api returned {c} for {r}".format(ip=self.ip(), c=e.status_code, r=request))
+            return e.body if isinstance(e.body, dict) else json.loads(json.dumps({'data': []}))
+        except SawtoothRestError as e:
+            sawtooth_logger.warning("{ip}: api failed to complete request {r}:{e}".format(ip=self.ip(), r=request, e=e))
+            return json.loads(json.dumps({'data': []}))
+        sawtooth_logger.debug("{ip}:api result: {result}".format(ip=self.ip(), result=result))
+        return result
+
+    def __sawtooth_api_exec(self, request: str):
         command = 'curl -sS {}'.format(request)
         result = self.__container.exec_run(command).output.decode('utf-8').strip()
         sawtooth_logger.debug("{ip}:api result: {result}".format(ip=self.ip(), result=result))
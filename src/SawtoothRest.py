@@ -0,0 +1,108 @@
+import os
+import time
+import logging
+import logging.handlers
+import requests
+from requests.adapters import HTTPAdapter
+
+logging.basicConfig(
+    format='%(asctime)s %(levelname)-2s %(message)s',
+    level=logging.INFO,
+    datefmt='%H:%M:%S')
+sawtooth_rest_logger = logging.getLogger(__name__)
+
+LOG_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+
+# port the sawtooth REST API listens on inside every container
+SAWTOOTH_API_PORT = 8008
+SAWTOOTH_API_URL = "http://{ip}:{port}"
+
+REST_CONNECT_TIMEOUT = 3  # sec to open a connection to the REST API
+REST_READ_TIMEOUT = 30  # sec to wait for the REST API to answer
+REST_RETRIES = 3  # attempts after the first one before giving up
+REST_BACKOFF = 0.25  # sec to wait before the first retry, doubles after every failed attempt
+REST_POOL_SIZE = 10  # keep-alive connections kept open per container
+
+# the REST API answers 503 while the validator is still starting or is unreachable, it is worth retrying those
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+def sawtooth_rest_log_to(path, console_logging=False):
+    handler = logging.handlers.RotatingFileHandler(path, backupCount=5, maxBytes=LOG_FILE_SIZE)
+    formatter = logging.Formatter('%(asctime)s %(levelname)-2s %(message)s', datefmt='%H:%M:%S')
+    handler.setFormatter(formatter)
+    sawtooth_rest_logger.propagate = console_logging
+    sawtooth_rest_logger.setLevel(os.environ.get("LOGLEVEL", "INFO"))
+    sawtooth_rest_logger.addHandler(handler)
+
+
+class SawtoothRestError(Exception):
+    pass
+
+
+# the REST API could not be reached (refused, reset or timed out) after all retries
+class SawtoothRestUnavailable(SawtoothRestError):
+    pass
+
+
+# the REST API answered but with an error status, body holds the decoded sawtooth error (if any)
+class SawtoothRestResponseError(SawtoothRestError):
+    def __init__(self, status_code, body):
+        super().__init__("sawtooth api returned {code}: {body}".format(code=status_code, body=body))
+        self.status_code = status_code
+        self.body = body
+
+
+# talks to the sawtooth REST API of one container directly from the host
+# keeps a pool of keep-alive connections open so each request does not pay for a new connection
+class SawtoothRestClient:
+
+    def __init__(self, ip, port=SAWTOOTH_API_PORT, timeout=(REST_CONNECT_TIMEOUT, REST_READ_TIMEOUT),
+                 retries=REST_RETRIES, backoff=REST_BACKOFF, pool_size=REST_POOL_SIZE):
+        self.base_url = SAWTOOTH_API_URL.format(ip=ip, port=port)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.__session.mount('http://', adapter)
+
+    def close(self):
+        self.__session.close()
+
+    # request is a path on the REST API (ex: /blocks?limit=1), returns the decoded json
+    def get(self, request: str):
+        return self.request('GET', request)
+
+    def post(self, request: str, data: bytes, content_type='application/octet-stream'):
+        return self.request('POST', request, data=data, headers={'Content-Type': content_type})
+
+    def request(self, method: str, request: str, **kwargs):
+        url = self.base_url + request
+        delay = self.backoff
+        attempt = 0
+        while True:
+            try:
+                response = self.__session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if attempt >= self.retries:
+                    raise SawtoothRestUnavailable("{m} {u} failed: {e}".format(m=method, u=url, e=e)) from e
+                sawtooth_rest_logger.debug("{u}: {e}, retrying in {d}s".format(u=url, e=e, d=delay))
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    return self.__decode(response)
+                sawtooth_rest_logger.debug("{u}: got {c}, retrying in {d}s".format(u=url, c=response.status_code,
+                                                                                 d=delay))
+            attempt += 1
+            time.sleep(delay)
+            delay *= 2
+
+    @staticmethod
+    def __decode(response):
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        if response.status_code >= 400:
+            raise SawtoothRestResponseError(response.status_code, body)
+        return body
@@ -1,7 +1,9 @@
 import requests
 
 from src.api import create_app
-from src.api.constants import PBFT_INSTANCES, QUORUMS, NEIGHBOURS, API_IP, PORT, DOCKER_IP, QUORUM_ID
+from src.Intersection import run_per_committee, IntersectionError
+from src.api.constants import PBFT_INSTANCES, QUORUMS, NEIGHBOURS, API_IP, PORT, DOCKER_IP, QUORUM_ID, ROUTING
+from src.api.constants import SESSIONS
 import logging
 import logging.handlers
 import multiprocessing as mp
@@ -69,13 +71,18 @@ class SmartShardPeer:
     def committee_id_b(self):
         return self.app.api.config[PBFT_INSTANCES].committee_id_b
 
+    # every committee the peer is in (two for peers made with committee a and b)
+    def committee_ids(self):
+        return self.app.api.config[PBFT_INSTANCES].committee_ids()
+
     def peer_port(self):
         return self.port
 
     def check_neighbors(self, port):
         url = "http://localhost:{port}/quoruminfo/".format(port=port)
-        recv_neighbors = json.loads(requests.post(url, json={}).text)["neighbors"]
+        recv_neighbors = json.loads(self.app.api.config[SESSIONS].post(url, json={}).text)["neighbors"]
         self.app.api.config[QUORUMS] = recv_neighbors
+        self.app.api.config[ROUTING].replace(recv_neighbors)
 
     # Leave the network cooperatively
     def leave(self):
@@ -85,37 +92,34 @@ class SmartShardPeer:
         quorum_ids = list(quorums.keys())
 
         inter = self.app.api.config[PBFT_INSTANCES]
-        instance_a = inter.instance_a
-        instance_b = inter.instance_b
-        id_a = inter.committee_id_a
-        id_b = inter.committee_id_b
-        val_key_a = inter.val_key(id_a)
-        val_key_b = inter.val_key(id_b)
-
-        a_leave_success = instance_a.leave_network(val_key_a)
-        b_leave_success = instance_b.leave_network(val_key_b)
+        # every committee is left at the same time, a committee that raised counts as not left
+        work = {committee_id: lambda i=instance, k=inter.val_key(committee_id): i.leave_network(k)
+                for committee_id, instance in inter.instances().items()}
+        try:
+            left = run_per_committee(work)
+        except IntersectionError as e:
+            left = dict(e.results)
+            left.update({committee_id: False for committee_id in e.errors})
 
-        if a_leave_success and b_leave_success:
+        if all(left.values()):
             # Remove self from network
             self.app.terminate()
             self.app.join()
         else:
-            if not a_leave_success:
-                logging.error(("{}: SmartShard API on " + instance_a.ip() + " was unable to cooperatively leave committee " + str(id_a) + " - rejoining.").format(instance_a.ip()))
-                instance_a.rejoin_network()
-            if not b_leave_success:
-                logging.error(("{}: SmartShard API on " + instance_b.ip() + " was unable to cooperatively leave committee " + str(id_b) + " - rejoining.").format(instance_b.ip()))
-                instance_b.rejoin_network()
+            for committee_id, success in left.items():
+                if not success:
+                    instance = inter.instance(committee_id)
+                    logging.error(("{}: SmartShard API on " + instance.ip() + " was unable to cooperatively leave committee " + str(committee_id) + " - rejoining.").format(instance.ip()))
+                    instance.rejoin_network()
             return False
 
         
         try:
             iter(quorums)
         except:
-            logging.error(("{}: SmartShard API on " + instance_a.ip() + " was unable to cooperatively leave committee " + str(id_a) + " - rejoining.").format(instance_a.ip()))
-            instance_a.rejoin_network()
-            logging.error(("{}: SmartShard API on " + instance_b.ip() + " was unable to cooperatively leave committee " + str(id_b) + " - rejoining.").format(instance_b.ip()))
-            instance_b.rejoin_network()
+            for committee_id, instance in inter.instances().items():
+                logging.error(("{}: SmartShard API on " + instance.ip() + " was unable to cooperatively leave committee " + str(committee_id) + " - rejoining.").format(instance.ip()))
+                instance.rejoin_network()
             return False
 
         # Notify neighbors to remove this peer
@@ -133,7 +137,7 @@ class SmartShardPeer:
                 while attempts < 5:
                     attempts += 1
                     try:
-                        requests.post(url, json={})
+                        self.app.api.config[SESSIONS].post(url, json={})
                     except requests.exceptions.ConnectionError:
                         logging.error("SmartShardPeer PID " + str(self.pid()) + ", port " + str(self.port) + " - co-op leave notif connection refused by peer " + neighbor_ip + str(neighbor_port) + ".")
                         logging.info("SmartShardPeer PID " + str(self.pid()) + ", port " + str(self.port) + " waiting for 5 seconds to retry...")
@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import docker
+import docker.errors
+import threading
+import logging
+import time
+import os
+
+teardown_logger = logging.getLogger(__name__)
+
+# containers killed and removed at the same time
+TEARDOWN_WORKERS = 16
+# every container made by SawtoothContainer carries this label, its value names the experiment the container is part of
+EXPERIMENT_LABEL = "smartshards.experiment"
+DEFAULT_EXPERIMENT = "smartshards"
+
+
+# kills and removes containers in the background with bounded parallelism so dropping a peer (SawtoothContainer.__del__)
+# does not block on docker
+# client is a docker client, only needed by teardown (made with docker.from_env the first time it is needed)
+# NOTE: threads do not survive a fork (the api runs in its own process, see SmartShardPeer) so the workers start with
+# the first container queued in a process, a forked child starts over with workers and a queue of its own
+class TeardownManager:
+
+    def __init__(self, client=None, workers=TEARDOWN_WORKERS):
+        self.__client = client
+        self.__workers = workers
+        self.__lock = threading.Lock()
+        self.__executor = None
+        self.__pid = os.getpid()
+        self.__pending = set()
+        self.__removed = 0
+
+    # queues container (a docker container) to be killed and removed, returns right away
+    def enqueue(self, container):
+        self.__after_fork()
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=self.__workers)
+            executor = self.__executor
+        try:
+            future = executor.submit(self.__remove, container)
+        except RuntimeError:  # the executor is gone (ex: the interpreter is shutting down), remove it here
+            self.__remove(container)
+            return
+        with self.__lock:
+            self.__pending.add(future)
+        future.add_done_callback(self.__done)
+
+    # number of containers still waiting to be removed
+    def pending(self):
+        self.__after_fork()
+        with self.__lock:
+            return len(self.__pending)
+
+    # blocks until every queued container is removed (or timeout sec passed)
+    # returns {'containers': containers removed since the last drain, 'seconds': time spent waiting}
+    def drain(self, timeout=None):
+        start = time.time()
+        self.__after_fork()
+        with self.__lock:
+            pending = list(self.__pending)
+        wait(pending, timeout=timeout)
+        with self.__lock:
+            removed, self.__removed = self.__removed, 0
+        return {'containers': removed, 'seconds': time.time() - start}
+
+    # kills and removes every container of experiment (every sawtooth container if None, every container if everything
+    # is True) and waits for it to finish, returns the same report as drain
+    def teardown(self, experiment=None, everything=False, timeout=None):
+        start = time.time()
+        if self.__client is None:
+            self.__client = docker.from_env()
+        if everything:
+            filters = {}
+        elif experiment is None:
+            filters = {'label': EXPERIMENT_LABEL}
+        else:
+            filters = {'label': '{}={}'.format(EXPERIMENT_LABEL, experiment)}
+        for container in self.__client.containers.list(all=True, filters=filters):
+            self.enqueue(container)
+        report = self.drain(timeout)
+        report['seconds'] = time.time() - start
+        teardown_logger.info("tore down {c} containers in {t:.1f}s".format(c=report['containers'], t=report['seconds']))
+        return report
+
+    # the workers, the queue and the lock (a thread of the parent may have held it) of a parent are of no use in a
+    # forked child
+    def __after_fork(self):
+        if self.__pid != os.getpid():
+            self.__pid = os.getpid()
+            self.__lock = threading.Lock()
+            self.__executor = None
+            self.__pending = set()
+            self.__removed = 0
+
+    def __remove(self, container):
+        try:
+            container.remove(force=True)  # kills it first if it is still running
+        except docker.errors.NotFound:
+            pass  # already gone
+        except docker.errors.APIError as e:
+            if e.status_code != 409:  # 409: removal already in progress
+                teardown_logger.error("could not remove container {id}: {e}".format(id=container.id, e=e))
+                return
+        with self.__lock:
+            self.__removed += 1
+
+    def __done(self, future):
+        with self.__lock:
+            self.__pending.discard(future)
+
+
+_default_manager = TeardownManager()
+
+
+# the manager used by SawtoothContainer and util.stop_all_containers
+def teardown_manager():
+    return _default_manager
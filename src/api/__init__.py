@@ -1,6 +1,14 @@
 from flask import Flask
 from src.api.routes import add_routes
-from src.api.constants import SECRET, PBFT_INSTANCES, DOCKER_NETWORK, QUORUMS
+from src.api.constants import SECRET, PBFT_INSTANCES, DOCKER_NETWORK, QUORUMS, BATCHER, COALESCER
+from src.api.constants import EXECUTORS, WAITERS, ROUTING, SESSIONS, SELECTOR, BREAKERS
+from src.api.batcher import MicroBatcher
+from src.api.coalesce import SingleFlight
+from src.api.routing import RoutingIndex
+from src.api.sessions import NeighbourSessions
+from src.api.selection import NeighbourSelector
+from src.api.breaker import NeighbourBreakers
+from src.api.executors import QuorumExecutors, WAIT_WORKERS, WAIT_QUEUE_SIZE
 from src.SawtoothPBFT import DEFAULT_DOCKER_NETWORK
 
 
@@ -16,6 +24,24 @@ def create_app(instances=None):
     # QUORUM_ID: other quorum that can be reached by this API (in the ex quorum A can reach B via 192.168.1.1:8080)
     # ex: {'a':[{API_IP:192.168.1.1, PORT_KEY:8080, QUORUM_ID:'b'},{IP_ADDRESS:192.168.1.2 ...
     new_app.config[QUORUMS] = {}
+    # the neighbours of QUORUMS by the quorum they reach, used to pick where to forward to
+    new_app.config[ROUTING] = RoutingIndex()
+    # keep-alive connections to the neighbours, used for every request sent to another peer
+    new_app.config[SESSIONS] = NeighbourSessions()
+    # picks the neighbour a forward goes to by how fast and busy each one has been
+    new_app.config[SELECTOR] = NeighbourSelector()
+    # neighbours that keep failing are skipped for a while and their requests go to other neighbours of the quorum
+    new_app.config[BREAKERS] = NeighbourBreakers()
+
+    # submissions for a quorum are collected and sent to its container in one request, the submissions come from
+    # different clients so each is a sawtooth batch of its own and one that is rejected fails alone
+    new_app.config[BATCHER] = MicroBatcher(lambda txs: new_app.config[PBFT_INSTANCES].submit_txs(txs, batch_size=1))
+    # identical reads made at the same time share one container call or forward
+    new_app.config[COALESCER] = SingleFlight()
+    # container calls run on bounded workers of their quorum so a slow quorum does not hold up requests for the others
+    new_app.config[EXECUTORS] = QuorumExecutors()
+    # calls that wait for commits have workers of their own so they do not take the workers of reads
+    new_app.config[WAITERS] = QuorumExecutors(workers=WAIT_WORKERS, queue_size=WAIT_QUEUE_SIZE)
 
     add_routes(new_app)
 
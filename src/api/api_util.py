@@ -1,10 +1,12 @@
-from src.api.constants import API_IP, QUORUMS, PORT, QUORUM_ID, ROUTE_EXECUTION_FAILED
+from src.api.constants import ROUTE_EXECUTION_FAILED, ROUTING, SESSIONS, SELECTOR, COALESCER, HOPS_HEADER, BREAKERS
+from src.api.sessions import NeighbourBusy
+from requests.exceptions import RequestException, ConnectionError as RequestConnectionError
+from flask import request, has_request_context
 import os
 import logging
 import logging.handlers
-import requests
-import random
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(
     format='%(asctime)s %(levelname)-2s %(message)s',
@@ -14,6 +16,11 @@ api_util_logger = logging.getLogger(__name__)
 
 LOG_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 URL_REQUEST = "http://{hostname}:{port}/"
+FORWARD_WORKERS = 16  # forwards sent at the same time by forward_many
+MAX_HOPS = 8  # peers a request may pass through before it is dropped, stops requests going in circles
+ROUTE_DISCOVERY_DEPTH = 3  # how far (in peers) intersections are asked for when a quorum can not be reached
+ROUTE_DISCOVERY_TIMEOUT = 5  # sec a peer gets to answer /edges/ for every peer it has to ask in turn (depth)
+ROUTE_DISCOVERY_CONNECT_TIMEOUT = 3
 
 
 def util_log_to(path, console_logging=False):
@@ -38,34 +45,149 @@ def get_plain_text(response):
         api_util_logger.error("{}: could not get text with response.text".format(__name__))
 
 
-# this function is made to work with a flask app and cannot be used with out passing one to it as app
-def forward(app, url_subdirectory: str, quorum_id: str, json_data):
-    neighbour__in_target_quorum = []
-    app.logger.info('Looking for neighbour to forward request to')
-    app.logger.debug('request:')
-    app.logger.debug(json_data)
-    for check_quorum_id in list(app.config[QUORUMS].keys()):
-        for intersecting_quorum in app.config[QUORUMS][check_quorum_id]:
-            intersecting_quorum_id = intersecting_quorum[QUORUM_ID]
-            if intersecting_quorum_id == quorum_id:
-                neighbour__in_target_quorum.append(intersecting_quorum)
-    
-    forwarding_to_neighbour = random.choice(neighbour__in_target_quorum)
-    url = URL_REQUEST.format(hostname=forwarding_to_neighbour[API_IP],
-                            port=forwarding_to_neighbour[PORT])
+# hops the request being handled has made so far (0 if it came from a client or there is no request)
+def current_hops():
+    if not has_request_context():
+        return 0
+    try:
+        return int(request.headers.get(HOPS_HEADER, 0))
+    except ValueError:
+        return 0
+
+
+# asks every neighbour for the intersections it knows of (up to depth peers away) and adds them to app.config[ROUTING]
+# visited are the peers (ip:port) already asked on the way here, they are not asked again, the peers this one asks are
+# added to it before it is passed on so every peer is asked about once per discovery
+# returns how many intersections were new
+def discover_routes(app, depth=ROUTE_DISCOVERY_DEPTH, visited=()):
+    addresses = [a for a in app.config[ROUTING].addresses() if '{}:{}'.format(*a) not in visited]
+    if depth < 1 or len(addresses) == 0:
+        return 0
+    passed_on = set(visited) | {'{}:{}'.format(*a) for a in addresses}
+    if has_request_context():
+        passed_on.add(request.host)  # this peer as the peer that asked it sees it
+    params = {'visited': ','.join(sorted(passed_on))}
+    timeout = (ROUTE_DISCOVERY_CONNECT_TIMEOUT, ROUTE_DISCOVERY_TIMEOUT * depth)
+
+    def ask(address):
+        url = URL_REQUEST.format(hostname=address[0], port=address[1]) + "edges/{}".format(depth - 1)
+        try:
+            return app.config[ROUTING].learn(json.loads(app.config[SESSIONS].get(url, params=params,
+                                                                                 timeout=timeout).text))
+        except Exception as e:  # ex: neighbour left, only the intersections of the other neighbours are used
+            app.logger.error("could not get intersections from {u}: {e}".format(u=url, e=e))
+            return 0
+
+    with ThreadPoolExecutor(max_workers=min(len(addresses), FORWARD_WORKERS)) as executor:
+        return sum(executor.map(ask, addresses))
+
+
+# sends one forward to neighbour and returns the response text, raises RequestException if the neighbour did not answer
+# how it went is recorded with the selector and the circuit breaker of neighbour, NeighbourBusy (every connection of
+# this peer to neighbour is taken) is not held against the neighbour
+def send_to_neighbour(app, neighbour, url_subdirectory: str, json_data, measure: bool, hops: int):
+    url = URL_REQUEST.format(hostname=neighbour.ip, port=neighbour.port)
     url += url_subdirectory
     app.logger.info("request in quorum this peer is not a member of forwarding to "
                     "{}".format(url))
+    started = app.config[SELECTOR].start(neighbour)
+    failed = True
+    busy = False
     try:
-        forwarding_request = requests.post(url, json=json_data)
+        # requests that are slow on purpose go over their own connections (see NeighbourSessions)
+        forwarding_request = app.config[SESSIONS].post(url, json=json_data, headers={HOPS_HEADER: str(hops + 1)},
+                                                       held=not measure)
         forwarding_request = get_plain_text(forwarding_request)
         app.logger.info("response form forward is {}".format(forwarding_request))
+        failed = False
         return forwarding_request
-    except ConnectionError as e:
-        app.logger.error("{host}:{port} unreachable".format(host=forwarding_to_neighbour[API_IP],
-                                                            port=forwarding_to_neighbour[PORT]))
-        app.logger.error(e)
-        return ROUTE_EXECUTION_FAILED.format(msg="forward to {} failed".format(url))
+    except NeighbourBusy:
+        busy = True
+        raise
+    finally:
+        if busy:
+            app.config[SELECTOR].finish(neighbour, started, measure=False)
+            app.config[BREAKERS].release(neighbour)
+        else:
+            app.config[SELECTOR].finish(neighbour, started, failed=failed, measure=measure)
+            if failed:
+                app.config[BREAKERS].failure(neighbour)
+            else:
+                app.config[BREAKERS].success(neighbour)
+
+
+# this function is made to work with a flask app and cannot be used with out passing one to it as app
+# measure is False for requests the neighbour holds on purpose (ex: /wait/) so they do not make it look slow
+# the request goes to a neighbour in quorum_id if there is one, otherwise to a neighbour on a shortest path to it, which
+# forwards it again, hops is how many peers the request has been through (read from the request being handled if None)
+# neighbours whose circuit breaker is open are skipped, if a neighbour can not be connected to the next one is tried
+# a neighbour that got the request but did not answer (ex: read timeout) is not retried elsewhere, it may have applied
+# the request already and submits are not idempotent
+def forward(app, url_subdirectory: str, quorum_id: str, json_data, measure=True, hops=None):
+    app.logger.info('Looking for neighbour to forward request to')
+    app.logger.debug('request:')
+    app.logger.debug(json_data)
+    hops = current_hops() if hops is None else hops
+    if hops >= MAX_HOPS:
+        app.logger.error("request for quorum {q} dropped after {h} hops".format(q=quorum_id, h=hops))
+        return ROUTE_EXECUTION_FAILED.format(msg="no route to quorum {} within {} hops".format(quorum_id, MAX_HOPS))
+    candidates = app.config[ROUTING].route(quorum_id)
+    if len(candidates) == 0 and not app.config[ROUTING].missed(quorum_id):
+        # only one discovery runs at a time, requests missing a quorum meanwhile wait for it
+        app.config[COALESCER].do(('routes',), lambda: discover_routes(app))
+        candidates = app.config[ROUTING].route(quorum_id)
+        if len(candidates) == 0:
+            app.config[ROUTING].miss(quorum_id)  # a stale or mistyped quorum id does not start a discovery every time
+    if len(candidates) == 0:
+        raise IndexError("no neighbour reaches quorum {}".format(quorum_id))
+
+    tried = set()
+    while True:
+        available = app.config[BREAKERS].available([n for n in candidates if n not in tried])
+        if len(available) == 0:
+            app.logger.error("no neighbour answering for quorum {}".format(quorum_id))
+            return ROUTE_EXECUTION_FAILED.format(msg="forward to quorum {} failed, no neighbour answered".format(
+                quorum_id))
+        forwarding_to_neighbour = app.config[SELECTOR].choose(available)
+        tried.add(forwarding_to_neighbour)
+        if not app.config[BREAKERS].allow(forwarding_to_neighbour):
+            continue  # another request is already trying this neighbour after its cool down
+        try:
+            return send_to_neighbour(app, forwarding_to_neighbour, url_subdirectory, json_data, measure, hops)
+        except NeighbourBusy as e:  # nothing was sent, the neighbour may be fine
+            app.logger.error("no free connection to {host}:{port}".format(host=forwarding_to_neighbour.ip,
+                                                                         port=forwarding_to_neighbour.port))
+            app.logger.error(e)
+        except RequestConnectionError as e:  # ConnectTimeout is one as well, nothing was sent
+            app.logger.error("{host}:{port} unreachable".format(host=forwarding_to_neighbour.ip,
+                                                                port=forwarding_to_neighbour.port))
+            app.logger.error(e)
+        except RequestException as e:
+            app.logger.error("{host}:{port} did not answer".format(host=forwarding_to_neighbour.ip,
+                                                                   port=forwarding_to_neighbour.port))
+            app.logger.error(e)
+            return ROUTE_EXECUTION_FAILED.format(msg="forward to quorum {} failed, {}:{} did not answer".format(
+                quorum_id, forwarding_to_neighbour.ip, forwarding_to_neighbour.port))
+
+
+# forwards one request per quorum at the same time, json_by_quorum is {quorum id: json to send to url_subdirectory}
+# returns {quorum id: response text}, a quorum that could not be forwarded to gets ROUTE_EXECUTION_FAILED
+# hops is read from the request being handled if None (give it when calling from outside of the request)
+def forward_many(app, url_subdirectory: str, json_by_quorum: dict, measure=True, hops=None):
+    hops = current_hops() if hops is None else hops  # the forwards run outside of the request
+
+    def send(quorum_id):
+        try:
+            return forward(app, url_subdirectory, quorum_id, json_by_quorum[quorum_id], measure, hops)
+        except Exception as e:  # ex: no neighbour in the quorum
+            app.logger.error("could not forward to quorum {q}: {e}".format(q=quorum_id, e=e))
+            return ROUTE_EXECUTION_FAILED.format(msg="no route to quorum {}".format(quorum_id))
+
+    quorum_ids = list(json_by_quorum.keys())
+    if len(quorum_ids) == 0:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(quorum_ids), FORWARD_WORKERS)) as executor:
+        return dict(zip(quorum_ids, executor.map(send, quorum_ids)))
 
 
 # Creates a blank intersection map based on the quorums
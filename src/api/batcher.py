@@ -0,0 +1,137 @@
+from concurrent.futures import Future
+import threading
+import logging
+import time
+
+batcher_logger = logging.getLogger(__name__)
+
+# most transactions put in one flush (one request to the REST API of the quorum)
+BATCH_MAX_SIZE = 100
+# longest (sec) a transaction waits for others to join its batch
+BATCH_MAX_DELAY = 0.05
+# shortest (sec) a batch is held open, lets transactions that arrive at the same moment share a batch
+BATCH_MIN_DELAY = 0.002
+# weight of the newest gap between two submissions in the arrival rate estimate
+ARRIVAL_WEIGHT = 0.2
+
+
+# collects the transactions of one quorum and hands them to flush(txs) as one list
+# the batch is flushed when it holds as many transactions as are expected to arrive within max_delay (at most
+# max_size) or when its oldest transaction waited as long as a full batch is expected to take to arrive (between
+# min_delay and max_delay), so a quiet quorum flushes right away and a busy one fills its batches
+class QuorumBatcher:
+
+    def __init__(self, flush, max_size=BATCH_MAX_SIZE, max_delay=BATCH_MAX_DELAY, min_delay=BATCH_MIN_DELAY):
+        self.__flush = flush
+        self.__max_size = max_size
+        self.__max_delay = max_delay
+        self.__min_delay = min_delay
+        self.__condition = threading.Condition()
+        self.__pending = []  # (tx, future)
+        self.__oldest = None  # time the oldest pending tx arrived
+        self.__last_arrival = None
+        self.__gap = None  # moving average of the sec between two submissions
+        self.__thread = None
+        self.__batches = 0
+        self.__flushed = 0
+
+    # queues tx, the future resolves with what flush returned for it once its batch is flushed
+    def submit(self, tx):
+        future = Future()
+        with self.__condition:
+            now = time.time()
+            if self.__last_arrival is not None:
+                gap = now - self.__last_arrival
+                self.__gap = gap if self.__gap is None else ARRIVAL_WEIGHT * gap + (1 - ARRIVAL_WEIGHT) * self.__gap
+            self.__last_arrival = now
+            if not self.__pending:
+                self.__oldest = now
+            self.__pending.append((tx, future))
+            # threads do not survive a fork (the api runs in its own process) so the flusher starts with the first tx
+            if self.__thread is None or not self.__thread.is_alive():
+                self.__thread = threading.Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+        return future
+
+    # how many transactions a batch waits for
+    def batch_size(self):
+        with self.__condition:
+            return self.__batch_size()
+
+    # how long (sec) a batch is held open
+    def delay(self):
+        with self.__condition:
+            return self.__delay()
+
+    def stats(self):
+        with self.__condition:
+            return {'batches': self.__batches, 'transactions': self.__flushed, 'pending': len(self.__pending),
+                    'batch_size': self.__batch_size(), 'delay': self.__delay()}
+
+    def __batch_size(self):
+        if self.__gap is None or self.__gap <= 0:
+            return self.__max_size
+        return int(max(1, min(self.__max_size, self.__max_delay / self.__gap)))
+
+    def __delay(self):
+        if self.__gap is None:
+            return self.__min_delay
+        return max(self.__min_delay, min(self.__max_delay, self.__gap * self.__batch_size()))
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__pending:
+                    self.__condition.wait()
+                while len(self.__pending) < self.__batch_size():
+                    remaining = self.__oldest + self.__delay() - time.time()
+                    if remaining <= 0:
+                        break
+                    self.__condition.wait(remaining)
+                batch, self.__pending = self.__pending[:self.__max_size], self.__pending[self.__max_size:]
+                self.__oldest = time.time() if self.__pending else None
+            self.__send(batch)
+
+    def __send(self, batch: list):
+        try:
+            results = self.__flush([tx for tx, _ in batch])
+        except Exception as e:
+            batcher_logger.error("flush of {} transactions failed: {}".format(len(batch), e))
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self.__condition:
+            self.__batches += 1
+            self.__flushed += len(batch)
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+# one QuorumBatcher per quorum in front of flush(txs) (ex: Intersection.submit_txs), flush gets transactions of one
+# quorum at a time and returns one result per transaction, an exception in place of a result fails only the future of
+# that transaction
+class MicroBatcher:
+
+    def __init__(self, flush, max_size=BATCH_MAX_SIZE, max_delay=BATCH_MAX_DELAY, min_delay=BATCH_MIN_DELAY):
+        self.__flush = flush
+        self.__options = {'max_size': max_size, 'max_delay': max_delay, 'min_delay': min_delay}
+        self.__lock = threading.Lock()
+        self.__quorums = {}
+
+    def submit(self, tx):
+        quorum_id = str(tx.quorum_id)
+        with self.__lock:
+            if quorum_id not in self.__quorums:
+                self.__quorums[quorum_id] = QuorumBatcher(self.__flush, **self.__options)
+            batcher = self.__quorums[quorum_id]
+        return batcher.submit(tx)
+
+    # {quorum id: QuorumBatcher.stats()}
+    def stats(self):
+        with self.__lock:
+            quorums = dict(self.__quorums)
+        return {quorum_id: batcher.stats() for quorum_id, batcher in quorums.items()}
@@ -0,0 +1,118 @@
+import threading
+import logging
+import time
+
+breaker_logger = logging.getLogger(__name__)
+
+# failed requests in a row after which a neighbour is skipped
+BREAKER_FAILURES = 3
+# sec a neighbour is skipped before one request is let through to see if it is back
+BREAKER_COOLDOWN = 10
+
+CLOSED = 'closed'  # requests go through
+OPEN = 'open'  # requests are not sent, the neighbour failed too often
+HALF_OPEN = 'half_open'  # the cool down is over, one request is let through and decides if it closes or opens again
+
+
+# circuit breaker of one neighbour
+class CircuitBreaker:
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.__max_failures = failures
+        self.__cooldown = cooldown
+        self.__state = CLOSED
+        self.__failures = 0
+        self.__opened_at = 0
+        self.__probing = False  # a half open breaker lets only one request through at a time
+        self.__trips = 0
+
+    @property
+    def state(self):
+        if self.__state == OPEN and time.time() - self.__opened_at >= self.__cooldown:
+            return HALF_OPEN
+        return self.__state
+
+    # True if a request could be sent now, does not take the trial request of a half open breaker
+    def ready(self):
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self.__probing)
+
+    # True if a request may be sent now, the caller has to report how it went with success or failure
+    def allow(self):
+        if not self.ready():
+            return False
+        if self.state == HALF_OPEN:
+            self.__state = HALF_OPEN
+            self.__probing = True
+        return True
+
+    def success(self):
+        self.__state = CLOSED
+        self.__failures = 0
+        self.__probing = False
+
+    # the request let through by allow was not sent after all (ex: no free connection on this side), nothing is
+    # learned about the neighbour but a half open breaker can let the next trial request through
+    def release(self):
+        self.__probing = False
+
+    # returns True if the breaker opened
+    def failure(self):
+        self.__failures += 1
+        if self.__state == HALF_OPEN or self.__failures >= self.__max_failures:
+            self.__state = OPEN
+            self.__opened_at = time.time()
+            self.__probing = False
+            self.__trips += 1
+            return True
+        return False
+
+    def stats(self):
+        return {'state': self.state, 'failures': self.__failures, 'trips': self.__trips}
+
+
+# one CircuitBreaker per neighbour so forward stops sending to a neighbour that is down (and holding a worker until
+# its timeout) and fails over to the other neighbours that reach the same quorum
+# neighbours are Neighbour records (see RoutingIndex), they are told apart by ip and port
+class NeighbourBreakers:
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.__options = {'failures': failures, 'cooldown': cooldown}
+        self.__lock = threading.Lock()
+        self.__breakers = {}  # ip:port: CircuitBreaker
+
+    # the candidates a request can be sent to now
+    def available(self, candidates):
+        with self.__lock:
+            return tuple(n for n in candidates if self.__breaker(n).ready())
+
+    def allow(self, neighbour):
+        with self.__lock:
+            return self.__breaker(neighbour).allow()
+
+    def success(self, neighbour):
+        with self.__lock:
+            self.__breaker(neighbour).success()
+
+    def release(self, neighbour):
+        with self.__lock:
+            self.__breaker(neighbour).release()
+
+    def failure(self, neighbour):
+        with self.__lock:
+            opened = self.__breaker(neighbour).failure()
+        if opened:
+            breaker_logger.warning("{ip}:{port} failed, not forwarding to it for {c} sec".format(
+                ip=neighbour.ip, port=neighbour.port, c=self.__options['cooldown']))
+
+    # {ip:port: {'state', 'failures' (in a row), 'trips' (times opened)}}
+    def stats(self):
+        with self.__lock:
+            return {key: breaker.stats() for key, breaker in self.__breakers.items()}
+
+    # call with the lock held
+    def __breaker(self, neighbour):
+        key = '{ip}:{port}'.format(ip=neighbour.ip, port=neighbour.port)
+        if key not in self.__breakers:
+            self.__breakers[key] = CircuitBreaker(**self.__options)
+        return self.__breakers[key]
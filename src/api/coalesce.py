@@ -0,0 +1,43 @@
+from concurrent.futures import Future
+import threading
+
+
+# runs one call per key at a time, callers asking for a key that is already being fetched wait for that call and share
+# its result (or exception) instead of making their own
+class SingleFlight:
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__in_flight = {}  # key: Future
+        self.__calls = 0
+        self.__shared = 0
+
+    # returns fn() or the result of the fn already running for key
+    def do(self, key, fn):
+        with self.__lock:
+            future = self.__in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.__in_flight[key] = future
+                self.__calls += 1
+            else:
+                self.__shared += 1
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(fn())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.__lock:
+                del self.__in_flight[key]
+        return future.result()
+
+    # calls: backend calls made, shared: requests answered by another requests call
+    # ratio: requests per backend call (1 means nothing was coalesced)
+    def stats(self):
+        with self.__lock:
+            requests = self.__calls + self.__shared
+            return {'calls': self.__calls, 'shared': self.__shared,
+                    'ratio': requests / self.__calls if self.__calls else 1.0}
@@ -7,6 +7,14 @@ PORT = 'port'
 NEIGHBOURS = 'neighbours'
 SECRET = 'SECRET_KEY'
 PBFT_INSTANCES = 'instances'
+BATCHER = 'batcher'
+COALESCER = 'coalescer'
+EXECUTORS = 'executors'
+WAITERS = 'waiters'
+ROUTING = 'routing'
+SESSIONS = 'sessions'
+SELECTOR = 'selector'
+BREAKERS = 'breakers'
 DOCKER_NETWORK = 'network'
 QUORUM_ID = 'quorum_id'
 QUORUM_MEMBERS = 'quorum_members'
@@ -15,3 +23,14 @@ ROUTE_EXECUTED_CORRECTLY = "SUCCESS!"
 ROUTE_EXECUTION_FAILED = "ERROR: {msg}"
 TRANSACTION_KEY = "key"
 TRANSACTION_VALUE = "value"
+TRANSACTION_KEYS = "keys"
+TRANSACTIONS = "transactions"
+TRANSACTION_STATUS = "status"
+BATCH_ID = "batch_id"
+RECEIPTS = "receipts"
+STATUS_WAIT = "wait"
+WAIT_TIMEOUT = "timeout"
+CONFIRMED = "confirmed"
+WAITED = "waited"
+READ_CACHE = "read_cache"
+HOPS_HEADER = "X-SmartShards-Hops"
@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import threading
+import logging
+
+executors_logger = logging.getLogger(__name__)
+
+# container calls of one quorum that run at the same time
+QUORUM_WORKERS = 4
+# container calls of one quorum that may wait for a worker, calls past this are turned away right away
+QUORUM_QUEUE_SIZE = 64
+# longest (sec) a request waits for its container call
+QUORUM_TIMEOUT = 30
+# calls that spend most of their time waiting on the chain (ex: long polls) get their own workers, they cost the
+# container little so many more of them can run at once
+WAIT_WORKERS = 32
+WAIT_QUEUE_SIZE = 256
+
+
+# raised when a quorum can not take a call right now, the call was not run (or its answer was not waited for)
+class QuorumUnavailable(Exception):
+    pass
+
+
+# raised when every worker and queue slot of the quorum is taken
+class QuorumBusy(QuorumUnavailable):
+    pass
+
+
+# raised when the call did not finish within the timeout, it keeps its worker until the container answers
+class QuorumTimeout(QuorumUnavailable):
+    pass
+
+
+# runs the container calls of one quorum on its own bounded set of threads so a slow quorum (ex: one going through a
+# view change) only fills its own workers and queue
+class QuorumExecutor:
+
+    def __init__(self, quorum_id, workers=QUORUM_WORKERS, queue_size=QUORUM_QUEUE_SIZE, timeout=QUORUM_TIMEOUT):
+        self.__quorum_id = quorum_id
+        self.__workers = workers
+        self.__timeout = timeout
+        self.__slots = threading.BoundedSemaphore(workers + queue_size)
+        self.__lock = threading.Lock()
+        self.__executor = None
+        self.__in_flight = 0
+        self.__completed = 0
+        self.__rejected = 0
+        self.__timed_out = 0
+
+    # starts fn() on a worker of the quorum and returns its future, raises QuorumBusy if the queue is full
+    def submit(self, fn):
+        if not self.__slots.acquire(blocking=False):
+            with self.__lock:
+                self.__rejected += 1
+            executors_logger.warning("quorum {} is busy, call turned away".format(self.__quorum_id))
+            raise QuorumBusy("quorum {} is busy".format(self.__quorum_id))
+        with self.__lock:
+            # threads do not survive a fork (the api runs in its own process) so the workers start with the first call
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=self.__workers)
+            self.__in_flight += 1
+        try:
+            future = self.__executor.submit(fn)
+        except Exception:
+            self.__done(None)
+            raise
+        future.add_done_callback(self.__done)
+        return future
+
+    # returns the result of future (made by submit), raises QuorumTimeout if it did not finish in time
+    def wait(self, future, timeout=None):
+        try:
+            return future.result(timeout=self.__timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            with self.__lock:
+                self.__timed_out += 1
+            executors_logger.error("call to quorum {} timed out".format(self.__quorum_id))
+            raise QuorumTimeout("quorum {} did not answer in time".format(self.__quorum_id))
+
+    # runs fn() on a worker of the quorum and returns what it returned
+    def run(self, fn, timeout=None):
+        return self.wait(self.submit(fn), timeout)
+
+    def stats(self):
+        with self.__lock:
+            return {'in_flight': self.__in_flight, 'completed': self.__completed, 'rejected': self.__rejected,
+                    'timed_out': self.__timed_out}
+
+    def __done(self, _):
+        with self.__lock:
+            self.__in_flight -= 1
+            self.__completed += 1
+        self.__slots.release()
+
+
+# one QuorumExecutor per quorum, made the first time a quorum is used
+class QuorumExecutors:
+
+    def __init__(self, workers=QUORUM_WORKERS, queue_size=QUORUM_QUEUE_SIZE, timeout=QUORUM_TIMEOUT):
+        self.__options = {'workers': workers, 'queue_size': queue_size, 'timeout': timeout}
+        self.__lock = threading.Lock()
+        self.__quorums = {}
+
+    def quorum(self, quorum_id):
+        quorum_id = str(quorum_id)
+        with self.__lock:
+            if quorum_id not in self.__quorums:
+                self.__quorums[quorum_id] = QuorumExecutor(quorum_id, **self.__options)
+            return self.__quorums[quorum_id]
+
+    def submit(self, quorum_id, fn):
+        return self.quorum(quorum_id).submit(fn)
+
+    def wait(self, quorum_id, future, timeout=None):
+        return self.quorum(quorum_id).wait(future, timeout)
+
+    def run(self, quorum_id, fn, timeout=None):
+        return self.quorum(quorum_id).run(fn, timeout)
+
+    # {quorum id: QuorumExecutor.stats()}
+    def stats(self):
+        with self.__lock:
+            quorums = dict(self.__quorums)
+        return {quorum_id: executor.stats() for quorum_id, executor in quorums.items()}
@@ -2,13 +2,24 @@ import json
 
 from src.api.constants import NEIGHBOURS, PBFT_INSTANCES, QUORUMS, ROUTE_EXECUTED_CORRECTLY, PORT, QUORUM_ID, QUORUM_MEMBERS
 from src.api.constants import ROUTE_EXECUTION_FAILED, API_IP, VALIDATOR_KEY, USER_KEY, DOCKER_IP
+from src.api.constants import TRANSACTION_KEYS, BATCHER, TRANSACTIONS, TRANSACTION_STATUS, TRANSACTION_KEY
+from src.api.constants import TRANSACTION_VALUE, READ_CACHE, COALESCER, EXECUTORS, BATCH_ID, RECEIPTS, STATUS_WAIT
+from src.api.constants import WAITERS, WAIT_TIMEOUT, CONFIRMED, WAITED, ROUTING, SESSIONS, SELECTOR, BREAKERS
 from src.SawtoothPBFT import SawtoothContainer
-from src.Intersection import Intersection
+from src.Intersection import Intersection, IntersectionError, run_per_committee
 from src.structures import Transaction
-from src.api.api_util import forward, create_intersection_map, merge_intersection_maps
+from src.intkey import check_intkey_transaction
+from src.api.executors import QuorumUnavailable
+from src.api.api_util import forward, forward_many, create_intersection_map, merge_intersection_maps, discover_routes
+from src.api.api_util import current_hops, ROUTE_DISCOVERY_DEPTH
+from concurrent.futures import ThreadPoolExecutor
 from flask import jsonify, request
 import socket
-import requests
+import time
+
+SUBMIT_TIMEOUT = 60  # sec a submit waits for its batch to be sent
+WAIT_DEFAULT_TIMEOUT = 10  # sec /wait/ holds a request when no timeout is given
+WAIT_MAX_TIMEOUT = 20  # longest (sec) /wait/ holds a request, must stay below the timeout of the waiters executors
 
 def get_json(request, app):
     # try and parse json
@@ -20,7 +31,37 @@ def get_json(request, app):
     return req
 
 def add_routes(app):
-    # return info about the system flask is running on
+    # a quorum that is busy or too slow answers with an error instead of holding up the request
+    @app.errorhandler(QuorumUnavailable)
+    def quorum_unavailable(e):
+        app.logger.error(e)
+        return ROUTE_EXECUTION_FAILED.format(msg=e)
+
+    # runs fn() on the workers of quorum_id (see QuorumExecutors), raises QuorumUnavailable
+    def on_quorum(quorum_id, fn):
+        return app.config[EXECUTORS].run(quorum_id, fn)
+
+    # runs fn(quorum id, indices) for each {quorum id: indices} on the workers of its quorum, all quorums at the same
+    # time, calls that spend most of their time waiting on the chain go to app.config[WAITERS] instead of the
+    # default app.config[EXECUTORS] so they do not hold up reads
+    # returns {quorum id: result or the exception it raised}
+    def on_each_quorum(indices_by_quorum: dict, fn, executors=None):
+        executors = app.config[EXECUTORS] if executors is None else executors
+        futures, results = {}, {}
+        for quorum_id, indices in indices_by_quorum.items():
+            try:
+                futures[quorum_id] = executors.submit(quorum_id, lambda q=quorum_id, i=indices: fn(q, i))
+            except QuorumUnavailable as e:
+                results[quorum_id] = e
+        for quorum_id, future in futures.items():
+            try:
+                results[quorum_id] = executors.wait(quorum_id, future)
+            except Exception as e:
+                results[quorum_id] = e
+        return results
+
+    # return info about the system flask is running on (info, stats and the key/ip routes never touch a container and
+    # are answered on the request thread)
     @app.route('/')
     @app.route('/info/')
     @app.route('/info/<quorum_id>')
@@ -36,17 +77,39 @@ def add_routes(app):
         system_info = {API_IP: ip, PORT: port, QUORUM_ID: None}
         return jsonify(system_info)
 
-    # stat sawtooth for quorum id
-    @app.route('/start/<quorum_id_a>/<quorum_id_b>')
-    def start(quorum_id_a=None, quorum_id_b=None):
+    # counters of the peers caches and batching
+    @app.route('/stats/')
+    def stats():
+        system_stats = {BATCHER: app.config[BATCHER].stats(), COALESCER: app.config[COALESCER].stats(),
+                        EXECUTORS: app.config[EXECUTORS].stats(), WAITERS: app.config[WAITERS].stats(),
+                        SESSIONS: app.config[SESSIONS].stats(), SELECTOR: app.config[SELECTOR].stats(),
+                        ROUTING: app.config[ROUTING].stats(), BREAKERS: app.config[BREAKERS].stats(), READ_CACHE: {}}
+        if app.config[PBFT_INSTANCES] is not None:
+            system_stats[READ_CACHE] = app.config[PBFT_INSTANCES].read_cache_stats()
+        return jsonify(system_stats)
+
+    # stat sawtooth for quorum id, one container is started for each of the (two or more) quorums
+    # ex: /start/a/b or /start/a/b/c
+    @app.route('/start/<quorum_id_a>/<path:quorum_ids>')
+    def start(quorum_id_a=None, quorum_ids=None):
         if app.config[PBFT_INSTANCES] is not None:
             app.logger.warning("peer has already started, restarting")
-            del app.config[PBFT_INSTANCES]
-        instance_a = SawtoothContainer()
-        instance_b = SawtoothContainer()
-        app.config[PBFT_INSTANCES] = Intersection(instance_a, instance_b, quorum_id_a, quorum_id_b)
-        app.config[QUORUMS][quorum_id_a] = []
-        app.config[QUORUMS][quorum_id_b] = []
+            # the old containers are torn down once dropped, the key stays so a failed restart leaves a peer that has
+            # not started instead of one every route fails on
+            app.config[PBFT_INSTANCES] = None
+        quorum_ids = [quorum_id_a] + [q for q in quorum_ids.split('/') if q != '']
+        # the containers of the quorums are started at the same time
+        try:
+            containers = run_per_committee({q: SawtoothContainer for q in quorum_ids})
+        except IntersectionError as e:
+            app.logger.error("could not start containers for {}".format(list(e.errors.keys())))
+            # the containers that did start are not used, dropping them tears them down (SawtoothContainer.__del__)
+            e.results.clear()
+            return ROUTE_EXECUTION_FAILED.format(msg="could not start {}".format(e))
+        app.config[PBFT_INSTANCES] = Intersection(instances={q: containers[q] for q in quorum_ids})
+        for quorum_id in quorum_ids:
+            app.config[QUORUMS][quorum_id] = []
+            app.config[ROUTING].set_quorum(quorum_id, [])
         return ROUTE_EXECUTED_CORRECTLY
 
     # joins pbft instance to a committee
@@ -62,16 +125,17 @@ def add_routes(app):
                 return ROUTE_EXECUTION_FAILED.format(msg="Peer not in committee {} can not join PBFT"
                                                      .format('quorum_id'))
         except AttributeError as e:
-            app.logger.error("Peer not started request /start/<quorum_id_a>/<quorum_id_b> first")
+            app.logger.error("Peer not started request /start/<quorum_ids> first")
             app.logger.error(e)
             return ROUTE_EXECUTION_FAILED.format(msg="") + "Peer not started request " \
-                                                           "/start/<quorum_id_a>/<quorum_id_b> first \n\n\n{}".format(e)
+                                                           "/start/<quorum_ids> first \n\n\n{}".format(e)
 
         app.logger.info("Joining {q} with neighbours {n}".format(q=quorum_id, n=neighbours))
         # store neighbour info in app
         app.config[QUORUMS][quorum_id] = neighbours
         # get sawtooth container ip address
         ips = [n.pop(DOCKER_IP) for n in app.config[QUORUMS][quorum_id]]
+        app.config[ROUTING].set_quorum(quorum_id, neighbours)
         ips.append(app.config[PBFT_INSTANCES].ip(quorum_id))
         app.config[PBFT_INSTANCES].peer_join(quorum_id, ips)  # use sawtooth container ip to start sawtooth
         return ROUTE_EXECUTED_CORRECTLY
@@ -89,15 +153,16 @@ def add_routes(app):
                 return ROUTE_EXECUTION_FAILED.format(msg="Peer not in committee {} can not join PBFT"
                                                      .format('quorum_id'))
         except AttributeError as e:
-            app.logger.error("Peer not started request /start/<quorum_id_a>/<quorum_id_b> first")
+            app.logger.error("Peer not started request /start/<quorum_ids> first")
             app.logger.error(e)
             return ROUTE_EXECUTION_FAILED.format(msg="") + "Peer not started request " \
-                                                           "/start/<quorum_id_a>/<quorum_id_b> first \n\n\n{}".format(
+                                                           "/start/<quorum_ids> first \n\n\n{}".format(
                 e)
 
         app.logger.info("Adding quorum ID {q} with neighbours {n}".format(q=quorum_id, n=neighbours))
         # store neighbour info in app
         app.config[QUORUMS][quorum_id] = neighbours
+        app.config[ROUTING].set_quorum(quorum_id, neighbours)
         return ROUTE_EXECUTED_CORRECTLY
 
 
@@ -111,22 +176,36 @@ def add_routes(app):
         else:
             return ROUTE_EXECUTION_FAILED
     
+    # intersections ([[quorum id, quorum id], ...]) this peer knows of, with depth > 0 the neighbours are asked for
+    # theirs (up to depth peers away, at most ROUTE_DISCOVERY_DEPTH) first, forward uses this to find routes to quorums
+    # no neighbour is in
+    # ?visited=ip:port,... are the peers already asked (see discover_routes), requests for the same depth that arrive
+    # while one is asking share its answer
+    @app.route('/edges/')
+    @app.route('/edges/<int:depth>')
+    def edges(depth=0):
+        depth = min(depth, ROUTE_DISCOVERY_DEPTH)
+        if depth > 0:
+            visited = tuple(v for v in request.args.get('visited', '').split(',') if v != '')
+            app.config[COALESCER].do(('edges', depth), lambda: discover_routes(app, depth, visited))
+        return jsonify(app.config[ROUTING].edges())
+
     # Recursively finds the quorums with the fewest intersections by joining intersection maps
     @app.route('/min+intersection')
     @app.route('/min+intersection/<int:depth>')
     def min_intersection(depth=0):
-        # Find the current peers two quorum ids and sort them
-        id_a = app.config[PBFT_INSTANCES].committee_id_a
-        id_b = app.config[PBFT_INSTANCES].committee_id_b
-        smaller_quorum_id = min(id_a, id_b)
-        larger_quorum_id = max(id_a, id_b)
+        # Find the current peers quorum ids and sort them
+        own_quorum_ids = sorted(app.config[PBFT_INSTANCES].committee_ids())
 
         # Use its list of neighbors to find all quroum ids (assuming there is at least 1 intersection)
-        quorum_ids = list(set([peer[QUORUM_ID] for peer in app.config[QUORUMS][id_a]] + [id_a, id_b]))
+        neighbour_quorum_ids = [peer[QUORUM_ID] for q in own_quorum_ids for peer in app.config[QUORUMS].get(q, [])]
+        quorum_ids = list(set(neighbour_quorum_ids + own_quorum_ids))
 
-        # Creates a blank intersection map of all quroum ids and adds its own IP and port where it belongs
+        # Creates a blank intersection map of all quroum ids and adds its own IP and port to every pair of its quorums
         intersection_map = create_intersection_map(quorum_ids)
-        intersection_map[smaller_quorum_id][larger_quorum_id][request.host] = 0
+        for i, smaller_quorum_id in enumerate(own_quorum_ids):
+            for larger_quorum_id in own_quorum_ids[i + 1:]:
+                intersection_map[smaller_quorum_id][larger_quorum_id][request.host] = 0
 
         if (depth < 2):
             # For each quorum the peer is in
@@ -134,7 +213,8 @@ def add_routes(app):
                 # For every neighboring peer in the quorum
                 for neighbor in neighbors:
                     # Find the neighbors intersection map at a depth one higher and merge it with our current one
-                    res = requests.get(f"http://{neighbor[API_IP]}:{neighbor[PORT]}/min+intersection/{depth+1}")
+                    res = app.config[SESSIONS].get(
+                        f"http://{neighbor[API_IP]}:{neighbor[PORT]}/min+intersection/{depth+1}")
                     neighbor_map = json.loads(res.text)
                     intersection_map = merge_intersection_maps(intersection_map, neighbor_map)
         
@@ -156,12 +236,12 @@ def add_routes(app):
     @app.route('/request+join', methods=['POST'])
     def request_join():
         # Find the minimum intersection
-        res_json = requests.post(f"http://{request.host}/min+intersection")
+        res_json = app.config[SESSIONS].post(f"http://{request.host}/min+intersection")
 
         # Get the caller's IP and port, join them to the minimum quorums
         req_json = request.get_json()
-        requests.post(f"http://{req_json[API_IP]}:{req_json[PORT]}/join/{res_json[0]}")
-        requests.post(f"http://{req_json[API_IP]}:{req_json[PORT]}/join/{res_json[1]}")
+        app.config[SESSIONS].post(f"http://{req_json[API_IP]}:{req_json[PORT]}/join/{res_json[0]}")
+        app.config[SESSIONS].post(f"http://{req_json[API_IP]}:{req_json[PORT]}/join/{res_json[1]}")
         
         return ROUTE_EXECUTED_CORRECTLY
 
@@ -179,6 +259,7 @@ def add_routes(app):
                 if str(neighbor[PORT]) == str(remove_port):
                     del app.config[QUORUMS][committee_id][index]
                 index += 1
+        app.config[ROUTING].remove_port(remove_port)
 
         return ROUTE_EXECUTED_CORRECTLY
 
@@ -188,9 +269,7 @@ def add_routes(app):
         req = get_json(request, app)
         val_keys = req[VALIDATOR_KEY]
         usr_keys = req[USER_KEY]
-        if quorum_id == app.config[PBFT_INSTANCES].committee_id_a:
-            app.config[PBFT_INSTANCES].make_genesis(quorum_id, val_keys, usr_keys)
-        elif quorum_id == app.config[PBFT_INSTANCES].committee_id_b:
+        if app.config[PBFT_INSTANCES].in_committee(quorum_id):
             app.config[PBFT_INSTANCES].make_genesis(quorum_id, val_keys, usr_keys)
         else:
             return forward(app, "make+genesis/{id}".format(id=quorum_id), quorum_id, req)
@@ -202,11 +281,167 @@ def add_routes(app):
         if app.config[PBFT_INSTANCES].in_committee(req[QUORUM_ID]):
             tx = Transaction()
             tx.load_from_json(req)
-            app.config[PBFT_INSTANCES].submit(tx)
-            return ROUTE_EXECUTED_CORRECTLY
+            # a transaction that can not be sent fails on its own instead of inside the batch it would have joined
+            try:
+                check_intkey_transaction(tx)
+            except ValueError as e:
+                return ROUTE_EXECUTION_FAILED.format(msg="invalid transaction: {}".format(e))
+            # answered once the batch holding tx was sent to the quorum, the receipt names the batch so the client can
+            # follow it with /status/
+            try:
+                batch_id = app.config[BATCHER].submit(tx).result(timeout=SUBMIT_TIMEOUT)
+            except Exception as e:
+                app.logger.error("submit to {q} failed: {e}".format(q=req[QUORUM_ID], e=e))
+                return ROUTE_EXECUTION_FAILED.format(msg="submit failed")
+            return jsonify({QUORUM_ID: tx.quorum_id, TRANSACTION_KEY: tx.key, BATCH_ID: batch_id,
+                            TRANSACTION_STATUS: ROUTE_EXECUTED_CORRECTLY})
         else:
             return forward(app, "submit/", req[QUORUM_ID], req)
 
+    # submits many transactions at once ({TRANSACTIONS: [{QUORUM_ID, TRANSACTION_KEY, TRANSACTION_VALUE}, ...]})
+    # transactions of a quorum this peer is in are submitted together, the ones of every other quorum are forwarded
+    # with one request per quorum
+    # returns the receipt of each transaction in the same order as they were sent (BATCH_ID is null if it was not sent)
+    # ex: [{QUORUM_ID: 'a', TRANSACTION_KEY: 'k', BATCH_ID: '3045...', TRANSACTION_STATUS: ROUTE_EXECUTED_CORRECTLY}]
+    @app.route('/submit/batch', methods=['POST'])
+    def submit_batch():
+        req = get_json(request, app)
+        txs = []
+        for tx_json in req[TRANSACTIONS]:
+            tx = Transaction()
+            tx.load_from_json(tx_json)
+            txs.append(tx)
+
+        local, foreign = {}, {}
+        for index, tx in enumerate(txs):
+            bucket = local if app.config[PBFT_INSTANCES].in_committee(tx.quorum_id) else foreign
+            bucket.setdefault(tx.quorum_id, []).append(index)
+
+        results = [(None, ROUTE_EXECUTION_FAILED.format(msg="not submitted"))] * len(txs)
+        submitted = on_each_quorum(local, lambda _, indices: app.config[PBFT_INSTANCES].submit_txs(
+            [txs[i] for i in indices], batch_size=1))
+        for quorum_id, batch_ids in submitted.items():
+            if isinstance(batch_ids, Exception):
+                app.logger.error("batch submit to {q} failed: {e}".format(q=quorum_id, e=batch_ids))
+                batch_ids = [batch_ids] * len(local[quorum_id])
+            # every transaction is a batch of its own, one that is not valid fails without the others of its quorum
+            for index, batch_id in zip(local[quorum_id], batch_ids):
+                if isinstance(batch_id, ValueError):
+                    results[index] = (None, ROUTE_EXECUTION_FAILED.format(
+                        msg="invalid transaction: {}".format(batch_id)))
+                elif isinstance(batch_id, Exception):
+                    results[index] = (None, ROUTE_EXECUTION_FAILED.format(msg="submit failed"))
+                else:
+                    results[index] = (batch_id, ROUTE_EXECUTED_CORRECTLY)
+
+        responses = forward_many(app, "submit/batch", {q: {TRANSACTIONS: [txs[i].to_json() for i in indices]}
+                                                       for q, indices in foreign.items()})
+        for quorum_id, response in responses.items():
+            try:
+                forwarded = [(r.get(BATCH_ID), r[TRANSACTION_STATUS]) for r in json.loads(response)]
+            except (ValueError, TypeError, KeyError, AttributeError):
+                forwarded = [(None, response)] * len(foreign[quorum_id])
+            for index, result in zip(foreign[quorum_id], forwarded):
+                results[index] = result
+
+        return jsonify([{QUORUM_ID: tx.quorum_id, TRANSACTION_KEY: tx.key, BATCH_ID: batch_id,
+                         TRANSACTION_STATUS: status} for tx, (batch_id, status) in zip(txs, results)])
+
+    # resolves receipts of /submit/ and /submit/batch ({RECEIPTS: [{QUORUM_ID, BATCH_ID}, ...], STATUS_WAIT: sec})
+    # with the batch_statuses of each quorum, receipts of a quorum this peer is not in are forwarded with one request
+    # per quorum, with STATUS_WAIT the answer waits (at most BATCH_STATUS_MAX_WAIT sec) for the batches to commit
+    # returns the status of each receipt in the same order as they were sent (COMMITTED, INVALID, PENDING or UNKNOWN)
+    # ex: [{QUORUM_ID: 'a', BATCH_ID: '3045...', TRANSACTION_STATUS: 'COMMITTED'}, ...]
+    @app.route('/status/', methods=['POST'])
+    def status():
+        req = get_json(request, app)
+        receipts = [(receipt[QUORUM_ID], receipt.get(BATCH_ID)) for receipt in req[RECEIPTS]]
+        wait = req.get(STATUS_WAIT)
+
+        local, foreign = {}, {}
+        for index, (quorum_id, _) in enumerate(receipts):
+            bucket = local if app.config[PBFT_INSTANCES].in_committee(quorum_id) else foreign
+            bucket.setdefault(quorum_id, []).append(index)
+
+        statuses = [ROUTE_EXECUTION_FAILED.format(msg="no status")] * len(receipts)
+        resolved = on_each_quorum(local, lambda quorum_id, indices: app.config[PBFT_INSTANCES].batch_statuses(
+            quorum_id, [receipts[i][1] for i in indices], wait), executors=app.config[WAITERS] if wait else None)
+        for quorum_id, batch_statuses in resolved.items():
+            if isinstance(batch_statuses, Exception):
+                app.logger.error("batch statuses of {q} failed: {e}".format(q=quorum_id, e=batch_statuses))
+                continue
+            for index in local[quorum_id]:
+                statuses[index] = batch_statuses[receipts[index][1]]
+
+        responses = forward_many(app, "status/", {q: {RECEIPTS: [{QUORUM_ID: q, BATCH_ID: receipts[i][1]}
+                                                                 for i in indices], STATUS_WAIT: wait}
+                                                  for q, indices in foreign.items()}, measure=not wait)
+        for quorum_id, response in responses.items():
+            try:
+                forwarded = [r[TRANSACTION_STATUS] for r in json.loads(response)]
+            except (ValueError, TypeError, KeyError):
+                forwarded = [response] * len(foreign[quorum_id])
+            for index, status in zip(foreign[quorum_id], forwarded):
+                statuses[index] = status
+
+        return jsonify([{QUORUM_ID: quorum_id, BATCH_ID: batch_id, TRANSACTION_STATUS: status}
+                        for (quorum_id, batch_id), status in zip(receipts, statuses)])
+
+    # long poll for commits ({TRANSACTIONS: [{QUORUM_ID, TRANSACTION_KEY, TRANSACTION_VALUE}, ...], WAIT_TIMEOUT: sec})
+    # answers once every key holds its value or the timeout (at most WAIT_MAX_TIMEOUT sec) runs out, the peer is woken
+    # by block commits instead of reading the keys over and over, keys of a quorum this peer is not in are forwarded
+    # with one request per quorum, the forwards and the local waits run at the same time
+    # returns for each key in the same order as they were sent if it was committed and how long (sec after the request
+    # arrived at this peer) that took
+    # ex: [{QUORUM_ID: 'a', TRANSACTION_KEY: 'k', CONFIRMED: true, WAITED: 1.2}, ...]
+    @app.route('/wait/', methods=['POST'])
+    def wait():
+        start = time.time()
+        req = get_json(request, app)
+        txs = []
+        for tx_json in req[TRANSACTIONS]:
+            tx = Transaction()
+            tx.load_from_json(tx_json)
+            txs.append(tx)
+        # a forward with no time left gets 0, not the default
+        timeout = WAIT_DEFAULT_TIMEOUT if req.get(WAIT_TIMEOUT) is None else float(req[WAIT_TIMEOUT])
+        timeout = min(max(timeout, 0), WAIT_MAX_TIMEOUT)
+
+        local, foreign = {}, {}
+        for index, tx in enumerate(txs):
+            bucket = local if app.config[PBFT_INSTANCES].in_committee(tx.quorum_id) else foreign
+            bucket.setdefault(tx.quorum_id, []).append(index)
+
+        results = [(False, None)] * len(txs)
+        with ThreadPoolExecutor(max_workers=1) as forwarding:
+            # the other peers measure WAITED from when they got the forward, sent_after moves it to this peers start
+            sent_after = time.time() - start
+            responses = forwarding.submit(forward_many, app, "wait/", {
+                q: {TRANSACTIONS: [txs[i].to_json() for i in indices], WAIT_TIMEOUT: max(timeout - sent_after, 0)}
+                for q, indices in foreign.items()}, False, current_hops())
+            confirmed = on_each_quorum(local, lambda _, indices: app.config[PBFT_INSTANCES].wait_for_txs(
+                [txs[i] for i in indices], timeout), executors=app.config[WAITERS])
+            responses = responses.result()
+        for quorum_id, times in confirmed.items():
+            if isinstance(times, Exception):
+                app.logger.error("waiting on {q} failed: {e}".format(q=quorum_id, e=times))
+                continue
+            for index, at in zip(local[quorum_id], times):
+                results[index] = (at is not None, None if at is None else max(at - start, 0))
+
+        for quorum_id, response in responses.items():
+            try:
+                forwarded = [(r[CONFIRMED], None if r[WAITED] is None else r[WAITED] + sent_after)
+                             for r in json.loads(response)]
+            except (ValueError, TypeError, KeyError):
+                app.logger.error("waiting on {q} failed: {r}".format(q=quorum_id, r=response))
+                continue
+            for index, result in zip(foreign[quorum_id], forwarded):
+                results[index] = result
+
+        return jsonify([{QUORUM_ID: tx.quorum_id, TRANSACTION_KEY: tx.key, CONFIRMED: confirmed, WAITED: waited}
+                        for tx, (confirmed, waited) in zip(txs, results)])
+
     @app.route('/get/', methods=['POST'])
     def get():
         req = get_json(request, app)
@@ -214,17 +449,75 @@ def add_routes(app):
         if app.config[PBFT_INSTANCES].in_committee(req[QUORUM_ID]):
             tx = Transaction()
             tx.load_from_json(req)
-            return app.config[PBFT_INSTANCES].get_tx(tx)
+            return app.config[COALESCER].do(('get', tx.quorum_id, tx.key), lambda: on_quorum(
+                tx.quorum_id, lambda: app.config[PBFT_INSTANCES].get_tx(tx)))
         else:
-            return forward(app, "get/", req[QUORUM_ID], req)
+            return app.config[COALESCER].do(('get', str(req[QUORUM_ID]), req[TRANSACTION_KEY]),
+                                            lambda: forward(app, "get/", req[QUORUM_ID], req))
+
+    # reads many keys of one quorum at once, returns {key: value} (value is null if the key is not set)
+    @app.route('/get+many/', methods=['POST'])
+    def get_many():
+        req = get_json(request, app)
+        flight = ('get+many', str(req[QUORUM_ID]), tuple(req[TRANSACTION_KEYS]))
+        if app.config[PBFT_INSTANCES].in_committee(req[QUORUM_ID]):
+            txs = [Transaction(req[QUORUM_ID], key) for key in req[TRANSACTION_KEYS]]
+            values = app.config[COALESCER].do(flight, lambda: on_quorum(
+                req[QUORUM_ID], lambda: app.config[PBFT_INSTANCES].get_txs(txs)))
+            return jsonify({tx.key: value for tx, value in zip(txs, values)})
+        else:
+            return app.config[COALESCER].do(flight, lambda: forward(app, "get+many/", req[QUORUM_ID], req))
+
+    # reads many keys of any quorums at once ({TRANSACTIONS: [{QUORUM_ID, TRANSACTION_KEY}, ...]})
+    # keys of a quorum this peer is in are read together, the keys of every other quorum are forwarded with one
+    # request per quorum (all forwards are sent at the same time)
+    # returns the value of each key in the same order as they were sent (null if the key is not set)
+    # ex: [{QUORUM_ID: 'a', TRANSACTION_KEY: 'k', TRANSACTION_VALUE: '1', TRANSACTION_STATUS: ROUTE_EXECUTED_CORRECTLY}]
+    @app.route('/get/batch', methods=['POST'])
+    def get_batch():
+        req = get_json(request, app)
+        txs = [Transaction(tx_json[QUORUM_ID], tx_json[TRANSACTION_KEY]) for tx_json in req[TRANSACTIONS]]
+
+        local, foreign = {}, {}
+        for index, tx in enumerate(txs):
+            bucket = local if app.config[PBFT_INSTANCES].in_committee(tx.quorum_id) else foreign
+            bucket.setdefault(tx.quorum_id, []).append(index)
+
+        results = [(None, ROUTE_EXECUTION_FAILED.format(msg="not read"))] * len(txs)
+        read = on_each_quorum(local, lambda _, indices: app.config[PBFT_INSTANCES].get_txs([txs[i] for i in indices]))
+        for quorum_id, values in read.items():
+            if isinstance(values, Exception):
+                app.logger.error("batch read of {q} failed: {e}".format(q=quorum_id, e=values))
+                values = [None] * len(local[quorum_id])
+                status = ROUTE_EXECUTION_FAILED.format(msg="read failed")
+            else:
+                status = ROUTE_EXECUTED_CORRECTLY
+            for index, value in zip(local[quorum_id], values):
+                results[index] = (value, status)
+
+        responses = forward_many(app, "get/batch", {q: {TRANSACTIONS: [{QUORUM_ID: q, TRANSACTION_KEY: txs[i].key}
+                                                                        for i in indices]}
+                                                    for q, indices in foreign.items()})
+        for quorum_id, response in responses.items():
+            try:
+                forwarded = [(r[TRANSACTION_VALUE], r[TRANSACTION_STATUS]) for r in json.loads(response)]
+            except (ValueError, TypeError, KeyError):
+                forwarded = [(None, response)] * len(foreign[quorum_id])
+            for index, result in zip(foreign[quorum_id], forwarded):
+                results[index] = result
+
+        return jsonify([{QUORUM_ID: tx.quorum_id, TRANSACTION_KEY: tx.key, TRANSACTION_VALUE: value,
+                         TRANSACTION_STATUS: status} for tx, (value, status) in zip(txs, results)])
 
     @app.route('/blocks/', methods=['POST'])
     def blocks():
         req = get_json(request, app)
+        flight = ('blocks', str(req[QUORUM_ID]))
         if app.config[PBFT_INSTANCES].in_committee(req[QUORUM_ID]):
-            return json.dumps(app.config[PBFT_INSTANCES].blocks(req[QUORUM_ID]))
+            return app.config[COALESCER].do(flight, lambda: on_quorum(
+                req[QUORUM_ID], lambda: json.dumps(app.config[PBFT_INSTANCES].blocks(req[QUORUM_ID]))))
         else:
-            return forward(app, "blocks/", req[QUORUM_ID], req)
+            return app.config[COALESCER].do(flight, lambda: forward(app, "blocks/", req[QUORUM_ID], req))
 
     @app.route('/user+key/<quorum_id>')
     def usr_key(quorum_id):
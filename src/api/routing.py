@@ -0,0 +1,170 @@
+from src.api.constants import API_IP, PORT, QUORUM_ID
+from collections import namedtuple
+from itertools import combinations
+import threading
+import time
+
+# sec a quorum that could not be found (even after asking the other peers) is not looked for again, unless the
+# neighbours or the known intersections change
+ROUTE_MISS_TTL = 30
+
+# a neighbour that can be forwarded to
+# ip, port: address of its API, quorum_id: the quorum it reaches, via: the quorum of this peer it shares with us
+Neighbour = namedtuple('Neighbour', ['ip', 'port', 'quorum_id', 'via'])
+
+
+# neighbours of a peer by the quorum they reach so forward finds the candidates for a quorum with one lookup instead of
+# walking every neighbour of every quorum (which one of them gets the request is up to NeighbourSelector)
+# kept in step with app.config[QUORUMS] by the routes that change it (/start, /join, /add, /remove) and by
+# SmartShardPeer.check_neighbors
+# quorums with no neighbour in them are reached in as few hops as possible over the intersection graph (quorums that
+# share a peer are joined by an edge), the edges come from the neighbours of this peer and from what other peers
+# reported (see learn and /edges/)
+class RoutingIndex:
+
+    def __init__(self, miss_ttl=ROUTE_MISS_TTL):
+        self.__miss_ttl = miss_ttl
+        self.__lock = threading.Lock()
+        self.__by_quorum = {}  # own quorum id: (Neighbour, ...)
+        self.__routes = {}  # reachable quorum id: (Neighbour, ...)
+        self.__learned = set()  # frozenset({quorum id, quorum id}) reported by other peers
+        self.__table = None  # quorum id: (hops, first hop quorum ids), made again after every change
+        self.__misses = {}  # quorum id: time it could not be found
+
+    # replaces the neighbours this peer has in its quorum via (neighbours as stored in app.config[QUORUMS]), only the
+    # routes of the quorums those neighbours reach are touched
+    def set_quorum(self, via, neighbours: list):
+        via = str(via)
+        records = tuple(Neighbour(n[API_IP], n[PORT], str(n[QUORUM_ID]), via) for n in neighbours)
+        with self.__lock:
+            old = self.__by_quorum.get(via, ())
+            self.__by_quorum[via] = records
+            for quorum_id in {n.quorum_id for n in old}:
+                self.__set_route(quorum_id, tuple(n for n in self.__routes.get(quorum_id, ()) if n.via != via))
+            for record in records:
+                self.__set_route(record.quorum_id, self.__routes.get(record.quorum_id, ()) + (record,))
+            self.__table = None
+            self.__misses = {}
+
+    # replaces every neighbour ({own quorum id: neighbours}, the same as app.config[QUORUMS])
+    # intersections reported by other peers are dropped as well, they are asked for again when a quorum is missed
+    def replace(self, quorums: dict):
+        with self.__lock:
+            self.__by_quorum = {}
+            self.__routes = {}
+            self.__learned = set()
+            self.__table = None
+            self.__misses = {}
+        for via, neighbours in quorums.items():
+            self.set_quorum(via, neighbours)
+
+    # drops every neighbour whose API listens on port (ex: a peer that left)
+    def remove_port(self, port):
+        with self.__lock:
+            for via, records in self.__by_quorum.items():
+                gone = {n.quorum_id for n in records if str(n.port) == str(port)}
+                if not gone:
+                    continue
+                self.__by_quorum[via] = tuple(n for n in records if str(n.port) != str(port))
+                for quorum_id in gone:
+                    self.__set_route(quorum_id, tuple(n for n in self.__routes.get(quorum_id, ())
+                                                      if not (n.via == via and str(n.port) == str(port))))
+            self.__table = None
+            self.__misses = {}
+
+    # neighbours that reach quorum_id
+    def neighbours(self, quorum_id):
+        return self.__routes.get(str(quorum_id), ())
+
+    # neighbours a request for quorum_id should be sent to, the ones in quorum_id if there are any, otherwise the ones
+    # that start a shortest path to it (empty if quorum_id can not be reached with what is known)
+    def route(self, quorum_id):
+        quorum_id = str(quorum_id)
+        with self.__lock:
+            direct = self.__routes.get(quorum_id, ())
+            if direct:
+                return direct
+            _, first_hops = self.__shortest_paths().get(quorum_id, (None, ()))
+            return tuple(n for hop in first_hops for n in self.__routes.get(hop, ()))
+
+    # call when quorum_id could not be found, missed is True for it until ROUTE_MISS_TTL passed or the routes changed
+    def miss(self, quorum_id):
+        with self.__lock:
+            self.__misses[str(quorum_id)] = time.time()
+
+    def missed(self, quorum_id):
+        with self.__lock:
+            missed_at = self.__misses.get(str(quorum_id))
+            return missed_at is not None and time.time() - missed_at < self.__miss_ttl
+
+    # hops to quorum_id (1 for a quorum a neighbour is in), None if it can not be reached
+    def hops(self, quorum_id):
+        with self.__lock:
+            return self.__shortest_paths().get(str(quorum_id), (None, ()))[0]
+
+    # adds intersections ([[quorum id, quorum id], ...]) reported by another peer, returns how many were new
+    def learn(self, edges: list):
+        new = {frozenset((str(a), str(b))) for a, b in edges if str(a) != str(b)}
+        with self.__lock:
+            new -= self.__edges()
+            if new:
+                self.__learned |= new
+                self.__table = None
+                self.__misses = {}
+        return len(new)
+
+    # every intersection known as [[quorum id, quorum id], ...]
+    def edges(self):
+        with self.__lock:
+            return sorted(sorted(edge) for edge in self.__edges())
+
+    # (ip, port) of every neighbour
+    def addresses(self):
+        with self.__lock:
+            return {(n.ip, n.port) for records in self.__by_quorum.values() for n in records}
+
+    def stats(self):
+        with self.__lock:
+            return {'edges': len(self.__edges()),
+                    'hops': {quorum_id: hops for quorum_id, (hops, _) in self.__shortest_paths().items()}}
+
+    # the quorums of this peer intersect each other and every quorum one of its neighbours is in
+    # call with the lock held
+    def __edges(self):
+        edges = {frozenset(pair) for pair in combinations(self.__by_quorum.keys(), 2)}
+        edges |= {frozenset((n.via, n.quorum_id)) for records in self.__by_quorum.values() for n in records
+                  if n.via != n.quorum_id}
+        return edges | self.__learned
+
+    # breadth first search from the quorums a neighbour is in, call with the lock held
+    # returns {quorum id: (hops, first hop quorum ids of every shortest path)}
+    def __shortest_paths(self):
+        if self.__table is not None:
+            return self.__table
+        graph = {}
+        for a, b in self.__edges():
+            graph.setdefault(a, set()).add(b)
+            graph.setdefault(b, set()).add(a)
+        own = set(self.__by_quorum.keys())
+        table = {quorum_id: (1, frozenset([quorum_id])) for quorum_id in self.__routes if quorum_id not in own}
+        frontier = list(table.keys())
+        hops = 1
+        while frontier:
+            hops += 1
+            reached = {}
+            for quorum_id in frontier:
+                for other in graph.get(quorum_id, ()):
+                    if other not in own and other not in table:
+                        reached.setdefault(other, set()).update(table[quorum_id][1])
+            for quorum_id, first_hops in reached.items():
+                table[quorum_id] = (hops, frozenset(first_hops))
+            frontier = list(reached.keys())
+        self.__table = table
+        return table
+
+    # call with the lock held
+    def __set_route(self, quorum_id: str, records: tuple):
+        if records:
+            self.__routes[quorum_id] = records
+        else:
+            self.__routes.pop(quorum_id, None)
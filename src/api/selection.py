@@ -0,0 +1,77 @@
+import threading
+import random
+import time
+
+# weight of the newest latency of a neighbour in its moving average
+LATENCY_WEIGHT = 0.2
+# share of picks made at random so neighbours that look slow get measured again
+EXPLORE_RATE = 0.05
+# latency (sec) counted for a request that failed, a neighbour that does not answer should look slow
+FAILURE_LATENCY = 5
+
+
+# picks which neighbour of a quorum a request is forwarded to
+# keeps a moving average of the latency and the number of requests in flight of every neighbour, two candidates are
+# drawn at random and the one with the lower expected wait (latency * (in flight + 1)) gets the request, so a slow or
+# busy neighbour gets less traffic without every request going to the one that looks fastest
+# neighbours are Neighbour records (see RoutingIndex), they are told apart by ip and port
+class NeighbourSelector:
+
+    def __init__(self, weight=LATENCY_WEIGHT, explore=EXPLORE_RATE, rng=None):
+        self.__weight = weight
+        self.__explore = explore
+        self.__random = random.Random() if rng is None else rng
+        self.__lock = threading.Lock()
+        self.__stats = {}  # ip:port: {'latency', 'in_flight', 'requests', 'failures'}
+
+    # one of candidates, raises IndexError if there are none
+    def choose(self, candidates: tuple):
+        if len(candidates) == 0:
+            raise IndexError("no neighbour to choose from")
+        if len(candidates) == 1 or self.__random.random() < self.__explore:
+            return self.__random.choice(candidates)
+        a, b = self.__random.sample(candidates, 2)
+        with self.__lock:
+            return a if self.__cost(a) <= self.__cost(b) else b
+
+    # call when a request is sent to neighbour, returns what finish needs
+    def start(self, neighbour):
+        with self.__lock:
+            self.__entry(neighbour)['in_flight'] += 1
+        return time.time()
+
+    # call when the request sent at started (returned by start) to neighbour is over
+    # measure is False for requests that are slow on purpose (ex: long polls) so they do not count as latency
+    def finish(self, neighbour, started: float, failed=False, measure=True):
+        latency = time.time() - started
+        with self.__lock:
+            entry = self.__entry(neighbour)
+            entry['in_flight'] -= 1
+            entry['requests'] += 1
+            if failed:
+                entry['failures'] += 1
+                latency = max(latency, FAILURE_LATENCY)
+            elif not measure:
+                return
+            if entry['latency'] is None:
+                entry['latency'] = latency
+            else:
+                entry['latency'] = self.__weight * latency + (1 - self.__weight) * entry['latency']
+
+    # {ip:port: {'latency': moving average (sec, None until measured), 'in_flight', 'requests', 'failures'}}
+    def stats(self):
+        with self.__lock:
+            return {key: dict(entry) for key, entry in self.__stats.items()}
+
+    # a neighbour that was never measured costs nothing so it gets tried, call with the lock held
+    def __cost(self, neighbour):
+        entry = self.__entry(neighbour)
+        if entry['latency'] is None:
+            return 0
+        return entry['latency'] * (entry['in_flight'] + 1)
+
+    def __entry(self, neighbour):
+        key = '{ip}:{port}'.format(ip=neighbour.ip, port=neighbour.port)
+        if key not in self.__stats:
+            self.__stats[key] = {'latency': None, 'in_flight': 0, 'requests': 0, 'failures': 0}
+        return self.__stats[key]
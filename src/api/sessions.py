@@ -0,0 +1,104 @@
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+import threading
+import requests
+import time
+
+SESSION_CONNECT_TIMEOUT = 3  # sec to open a connection to a neighbour
+# sec to wait for a neighbour to answer, longer than a peer ever holds a request (ex: a submit waiting on its batch)
+SESSION_READ_TIMEOUT = 75
+SESSION_POOL_SIZE = 16  # most connections open to one neighbour at a time, more requests wait for a free one
+SESSION_IDLE_TIMEOUT = 60  # sec a neighbour can go unused before its connections are closed
+SESSION_ACQUIRE_TIMEOUT = 5  # sec a request waits for a free connection to its neighbour before it is given up
+
+
+# raised when every connection to a neighbour stayed taken for the acquire timeout, the request was not sent
+# (a ConnectionError like the one requests raises for a full pool, so callers can send it elsewhere)
+class NeighbourBusy(requests.exceptions.ConnectionError):
+    pass
+
+
+# keep-alive connections to the APIs of other peers, one pool per neighbour (host:port) so forwards reuse connections
+# instead of opening (and leaving in TIME_WAIT) a new one for every request
+# requests the neighbour holds on purpose (held=True, ex: /wait/) get a pool of their own so a burst of long polls
+# does not take every connection the reads and submits to that neighbour need
+# made with get/post like requests, every request gets the pool timeouts unless it gives its own
+class NeighbourSessions:
+
+    def __init__(self, timeout=(SESSION_CONNECT_TIMEOUT, SESSION_READ_TIMEOUT), pool_size=SESSION_POOL_SIZE,
+                 idle_timeout=SESSION_IDLE_TIMEOUT, acquire_timeout=SESSION_ACQUIRE_TIMEOUT):
+        self.timeout = timeout
+        self.__pool_size = pool_size
+        self.__idle_timeout = idle_timeout
+        self.__acquire_timeout = acquire_timeout
+        self.__lock = threading.Lock()
+        self.__sessions = {}  # (host:port, held): [session, time last used, requests in flight, free connections]
+        self.__requests = 0
+        self.__opened = 0
+        self.__evicted = 0
+        self.__busy = 0
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    # raises NeighbourBusy if no connection to the neighbour came free within the acquire timeout
+    def request(self, method: str, url: str, held=False, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        entry = self.__acquire((urlsplit(url).netloc, held))
+        # the pool blocks without a timeout once it is full, so requests wait for a connection here instead
+        if not entry[3].acquire(timeout=self.__acquire_timeout):
+            with self.__lock:
+                entry[2] -= 1
+                self.__busy += 1
+            raise NeighbourBusy("no free connection to {} within {} sec".format(url, self.__acquire_timeout))
+        try:
+            if method == 'GET':
+                return entry[0].get(url, **kwargs)
+            if method == 'POST':
+                return entry[0].post(url, **kwargs)
+            return entry[0].request(method, url, **kwargs)
+        finally:
+            entry[3].release()
+            with self.__lock:
+                entry[1] = time.time()
+                entry[2] -= 1
+
+    # closes every pool
+    def close(self):
+        with self.__lock:
+            sessions, self.__sessions = self.__sessions, {}
+        for session, _, _, _ in sessions.values():
+            session.close()
+
+    # neighbours: pools open (a neighbour with held requests has two), busy: requests given up for a full pool
+    def stats(self):
+        with self.__lock:
+            return {'neighbours': len(self.__sessions), 'requests': self.__requests, 'opened': self.__opened,
+                    'evicted': self.__evicted, 'busy': self.__busy}
+
+    # returns the entry of neighbour ((host:port, held), made if there is none yet) and closes the pools of neighbours
+    # that went idle
+    def __acquire(self, neighbour: tuple):
+        now = time.time()
+        with self.__lock:
+            idle = [n for n, (_, used, in_flight, _) in self.__sessions.items()
+                    if n != neighbour and in_flight == 0 and now - used > self.__idle_timeout]
+            evicted = [self.__sessions.pop(n)[0] for n in idle]
+            self.__evicted += len(evicted)
+            if neighbour not in self.__sessions:
+                session = requests.Session()
+                # pool_block keeps the connections to one neighbour at pool_size, extra requests wait for a free one
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.__pool_size, pool_block=True)
+                session.mount('http://', adapter)
+                self.__sessions[neighbour] = [session, now, 0, threading.BoundedSemaphore(self.__pool_size)]
+                self.__opened += 1
+            entry = self.__sessions[neighbour]
+            entry[1] = now
+            entry[2] += 1
+            self.__requests += 1
+        for session in evicted:
+            session.close()
+        return entry
@@ -0,0 +1,20 @@
+import io
+import time
+import tarfile
+
+
+# packs files ({path in container: (text, mode)}) into a tar that put_archive can extract at /
+# the text is written with a trailing newline the same way keygen writes keys
+# only file entries are added: docker creates missing parent directories when it extracts, a directory entry would
+# reset the mode and owner of directories that are already there (e.g. /etc/sawtooth)
+def make_file_archive(files: dict):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w') as archive:
+        for path, (text, mode) in files.items():
+            content = '{}\n'.format(text).encode('utf-8')
+            info = tarfile.TarInfo(path.lstrip('/'))
+            info.size = len(content)
+            info.mode = mode
+            info.mtime = int(time.time())
+            archive.addfile(info, io.BytesIO(content))
+    return data.getvalue()
@@ -0,0 +1,176 @@
+from src.proto import string_field, bytes_field, repeated_string_field, repeated_message_field
+from src.signing import Secp256k1Signer
+from src.structures import Transaction
+from hashlib import sha512
+import struct
+import os
+
+# builds signed intkey transactions and batches on the host so they can be posted straight to /batches
+# see https://sawtooth.hyperledger.org/docs/core/releases/latest/transaction_family_specifications/integerkey_transaction_family.html
+# and https://sawtooth.hyperledger.org/docs/core/releases/latest/architecture/transactions_and_batches.html
+
+INTKEY_FAMILY_NAME = 'intkey'
+INTKEY_FAMILY_VERSION = '1.0'
+INTKEY_NAMESPACE = sha512(INTKEY_FAMILY_NAME.encode('utf-8')).hexdigest()[:6]
+INTKEY_MAX_VALUE = 2 ** 32 - 1
+
+# number of transactions packed in one batch, a batch is committed (or rejected) as a whole
+# transactions of different senders that must not fail together are sent with a batch size of 1 (see
+# SawtoothContainer.submit_txs)
+INTKEY_BATCH_SIZE = 100
+
+# content type the REST API expects when posting a serialized BatchList to /batches
+BATCH_CONTENT_TYPE = 'application/octet-stream'
+
+
+def intkey_address(key: str):
+    return INTKEY_NAMESPACE + sha512(key.encode('utf-8')).hexdigest()[-64:]
+
+
+# CBOR (https://tools.ietf.org/html/rfc7049) encoding of the types intkey uses (maps, text and unsigned ints)
+def _cbor_head(major_type: int, value: int):
+    if value < 24:
+        return bytes([(major_type << 5) | value])
+    if value < 2 ** 8:
+        return bytes([(major_type << 5) | 24]) + struct.pack('>B', value)
+    if value < 2 ** 16:
+        return bytes([(major_type << 5) | 25]) + struct.pack('>H', value)
+    if value < 2 ** 32:
+        return bytes([(major_type << 5) | 26]) + struct.pack('>I', value)
+    return bytes([(major_type << 5) | 27]) + struct.pack('>Q', value)
+
+
+def cbor_encode(value):
+    if isinstance(value, bool):
+        return b'\xf5' if value else b'\xf4'
+    if isinstance(value, int):
+        return _cbor_head(0, value) if value >= 0 else _cbor_head(1, -1 - value)
+    if isinstance(value, bytes):
+        return _cbor_head(2, len(value)) + value
+    if isinstance(value, str):
+        encoded = value.encode('utf-8')
+        return _cbor_head(3, len(encoded)) + encoded
+    if isinstance(value, (list, tuple)):
+        return _cbor_head(4, len(value)) + b''.join(cbor_encode(v) for v in value)
+    if isinstance(value, dict):
+        return _cbor_head(5, len(value)) + b''.join(cbor_encode(k) + cbor_encode(v) for k, v in value.items())
+    if value is None:
+        return b'\xf6'
+    raise TypeError("can not CBOR encode {}".format(type(value)))
+
+
+def _cbor_decode_at(data: bytes, offset: int):
+    initial = data[offset]
+    major_type, info = initial >> 5, initial & 0x1f
+    offset += 1
+    if major_type == 7:
+        if info == 20:
+            return False, offset
+        if info == 21:
+            return True, offset
+        if info in (22, 23):
+            return None, offset
+        if info == 25:
+            return struct.unpack('>e', data[offset:offset + 2])[0], offset + 2
+        if info == 26:
+            return struct.unpack('>f', data[offset:offset + 4])[0], offset + 4
+        if info == 27:
+            return struct.unpack('>d', data[offset:offset + 8])[0], offset + 8
+        raise ValueError("unsupported CBOR simple value {}".format(info))
+    if info < 24:
+        value = info
+    elif info in (24, 25, 26, 27):
+        size = 1 << (info - 24)
+        value = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    else:
+        raise ValueError("unsupported CBOR length {}".format(info))
+    if major_type == 0:
+        return value, offset
+    if major_type == 1:
+        return -1 - value, offset
+    if major_type == 2:
+        return data[offset:offset + value], offset + value
+    if major_type == 3:
+        return data[offset:offset + value].decode('utf-8'), offset + value
+    if major_type == 4:
+        items = []
+        for _ in range(value):
+            item, offset = _cbor_decode_at(data, offset)
+            items.append(item)
+        return items, offset
+    if major_type == 5:
+        items = {}
+        for _ in range(value):
+            key, offset = _cbor_decode_at(data, offset)
+            items[key], offset = _cbor_decode_at(data, offset)
+        return items, offset
+    # major type 6 is a tag, the tagged value follows it
+    return _cbor_decode_at(data, offset)
+
+
+def cbor_decode(data: bytes):
+    value, _ = _cbor_decode_at(data, 0)
+    return value
+
+
+# intkey state entries are CBOR maps of {key: value}, more then one key is stored when their addresses collide
+def decode_intkey_state(data: bytes):
+    return cbor_decode(data)
+
+
+# payload for the intkey cli command 'intkey {verb} {key} {value}'
+def intkey_payload(verb: str, key: str, value: int):
+    return cbor_encode({'Verb': verb, 'Name': key, 'Value': value})
+
+
+# returns the value of tx as an int, raises ValueError if tx can not be made into an intkey transaction
+def check_intkey_transaction(tx: Transaction):
+    try:
+        value = int(tx.value)
+    except (TypeError, ValueError):
+        raise ValueError("intkey values must be integers, got {}".format(tx.value))
+    if not 0 <= value <= INTKEY_MAX_VALUE:
+        raise ValueError("intkey values must be between 0 and {m}, got {v}".format(m=INTKEY_MAX_VALUE, v=value))
+    return value
+
+
+# makes a serialized Transaction message that sets tx.key to tx.value, returns (transaction, transaction id)
+def make_intkey_transaction(signer: Secp256k1Signer, tx: Transaction, verb='set'):
+    value = check_intkey_transaction(tx)
+    payload = intkey_payload(verb, tx.key, value)
+    address = intkey_address(tx.key)
+    header = string_field(1, signer.public_key_hex()) + \
+        string_field(3, INTKEY_FAMILY_NAME) + \
+        string_field(4, INTKEY_FAMILY_VERSION) + \
+        repeated_string_field(5, [address]) + \
+        string_field(6, os.urandom(16).hex()) + \
+        repeated_string_field(7, [address]) + \
+        string_field(9, sha512(payload).hexdigest()) + \
+        string_field(10, signer.public_key_hex())
+    transaction_id = signer.sign(header)
+    transaction = bytes_field(1, header) + string_field(2, transaction_id) + bytes_field(3, payload)
+    return transaction, transaction_id
+
+
+# makes a serialized Batch message holding all of the given transactions, returns (batch, batch id)
+def make_batch(signer: Secp256k1Signer, transactions: list):
+    encoded = [make_intkey_transaction(signer, tx) for tx in transactions]
+    header = string_field(1, signer.public_key_hex()) + repeated_string_field(2, [tx_id for _, tx_id in encoded])
+    batch_id = signer.sign(header)
+    batch = bytes_field(1, header) + string_field(2, batch_id) + repeated_message_field(3, [tx for tx, _ in encoded])
+    return batch, batch_id
+
+
+# makes a serialized BatchList for /batches with transactions split into batches of at most batch_size
+# returns (batch list, batch id of each transaction in the same order as transactions)
+# NOTE: sawtooth rejects a whole batch if any transaction in it is invalid (ex: setting a key that already exists)
+def make_batch_list(signer: Secp256k1Signer, transactions: list, batch_size=INTKEY_BATCH_SIZE):
+    batches = []
+    batch_ids = []
+    for start in range(0, len(transactions), batch_size):
+        chunk = transactions[start:start + batch_size]
+        batch, batch_id = make_batch(signer, chunk)
+        batches.append(batch)
+        batch_ids += [batch_id] * len(chunk)
+    return repeated_message_field(1, batches), batch_ids
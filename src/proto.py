@@ -0,0 +1,89 @@
+# minimal protocol buffer encoding, enough to build and read the sawtooth messages (transactions, batches, events ...)
+# on the host without pulling in the sawtooth sdk and its generated protobuf classes
+# see https://developers.google.com/protocol-buffers/docs/encoding
+
+WIRE_VARINT = 0
+WIRE_64BIT = 1
+WIRE_LENGTH_DELIMITED = 2
+WIRE_32BIT = 5
+
+
+def encode_varint(value: int):
+    if value < 0:
+        raise ValueError("negative varints are not supported, got {}".format(value))
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def encode_key(field_number: int, wire_type: int):
+    return encode_varint((field_number << 3) | wire_type)
+
+
+def bytes_field(field_number: int, value: bytes):
+    return encode_key(field_number, WIRE_LENGTH_DELIMITED) + encode_varint(len(value)) + value
+
+
+def string_field(field_number: int, value: str):
+    return bytes_field(field_number, value.encode('utf-8'))
+
+
+def varint_field(field_number: int, value: int):
+    return encode_key(field_number, WIRE_VARINT) + encode_varint(value)
+
+
+def repeated_string_field(field_number: int, values: list):
+    return b''.join(string_field(field_number, v) for v in values)
+
+
+# an embedded message is sent as a length delimited field holding the already encoded message
+def message_field(field_number: int, encoded_message: bytes):
+    return bytes_field(field_number, encoded_message)
+
+
+def repeated_message_field(field_number: int, encoded_messages: list):
+    return b''.join(message_field(field_number, m) for m in encoded_messages)
+
+
+# decodes one message into {field number: [values]}, varints are ints and length delimited fields are bytes (embedded
+# messages can be decoded again with decode_fields)
+def decode_fields(data: bytes):
+    fields = {}
+    offset = 0
+    while offset < len(data):
+        key, offset = decode_varint(data, offset)
+        field_number, wire_type = key >> 3, key & 0x7
+        if wire_type == WIRE_VARINT:
+            value, offset = decode_varint(data, offset)
+        elif wire_type == WIRE_LENGTH_DELIMITED:
+            length, offset = decode_varint(data, offset)
+            value = data[offset:offset + length]
+            offset += length
+        elif wire_type == WIRE_64BIT:
+            value = data[offset:offset + 8]
+            offset += 8
+        elif wire_type == WIRE_32BIT:
+            value = data[offset:offset + 4]
+            offset += 4
+        else:
+            raise ValueError("unsupported wire type {}".format(wire_type))
+        fields.setdefault(field_number, []).append(value)
+    return fields
+
+
+def decode_varint(data: bytes, offset: int):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
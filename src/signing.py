@@ -0,0 +1,44 @@
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+
+# order of the secp256k1 group, used to put signatures in low-S form (the only form sawtooth accepts)
+SECP256K1_ORDER = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+
+# signs sawtooth headers the same way sawtooth_signing does: ECDSA over the sha256 of the message with a secp256k1
+# key, signatures are the 64 byte compact (r || s) form as hex and public keys are compressed points as hex
+class Secp256k1Signer:
+
+    def __init__(self, private_key):
+        self.__private_key = private_key
+        self.__public_key_hex = self.__compressed_public_key(private_key)
+
+    # private_key_hex is the content of a sawtooth .priv file (ex: /root/.sawtooth/keys/root.priv)
+    @classmethod
+    def from_hex(cls, private_key_hex: str):
+        private_value = int(private_key_hex.strip(), 16)
+        return cls(ec.derive_private_key(private_value, ec.SECP256K1(), default_backend()))
+
+    @classmethod
+    def generate(cls):
+        return cls(ec.generate_private_key(ec.SECP256K1(), default_backend()))
+
+    def private_key_hex(self):
+        return '{:064x}'.format(self.__private_key.private_numbers().private_value)
+
+    def public_key_hex(self):
+        return self.__public_key_hex
+
+    def sign(self, message: bytes):
+        r, s = decode_dss_signature(self.__private_key.sign(message, ec.ECDSA(hashes.SHA256())))
+        if s > SECP256K1_ORDER // 2:
+            s = SECP256K1_ORDER - s
+        return '{:064x}{:064x}'.format(r, s)
+
+    @staticmethod
+    def __compressed_public_key(private_key):
+        numbers = private_key.public_key().public_numbers()
+        prefix = '03' if numbers.y & 1 else '02'
+        return '{p}{x:064x}'.format(p=prefix, x=numbers.x)
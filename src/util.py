@@ -4,6 +4,8 @@ from src.SawtoothPBFT import SawtoothContainer
 from src.SawtoothPBFT import DEFAULT_DOCKER_NETWORK
 from src.Intersection import Intersection
 from src.SmartShardPeer import SmartShardPeer
+from src.ContainerPool import ContainerPool
+from src.Teardown import teardown_manager, DEFAULT_EXPERIMENT
 import os
 import logging
 import logging.handlers
@@ -11,9 +13,14 @@ import requests
 import socket
 import json
 import time
+import threading
 from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 
 UPDATE_CONFIRMATION = 60
+GENESIS_WAIT = 5  # sec between reports of a peer still waiting for the genesis block
+GENESIS_TIMEOUT = 120  # sec a peer has to get the genesis block before its committee is given up
+BRING_UP_WORKERS = 16  # containers created or started at the same time per committee
 
 logging.basicConfig(
     format='%(asctime)s %(levelname)-2s %(message)s',
@@ -34,11 +41,12 @@ def util_log_to(path, console_logging=False):
     util_logger.addHandler(handler)
 
 
-def stop_all_containers():
-    client = docker_api.from_env()
-    for c in client.containers.list():
-        c.stop(timeout=0)
-    client.close()
+# kills and removes the containers made by SawtoothContainer concurrently (only the ones of experiment if one is given,
+# see EXPERIMENT_LABEL), other containers on the host are only touched with everything=True
+# returns {'containers': removed, 'seconds': time it took}
+def stop_all_containers(experiment=None, everything=False):
+    teardown_manager().drain()  # containers of dropped peers first
+    return teardown_manager().teardown(experiment, everything=everything)
 
 
 # gets a list of all running container ids
@@ -52,60 +60,98 @@ def get_container_ids():
 
 
 def check_for_confirmation(peers, number_of_tx, tx_key="NO_KEY_GIVEN", timeout=UPDATE_CONFIRMATION):
-    done = False
     start = time.time()
-    while not done:
-        time.sleep(0.5)
-        done = True
-
-        for p in peers:
-            peers_blockchain = len(p.blocks()['data'])
-            if number_of_tx > peers_blockchain:
-                done = False
-                break
-        if time.time() - start > timeout:
-            for p in peers:
-                peers_blockchain = len(p.blocks()['data'])
-                result = p.get_tx(tx_key)
-                logging.critical("{ip}: TIMEOUT unable to confirm tx {key}:{r}".format(ip=p.ip(), key=tx_key,
+    for p in peers:
+        remaining = timeout - (time.time() - start)
+        if not p.chain_head().wait_for_height(number_of_tx, max(remaining, 0)):
+            for peer in peers:
+                peers_blockchain = peer.chain_head().height()
+                result = peer.get_tx(tx_key)
+                logging.critical("{ip}: TIMEOUT unable to confirm tx {key}:{r}".format(ip=peer.ip(), key=tx_key,
                                                                                        r=result))
-                logging.critical("{ip}: TIMEOUT blockchain length:{l} waiting for {nt}".format(ip=p.ip(),
+                logging.critical("{ip}: TIMEOUT blockchain length:{l} waiting for {nt}".format(ip=peer.ip(),
                                                                                                l=peers_blockchain,
                                                                                                nt=number_of_tx))
             return False
     return True
 
 
+# makes the containers used for peers (keys are made on the host so no exec is needed for them)
+def new_container(network=DEFAULT_DOCKER_NETWORK, experiment=DEFAULT_EXPERIMENT):
+    return SawtoothContainer(network, host_keys=True, experiment=experiment)
+
+
+# a pool of containers that can be reused between experiments, see release_intersecting_committees
+def make_container_pool(max_idle=None):
+    return ContainerPool(new_container, max_idle=max_idle)
+
+
 # makes a test committee of user defined size
-def make_sawtooth_committee(size: int, network=DEFAULT_DOCKER_NETWORK):
+# containers are created, started and probed concurrently, pass a dict as timings to get the seconds spent in each
+# phase (create, start, ready and total)
+# pool: take the containers from a ContainerPool instead of running new ones
+def make_sawtooth_committee(size: int, network=DEFAULT_DOCKER_NETWORK, timings=None, pool=None):
     if size < 4:
         logging.error("COMMITTEE IMPOSSIBLE: can not make committees of less then 4 members, {} asked for".format(size))
         return []
     if size < 7:
         logging.warning("COMMITTEE UNSTABLE: making committees of less then 7 members can lead to issues with adding "
                         "and removing. ")
-    peers = [SawtoothContainer(network) for _ in range(size)]
-    peers[0].make_genesis([p.val_key() for p in peers], [p.user_key() for p in peers])
-
-    committee_ips = [p.ip() for p in peers]
-    for p in peers:
-        p.join_sawtooth(committee_ips)
-
-    # if the there are a lot of containers running wait longer for process to start
-    time.sleep(5 * size)
+    timings = {} if timings is None else timings
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=min(size, BRING_UP_WORKERS)) as executor:
+        if pool is not None:
+            peers = pool.acquire(size, network)
+        else:
+            peers = list(executor.map(lambda _: new_container(network), range(size)))
+        timings['create'] = time.time() - start
+
+        # genesis runs on the first member while the others are handed to the pool, they only need the admin key
+        # genesis picks before they can start
+        phase_start = time.time()
+        committee_ips = [p.ip() for p in peers]
+        val_keys = [p.val_key() for p in peers]
+        user_keys = [p.user_key() for p in peers]
+        genesis_done = threading.Event()
+
+        def start_member(index):
+            if index == 0:
+                try:
+                    peers[0].make_genesis(val_keys, user_keys)
+                finally:
+                    genesis_done.set()
+            else:
+                genesis_done.wait()
+            peers[index].join_sawtooth(committee_ips)
+
+        try:
+            list(executor.map(start_member, range(size)))
+            timings['start'] = time.time() - phase_start
+
+            phase_start = time.time()
+            list(executor.map(wait_for_genesis, peers))
+            timings['ready'] = time.time() - phase_start
+        except Exception as e:
+            # the containers go back to the pool or are torn down, nothing else holds on to them
+            util_logger.error("committee of {s} could not be started: {e}".format(s=size, e=e))
+            if pool is not None:
+                pool.release(list(peers), network)
+            peers.clear()
+            raise
+    timings['total'] = time.time() - start
+    util_logger.info("committee of {s} ready in {t:.1f}s (create {c:.1f}s, start {st:.1f}s, ready {r:.1f}s)".format(
+        s=size, t=timings['total'], c=timings['create'], st=timings['start'], r=timings['ready']))
+    return peers
 
-    done = False
-    while not done:
-        done = True
-        for p in peers:
-            if len(p.blocks()['data']) < 1:
-                logging.info("Peer {ip} could not get genesis block\n"
-                             "     blocks:{b}".format(ip=p.ip(), b=p.blocks()['data']))
-                done = False
-                time.sleep(0.5)
-                break
 
-    return peers
+# readiness probe, returns once the peers REST API is up and has the genesis block, raises TimeoutError if that takes
+# longer than timeout (sec)
+def wait_for_genesis(peer, timeout=GENESIS_TIMEOUT):
+    end = time.time() + timeout
+    while not peer.chain_head().wait_for_height(1, max(min(GENESIS_WAIT, end - time.time()), 0)):
+        if time.time() >= end:
+            raise TimeoutError("peer {ip} did not get the genesis block within {t}s".format(ip=peer.ip(), t=timeout))
+        logging.info("Peer {ip} could not get genesis block".format(ip=peer.ip()))
 
 
 def make_single_intersection(instances: list, committee_size: int):
@@ -122,11 +168,11 @@ def make_single_intersection(instances: list, committee_size: int):
     return peers
 
 
-def make_intersecting_committees(number_of_committees: int, intersections: int):
-    pbft_instance = []
+def make_intersecting_committees(number_of_committees: int, intersections: int, pool=None):
     committee_size = (number_of_committees - 1) * intersections
-    for _ in range(number_of_committees):
-        pbft_instance.append(make_sawtooth_committee(committee_size))
+    with ThreadPoolExecutor(max_workers=number_of_committees) as executor:
+        pbft_instance = list(executor.map(lambda _: make_sawtooth_committee(committee_size, pool=pool),
+                                          range(number_of_committees)))
 
     peers = []
     # for committees with more then one intersection they are made by combining a series
@@ -144,22 +190,17 @@ def make_intersecting_committees(number_of_committees: int, intersections: int):
 def get_neighbors(quorum, network: map):
     neighbors = []
     for neighbor_peer_port in network:
-        neighbor_membership = [network[neighbor_peer_port].app.api.config[PBFT_INSTANCES].committee_id_a,
-                               network[neighbor_peer_port].app.api.config[PBFT_INSTANCES].committee_id_b]
-
-        if quorum == neighbor_membership[0]:
-            neighbors.append({
-                API_IP: "localhost",
-                PORT: "{}".format(neighbor_peer_port),
-                QUORUM_ID: "{}".format(neighbor_membership[1])
-            })
-
-        if quorum == neighbor_membership[1]:
-            neighbors.append({
-                API_IP: "localhost",
-                PORT: "{}".format(neighbor_peer_port),
-                QUORUM_ID: "{}".format(neighbor_membership[0])
-            })
+        neighbor_membership = network[neighbor_peer_port].app.api.config[PBFT_INSTANCES].committee_ids()
+        if quorum not in neighbor_membership:
+            continue
+        # the neighbour can reach every other quorum it is in
+        for other_quorum in neighbor_membership:
+            if other_quorum != quorum:
+                neighbors.append({
+                    API_IP: "localhost",
+                    PORT: "{}".format(neighbor_peer_port),
+                    QUORUM_ID: "{}".format(other_quorum)
+                })
 
     return neighbors
 
@@ -192,8 +233,9 @@ def get_ports(size):
 
 # starts a set of peers on the same host (differentiated by port number)
 # returns a dict {portNumber : SmartShardPeer}
-def make_intersecting_committees_on_host(number_of_committees: int, intersections: int):
-    inter = make_intersecting_committees(number_of_committees, intersections)
+# pool: take the containers from a ContainerPool, give them back with release_intersecting_committees
+def make_intersecting_committees_on_host(number_of_committees: int, intersections: int, pool=None):
+    inter = make_intersecting_committees(number_of_committees, intersections, pool=pool)
     peers = {}
     for i in inter:
         port_number = find_free_port()
@@ -201,24 +243,31 @@ def make_intersecting_committees_on_host(number_of_committees: int, intersection
         peers[port_number].start()
 
     for port in peers:
-        quorum_id = peers[port].app.api.config[PBFT_INSTANCES].committee_id_a
         other_peers = {}
         for p in peers:
             if peers[p].port != port:
                 other_peers[p] = peers[p]
-        add_json = json.loads(json.dumps({
-            NEIGHBOURS: get_neighbors(quorum_id, other_peers)
-        }))
-        url = "http://localhost:{port}/add/{quorum}".format(port=port, quorum=quorum_id)
-        requests.post(url, json=add_json)
-
-        quorum_id = peers[port].app.api.config[PBFT_INSTANCES].committee_id_b
-        add_json = json.loads(json.dumps({
-            NEIGHBOURS: get_neighbors(quorum_id, other_peers)
-        }))
-        url = "http://localhost:{port}/add/{quorum}".format(port=port, quorum=quorum_id)
-        requests.post(url, json=add_json)
+        for quorum_id in peers[port].app.api.config[PBFT_INSTANCES].committee_ids():
+            add_json = json.loads(json.dumps({
+                NEIGHBOURS: get_neighbors(quorum_id, other_peers)
+            }))
+            url = "http://localhost:{port}/add/{quorum}".format(port=port, quorum=quorum_id)
+            requests.post(url, json=add_json)
 
         peers[port].check_neighbors(port)
 
     return peers
+
+
+# stops the APIs of peers (made by make_intersecting_committees_on_host) and hands their containers back to pool to be
+# reset and reused by the next experiment, peers is emptied
+def release_intersecting_committees(peers: dict, pool: ContainerPool, network=DEFAULT_DOCKER_NETWORK):
+    containers = {}
+    for port in list(peers.keys()):
+        inter = peers[port].inter
+        for container in inter.instances().values():
+            containers[container.id()] = container
+        del peers[port]
+    start = time.time()
+    pool.release(list(containers.values()), network)
+    util_logger.info("recycled {c} containers in {t:.1f}s".format(c=len(containers), t=time.time() - start))
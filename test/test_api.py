@@ -2,10 +2,13 @@ import src.api as api
 from src.SawtoothPBFT import SawtoothContainer
 from src.Intersection import Intersection
 from src.api.constants import PBFT_INSTANCES, QUORUMS, QUORUM_ID, TRANSACTION_KEY, TRANSACTION_VALUE, NEIGHBOURS, API_IP, ROUTE_EXECUTED_CORRECTLY
-from src.api.constants import PORT, USER_KEY, VALIDATOR_KEY, DOCKER_IP
+from src.api.constants import PORT, USER_KEY, VALIDATOR_KEY, DOCKER_IP, TRANSACTIONS, TRANSACTION_STATUS
+from src.api.constants import BATCH_ID, RECEIPTS, STATUS_WAIT, WAIT_TIMEOUT, CONFIRMED, WAITED, ROUTING
 from src.SawtoothPBFT import VALIDATOR_KEY as VKEY
 from src.SawtoothPBFT import USER_KEY as UKEY
+from src.SawtoothPBFT import BATCH_COMMITTED
 from src.util import stop_all_containers
+from src.Teardown import teardown_manager
 from src.api.api_util import get_plain_text
 import docker as docker_api
 import unittest
@@ -161,11 +164,12 @@ class TestAPI(unittest.TestCase):
         docker = docker_api.from_env()
         self.assertEqual(2, len(docker.containers.list()))
 
-        # get info on container a
-        container_ip = docker.containers.list()[1].exec_run("hostname -i").output.decode('utf-8').strip()
-        container_val_key = docker.containers.list()[1].exec_run("cat {val_pub}".format(val_pub=VKEY["pub"])) \
+        # get info on container a (both are started at the same time so look it up by id)
+        container = docker.containers.get(app.config[PBFT_INSTANCES].instance('a').id())
+        container_ip = container.exec_run("hostname -i").output.decode('utf-8').strip()
+        container_val_key = container.exec_run("cat {val_pub}".format(val_pub=VKEY["pub"])) \
             .output.decode('utf-8').strip()
-        container_user_key = docker.containers.list()[1].exec_run("cat {user_pub}".format(user_pub=UKEY["pub"])) \
+        container_user_key = container.exec_run("cat {user_pub}".format(user_pub=UKEY["pub"])) \
             .output.decode('utf-8').strip()
 
         self.assertEqual(get_plain_text(client.get('/ip/a')), container_ip)
@@ -174,10 +178,11 @@ class TestAPI(unittest.TestCase):
         self.assertNotEqual(get_plain_text(client.get('/val+key/a')), get_plain_text(client.get('/user+key/a')))
 
         # get info on container b
-        container_ip = docker.containers.list()[0].exec_run("hostname -i").output.decode('utf-8').strip()
-        container_val_key = docker.containers.list()[0].exec_run("cat {val_pub}".format(val_pub=VKEY["pub"])) \
+        container = docker.containers.get(app.config[PBFT_INSTANCES].instance('b').id())
+        container_ip = container.exec_run("hostname -i").output.decode('utf-8').strip()
+        container_val_key = container.exec_run("cat {val_pub}".format(val_pub=VKEY["pub"])) \
             .output.decode('utf-8').strip()
-        container_user_key = docker.containers.list()[0].exec_run("cat {user_pub}".format(user_pub=UKEY["pub"])) \
+        container_user_key = container.exec_run("cat {user_pub}".format(user_pub=UKEY["pub"])) \
             .output.decode('utf-8').strip()
 
         self.assertEqual(get_plain_text(client.get('/ip/b')), container_ip)
@@ -185,6 +190,46 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(get_plain_text(client.get('/user+key/b')), container_user_key)
         self.assertNotEqual(get_plain_text(client.get('/val+key/b')), get_plain_text(client.get('/user+key/b')))
 
+    def test_api_start_many(self):
+        app = api.create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        client = app.test_client()
+
+        # a peer can be started in more then two quorums
+        response = client.get('/start/a/b/c')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'a': [], 'b': [], 'c': []}, app.config[QUORUMS])
+        self.assertEqual(['a', 'b', 'c'], app.config[PBFT_INSTANCES].committee_ids())
+        docker = docker_api.from_env()
+        self.assertEqual(3, len(docker.containers.list()))
+        ips = [get_plain_text(client.get('/ip/{}'.format(q))) for q in ['a', 'b', 'c']]
+        self.assertEqual(3, len(set(ips)))
+
+    def test_api_restart_failure(self):
+        app = api.create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        client = app.test_client()
+        self.assertEqual(200, client.get('/start/a/b').status_code)
+
+        # the second quorum can not be started, the container made for the first one is not kept
+        made = []
+
+        def container():
+            if len(made) > 0:
+                raise RuntimeError("no container")
+            made.append(True)
+            return SawtoothContainer()
+
+        with patch('src.api.routes.SawtoothContainer', side_effect=container):
+            self.assertIn("ERROR", get_plain_text(client.get('/start/a/b')))
+        self.assertIsNone(app.config[PBFT_INSTANCES])
+        self.assertEqual(200, client.get('/info/').status_code)
+        gc.collect()
+        teardown_manager().drain()
+        self.assertEqual(0, len(docker_api.from_env().containers.list()))
+
     def test_start_with_peer(self):
         a = SawtoothContainer()
         b = SawtoothContainer()
@@ -278,6 +323,12 @@ class TestAPI(unittest.TestCase):
 
         self.assertEqual(app.config[QUORUMS]["b"], [])
 
+        # the neighbours can be found by the quorum they reach
+        self.assertEqual([("192.168.1.300", "5000", "a")],
+                         [(n.ip, n.port, n.via) for n in app.config[ROUTING].neighbours("d")])
+        client.post('/remove/5000', json={})
+        self.assertEqual((), app.config[ROUTING].neighbours("d"))
+
     def test_make_genesis(self):
         peer_api_one = api.create_app()
         peer_api_one.config['TESTING'] = True
@@ -370,13 +421,22 @@ class TestAPI(unittest.TestCase):
         for p in peers:
             p.post('/join/a', json=data)
 
-        peers[0].post('/submit/', json=TRANSACTION_A_JSON)
-        time.sleep(3)
+        receipt = json.loads(get_plain_text(peers[0].post('/submit/', json=TRANSACTION_A_JSON)))
+        self.assertEqual(ROUTE_EXECUTED_CORRECTLY, receipt[TRANSACTION_STATUS])
+        self.assertIsNotNone(receipt[BATCH_ID])
+
+        # every member can tell when the batch commits
+        for p in peers:
+            statuses = json.loads(get_plain_text(p.post('/status/', json={RECEIPTS: [receipt], STATUS_WAIT: 10})))
+            self.assertEqual([BATCH_COMMITTED], [s[TRANSACTION_STATUS] for s in statuses])
+            waited = json.loads(get_plain_text(p.post('/wait/', json={TRANSACTIONS: [TRANSACTION_A_JSON],
+                                                                      WAIT_TIMEOUT: 10})))
+            self.assertEqual([True], [w[CONFIRMED] for w in waited])
 
         for p in peers:
             self.assertEqual('999', get_plain_text(p.post('/get/', json=TRANSACTION_A_JSON)))
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_min_intersection_all_equal_depth_0(self, mock_get):
         # Fully connected, 5 quorums
         intersection_maps = [
@@ -405,7 +465,7 @@ class TestAPI(unittest.TestCase):
         res = test_client.get('/min+intersection')
         self.assertEqual(res.get_json(), ['a', 'b'])
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_min_intersection_1_less_than_rest_depth_0(self, mock_get):
         # Almost fully connected, missing A-C peer
         intersection_maps = [
@@ -433,7 +493,7 @@ class TestAPI(unittest.TestCase):
         res = test_client.get('/min+intersection')
         self.assertEqual(res.get_json(), ['a', 'c'])
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_min_intersection_2_less_than_rest_depth_0(self, mock_get):
         # Almost fully connected, missing A-C peer and B-D peer
         intersection_maps = [
@@ -460,7 +520,7 @@ class TestAPI(unittest.TestCase):
         res = test_client.get('/min+intersection')
         self.assertEqual(res.get_json(), ['a', 'c'])
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_min_intersection_all_equal_depth_1(self, mock_get):
         # Fully connected, 5 quorums
         intersection_maps = [
@@ -505,7 +565,7 @@ class TestAPI(unittest.TestCase):
         }
         self.assertEqual(res.get_json(), expected_intersection_map)
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_min_intersection_all_equal_depth_2(self, mock_get):
         # Fully connected, 5 quorums
         intersection_maps = [
@@ -545,7 +605,156 @@ class TestAPI(unittest.TestCase):
         }
         self.assertEqual(res.get_json(), expected_intersection_map)
     
-    @patch('requests.post')
+    @patch('requests.Session.post')
+    def test_submit_batch_forward(self, mock_post):
+        # every foreign quorum gets one forward holding all of its transactions
+        def neighbour(url, **kwargs):
+            res = Mock(spec=Response)
+            res.text = json.dumps([{QUORUM_ID: tx[QUORUM_ID], TRANSACTION_KEY: tx[TRANSACTION_KEY],
+                                    TRANSACTION_STATUS: ROUTE_EXECUTED_CORRECTLY} for tx in kwargs['json'][TRANSACTIONS]])
+            return res
+        mock_post.side_effect = neighbour
+        app = api.create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        test_client = app.test_client()
+        test_client.get('/start/a/b')
+        test_client.post('/add/a', json=ADD_A_JSON)
+
+        txs = [{QUORUM_ID: q, TRANSACTION_KEY: 'test{}'.format(i), TRANSACTION_VALUE: str(i)}
+               for i, q in enumerate(['c', 'd', 'c', 'e', 'c'])]
+        response = test_client.post('/submit/batch', json={TRANSACTIONS: txs})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, mock_post.call_count)
+        statuses = json.loads(get_plain_text(response))
+        self.assertEqual([(tx[QUORUM_ID], tx[TRANSACTION_KEY]) for tx in txs],
+                         [(s[QUORUM_ID], s[TRANSACTION_KEY]) for s in statuses])
+        self.assertEqual([ROUTE_EXECUTED_CORRECTLY] * 5, [s[TRANSACTION_STATUS] for s in statuses])
+
+    def test_submit_batch_invalid_transaction(self):
+        # a transaction that is not valid fails on its own, the others of its quorum are still submitted
+        app = api.create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        test_client = app.test_client()
+        test_client.get('/start/a/b')
+
+        txs = [{QUORUM_ID: 'a', TRANSACTION_KEY: 'test{}'.format(i), TRANSACTION_VALUE: value}
+               for i, value in enumerate(['1', '2', 'not-a-number', '4'])]
+        statuses = json.loads(get_plain_text(test_client.post('/submit/batch', json={TRANSACTIONS: txs})))
+        self.assertEqual([ROUTE_EXECUTED_CORRECTLY, ROUTE_EXECUTED_CORRECTLY, ROUTE_EXECUTED_CORRECTLY],
+                         [statuses[i][TRANSACTION_STATUS] for i in [0, 1, 3]])
+        self.assertIn("ERROR", statuses[2][TRANSACTION_STATUS])
+        self.assertIsNone(statuses[2][BATCH_ID])
+        # every transaction is a batch of its own
+        self.assertEqual(3, len({statuses[i][BATCH_ID] for i in [0, 1, 3]}))
+
+    @patch('requests.Session.post')
+    def test_get_batch_forward(self, mock_post):
+        # every foreign quorum gets one forward holding all of its keys
+        def neighbour(url, **kwargs):
+            res = Mock(spec=Response)
+            res.text = json.dumps([{QUORUM_ID: tx[QUORUM_ID], TRANSACTION_KEY: tx[TRANSACTION_KEY],
+                                    TRANSACTION_VALUE: tx[QUORUM_ID] + tx[TRANSACTION_KEY],
+                                    TRANSACTION_STATUS: ROUTE_EXECUTED_CORRECTLY} for tx in kwargs['json'][TRANSACTIONS]])
+            return res
+        mock_post.side_effect = neighbour
+        app = api.create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        test_client = app.test_client()
+        test_client.get('/start/a/b')
+        test_client.post('/add/a', json=ADD_A_JSON)
+
+        txs = [{QUORUM_ID: q, TRANSACTION_KEY: 'test{}'.format(i)} for i, q in enumerate(['e', 'c', 'd', 'c'])]
+        response = test_client.post('/get/batch', json={TRANSACTIONS: txs})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, mock_post.call_count)
+        values = json.loads(get_plain_text(response))
+        self.assertEqual([tx[QUORUM_ID] + tx[TRANSACTION_KEY] for tx in txs], [v[TRANSACTION_VALUE] for v in values])
+
+    @patch('requests.Session.post')
+    def test_status_forward(self, mock_post):
+        # every foreign quorum gets one forward holding all of its receipts
+        def neighbour(url, **kwargs):
+            res = Mock(spec=Response)
+            res.text = json.dumps([{QUORUM_ID: r[QUORUM_ID], BATCH_ID: r[BATCH_ID], TRANSACTION_STATUS: BATCH_COMMITTED}
+                                   for r in kwargs['json'][RECEIPTS]])
+            return res
+        mock_post.side_effect = neighbour
+        app = api.create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        test_client = app.test_client()
+        test_client.get('/start/a/b')
+        test_client.post('/add/a', json=ADD_A_JSON)
+
+        receipts = [{QUORUM_ID: q, BATCH_ID: 'batch{}'.format(i)} for i, q in enumerate(['c', 'd', 'c'])]
+        response = test_client.post('/status/', json={RECEIPTS: receipts, STATUS_WAIT: 5})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, mock_post.call_count)
+        self.assertEqual(5, mock_post.call_args[1]['json'][STATUS_WAIT])
+        statuses = json.loads(get_plain_text(response))
+        self.assertEqual([r[BATCH_ID] for r in receipts], [s[BATCH_ID] for s in statuses])
+        self.assertEqual([BATCH_COMMITTED] * 3, [s[TRANSACTION_STATUS] for s in statuses])
+
+    @patch('requests.Session.post')
+    def test_wait_forward(self, mock_post):
+        # every foreign quorum gets one long poll holding all of its keys
+        def neighbour(url, **kwargs):
+            res = Mock(spec=Response)
+            res.text = json.dumps([{QUORUM_ID: tx[QUORUM_ID], TRANSACTION_KEY: tx[TRANSACTION_KEY],
+                                    CONFIRMED: tx[QUORUM_ID] == 'c', WAITED: 0.5 if tx[QUORUM_ID] == 'c' else None}
+                                   for tx in kwargs['json'][TRANSACTIONS]])
+            return res
+        mock_post.side_effect = neighbour
+        app = api.create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        test_client = app.test_client()
+        test_client.get('/start/a/b')
+        test_client.post('/add/a', json=ADD_A_JSON)
+
+        txs = [{QUORUM_ID: q, TRANSACTION_KEY: 'test{}'.format(i), TRANSACTION_VALUE: str(i)}
+               for i, q in enumerate(['c', 'd', 'c'])]
+        response = test_client.post('/wait/', json={TRANSACTIONS: txs, WAIT_TIMEOUT: 5})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, mock_post.call_count)
+        self.assertTrue(all(0 < call[1]['json'][WAIT_TIMEOUT] <= 5 for call in mock_post.call_args_list))
+        waited = json.loads(get_plain_text(response))
+        self.assertEqual([True, False, True], [w[CONFIRMED] for w in waited])
+        # the time the other peer waited is counted from when this peer got the request
+        self.assertIsNone(waited[1][WAITED])
+        self.assertTrue(all(0.5 <= waited[i][WAITED] < 1 for i in [0, 2]))
+
+        # a forward with no time left does not wait the default timeout
+        test_client.post('/wait/', json={TRANSACTIONS: txs[:1], WAIT_TIMEOUT: 0})
+        self.assertEqual(0, mock_post.call_args[1]['json'][WAIT_TIMEOUT])
+
+    @patch('requests.Session.post')
+    def test_wait_local_and_forward_together(self, mock_post):
+        # the forward and the local wait run at the same time, the request takes as long as the longer of them
+        def neighbour(url, **kwargs):
+            time.sleep(1)
+            res = Mock(spec=Response)
+            res.text = json.dumps([{QUORUM_ID: tx[QUORUM_ID], TRANSACTION_KEY: tx[TRANSACTION_KEY], CONFIRMED: False,
+                                    WAITED: None} for tx in kwargs['json'][TRANSACTIONS]])
+            return res
+        mock_post.side_effect = neighbour
+        app = api.create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        test_client = app.test_client()
+        test_client.get('/start/a/b')
+        test_client.post('/add/a', json=ADD_A_JSON)
+
+        txs = [{QUORUM_ID: q, TRANSACTION_KEY: 'never', TRANSACTION_VALUE: '1'} for q in ['a', 'c']]
+        start = time.time()
+        waited = json.loads(get_plain_text(test_client.post('/wait/', json={TRANSACTIONS: txs, WAIT_TIMEOUT: 1})))
+        self.assertLess(time.time() - start, 1.8)
+        self.assertEqual([False, False], [w[CONFIRMED] for w in waited])
+
+    @patch('requests.Session.post')
     def test_request_join(self, mock_post):
         side_effects = [
             ['a', 'b'],
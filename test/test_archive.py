@@ -0,0 +1,42 @@
+from src.archive import make_file_archive
+import unittest
+import tarfile
+import io
+import gc
+
+FILES = {
+    "/root/.sawtooth/keys/root.priv": ("2f1e7b7a", 0o600),
+    "/etc/sawtooth/keys/validator.pub": ("02a1b2c3", 0o644),
+    "/admin.priv": ("deadbeef", 0o600),
+}
+
+
+class TestArchiveMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_round_trip(self):
+        with tarfile.open(fileobj=io.BytesIO(make_file_archive(FILES)), mode='r') as archive:
+            members = archive.getmembers()
+            # paths are relative to / where put_archive extracts them
+            self.assertEqual(sorted(path.lstrip('/') for path in FILES), sorted(m.name for m in members))
+            for path, (text, mode) in FILES.items():
+                info = archive.getmember(path.lstrip('/'))
+                self.assertTrue(info.isfile())
+                self.assertEqual(mode, info.mode)
+                # written like keygen writes keys, with a trailing newline
+                self.assertEqual('{}\n'.format(text), archive.extractfile(info).read().decode('utf-8'))
+
+    def test_no_directory_entries(self):
+        # a directory entry would reset the mode of directories already in the container (e.g. /etc/sawtooth)
+        with tarfile.open(fileobj=io.BytesIO(make_file_archive(FILES)), mode='r') as archive:
+            self.assertTrue(all(m.isfile() for m in archive.getmembers()))
+
+    def test_empty(self):
+        with tarfile.open(fileobj=io.BytesIO(make_file_archive({})), mode='r') as archive:
+            self.assertEqual([], archive.getmembers())
+
+
+if __name__ == '__main__':
+    unittest.main()
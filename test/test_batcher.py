@@ -0,0 +1,99 @@
+from src.api.batcher import QuorumBatcher, MicroBatcher
+from src.intkey import check_intkey_transaction
+from src.structures import Transaction
+import threading
+import unittest
+import time
+import gc
+
+
+# stands in for Intersection.submit_txs, records every batch it gets
+class StandInFlush:
+    def __init__(self, delay=0.0, fail=False):
+        self.batches = []
+        self.delay = delay
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self, txs):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("quorum unreachable")
+        with self.lock:
+            self.batches.append(txs)
+        return [self.result(tx) for tx in txs]
+
+    # like SawtoothContainer.submit_txs a transaction that is not valid gets its ValueError instead of a batch id
+    @staticmethod
+    def result(tx):
+        try:
+            check_intkey_transaction(tx)
+        except ValueError as e:
+            return e
+        return "batch{}".format(tx.key)
+
+
+class TestBatcherMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_single(self):
+        flush = StandInFlush()
+        batcher = QuorumBatcher(flush)
+        future = batcher.submit(Transaction('a', 'k', 1))
+        self.assertEqual('batchk', future.result(timeout=1))
+        self.assertEqual(1, len(flush.batches))
+
+    def test_burst_shares_batches(self):
+        flush = StandInFlush(delay=0.05)
+        batcher = QuorumBatcher(flush, max_size=10, max_delay=0.2)
+        futures = [batcher.submit(Transaction('a', str(i), i)) for i in range(50)]
+        self.assertEqual(['batch{}'.format(i) for i in range(50)], [f.result(timeout=5) for f in futures])
+        # every transaction is flushed once, in order and never more then max_size at a time
+        self.assertEqual([str(i) for i in range(50)], [tx.key for batch in flush.batches for tx in batch])
+        self.assertTrue(all(len(batch) <= 10 for batch in flush.batches))
+        self.assertLess(len(flush.batches), 50)
+        self.assertEqual(50, batcher.stats()['transactions'])
+
+    def test_adapts_to_arrival_rate(self):
+        batcher = QuorumBatcher(StandInFlush(), max_size=100, max_delay=0.05, min_delay=0.001)
+        for i in range(5):
+            batcher.submit(Transaction('a', str(i), i)).result(timeout=1)
+            time.sleep(0.1)
+        # submissions further apart then max_delay are not held back
+        self.assertEqual(1, batcher.batch_size())
+        self.assertLessEqual(batcher.delay(), 0.05)
+
+        for i in range(200):
+            batcher.submit(Transaction('a', str(i), i))
+        self.assertGreater(batcher.batch_size(), 1)
+
+    def test_failed_flush(self):
+        batcher = QuorumBatcher(StandInFlush(fail=True))
+        future = batcher.submit(Transaction('a', 'k', 1))
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=1)
+
+    def test_invalid_transaction_fails_alone(self):
+        batcher = QuorumBatcher(StandInFlush(), max_size=4, max_delay=0.2, min_delay=0.1)
+        futures = [batcher.submit(Transaction('a', str(i), value)) for i, value in enumerate(['1', '2', 'nan', '4'])]
+        with self.assertRaises(ValueError):
+            futures[2].result(timeout=1)
+        self.assertEqual(['batch0', 'batch1', 'batch3'], [futures[i].result(timeout=1) for i in [0, 1, 3]])
+        self.assertEqual(1, batcher.stats()['batches'])
+
+    def test_quorums(self):
+        flush = StandInFlush()
+        batcher = MicroBatcher(flush)
+        futures = [batcher.submit(Transaction(q, str(i), i)) for i in range(10) for q in ['a', 'b']]
+        for f in futures:
+            f.result(timeout=1)
+        # a batch only holds transactions of one quorum
+        for batch in flush.batches:
+            self.assertEqual(1, len(set(tx.quorum_id for tx in batch)))
+        self.assertEqual({'a', 'b'}, set(batcher.stats().keys()))
+
+
+if __name__ == "__main__":
+    unittest.main()
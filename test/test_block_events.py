@@ -0,0 +1,170 @@
+from src.BlockEvents import BlockEventSubscriber, make_block_commit_event, make_state_delta_event
+from src.BlockEvents import encode_event_list, decode_event_list, CLIENT_EVENTS, encode_message, decode_message
+from src.ChainHead import ChainHead
+from src.intkey import intkey_address, cbor_encode
+from concurrent.futures import CancelledError
+from mock import patch
+import threading
+import unittest
+import queue
+import time
+import gc
+
+
+# stands in for a validators event stream, publish() sends a block the way the validator would (one message holding
+# the state changes and the commit of the block)
+class StandInEventPublisher:
+    def __init__(self, accept=True, blocks=0):
+        self.accept = accept
+        self.subscribed_with = None
+        self.closed = False
+        self.__messages = queue.Queue()
+        self.__blocks = blocks
+
+    def publish(self, values=None, fail=False):
+        if fail:
+            self.__messages.put(None)
+            return
+        events = []
+        if values is not None:
+            changes = {intkey_address(key): cbor_encode({key: value}) for key, value in values.items()}
+            events.append(make_state_delta_event(changes))
+        events.append(make_block_commit_event(self.__blocks, 'block{}'.format(self.__blocks)))
+        self.__blocks += 1
+        self.__messages.put(encode_message(CLIENT_EVENTS, 'id', encode_event_list(events)))
+
+    def subscribe(self, last_known_block_ids):
+        self.subscribed_with = last_known_block_ids
+        return self.accept
+
+    def receive(self, timeout):
+        try:
+            message = self.__messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if message is None:
+            raise ConnectionError("stand in publisher went away")
+        _, _, content = decode_message(message)
+        return decode_event_list(content)
+
+    def close(self):
+        self.closed = True
+
+
+class TestBlockEventsMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.publisher = StandInEventPublisher()
+        self.subscriber = BlockEventSubscriber(self.publisher)
+
+    def tearDown(self) -> None:
+        if self.subscriber.alive():
+            self.subscriber.stop()
+        gc.collect()
+
+    def test_subscribe(self):
+        self.assertTrue(self.subscriber.start('block0', 1))
+        self.assertEqual(['block0'], self.publisher.subscribed_with)
+        self.assertEqual(1, self.subscriber.height())
+        self.subscriber.stop()
+        self.assertTrue(self.publisher.closed)
+
+        self.subscriber = BlockEventSubscriber(StandInEventPublisher(accept=False))
+        self.assertFalse(self.subscriber.start())
+        self.assertFalse(self.subscriber.alive())
+
+    def test_wait_for_height(self):
+        self.subscriber.start()
+        self.assertTrue(self.subscriber.wait_for_height(0).done())
+        future = self.subscriber.wait_for_height(2)
+        self.publisher.publish()
+        time.sleep(0.1)
+        self.assertFalse(future.done())
+        self.publisher.publish()
+        self.assertEqual(2, future.result(timeout=1))
+        self.assertEqual(2, self.subscriber.height())
+
+    def test_wait_for_key(self):
+        self.subscriber.start()
+        any_value = self.subscriber.wait_for_key('test')
+        value_999 = self.subscriber.wait_for_key('test', '999')
+        other_key = self.subscriber.wait_for_key('other')
+        self.publisher.publish({'test': 1})
+        self.assertEqual('1', any_value.result(timeout=1))
+        self.publisher.publish({'test': 999})
+        self.assertEqual('999', value_999.result(timeout=1))
+        self.assertFalse(other_key.done())
+        self.subscriber.forget('other', other_key)
+        self.assertTrue(other_key.cancelled())
+
+    def test_stream_failure(self):
+        self.subscriber.start()
+        future = self.subscriber.wait_for_height(10)
+        self.publisher.publish(fail=True)
+        with self.assertRaises(CancelledError):
+            future.result(timeout=1)
+        self.assertFalse(self.subscriber.alive())
+        # the stream of a failed subscriber is closed before a new one is made
+        self.subscriber.stop()
+        self.assertTrue(self.publisher.closed)
+
+    def test_cancelled_waiter(self):
+        self.subscriber.start()
+        # the waiter gave up on its own (ex: timed out) while its value is being committed
+        cancelled = self.subscriber.wait_for_key('test', '999')
+        cancelled.cancel()
+        height = self.subscriber.wait_for_height(1)
+        self.publisher.publish({'test': 999})
+        self.assertEqual(1, height.result(timeout=1))
+        self.assertTrue(self.subscriber.alive())
+
+    def test_listener_failure(self):
+        self.subscriber.start()
+        seen = threading.Event()
+        self.subscriber.add_listener(lambda block_num, block_id: 1 / 0)
+        self.subscriber.add_listener(lambda block_num, block_id: seen.set())
+        future = self.subscriber.wait_for_height(1)
+        self.publisher.publish()
+        self.assertEqual(1, future.result(timeout=1))
+        self.assertTrue(seen.wait(timeout=1))
+        self.assertTrue(self.subscriber.alive())
+
+    def test_handle_failure(self):
+        # events that can not be handled end the subscriber, waiters go back to polling instead of hanging
+        with patch.object(self.subscriber, 'handle', side_effect=ValueError("bad event")):
+            self.subscriber.start()
+            future = self.subscriber.wait_for_height(10)
+            self.publisher.publish()
+            with self.assertRaises(CancelledError):
+                future.result(timeout=1)
+        self.assertFalse(self.subscriber.alive())
+
+    def test_not_alive_after_fork(self):
+        self.subscriber.start()
+        future = self.subscriber.wait_for_height(2)
+        # a forked child has another pid, the thread resolving futures only runs in the parent
+        with patch('src.BlockEvents.os.getpid', return_value=-1):
+            self.assertFalse(self.subscriber.alive())
+            self.subscriber.stop()
+            self.assertFalse(self.publisher.closed)
+        self.assertFalse(future.done())
+
+    def test_chain_head_woken_by_events(self):
+        # the REST API never shows a new block, only the events do
+        self.publisher = StandInEventPublisher(blocks=1)
+        self.subscriber = BlockEventSubscriber(self.publisher)
+        chain_head = ChainHead(lambda request: {'data': [{'header': {'block_num': '0'}, 'header_signature': 'b0'}]},
+                               block_events=lambda: self.subscriber)
+        self.subscriber.start('b0', 1)
+        self.subscriber.add_listener(chain_head.observe)
+        threading.Timer(0.1, self.publisher.publish).start()
+        threading.Timer(0.2, self.publisher.publish).start()
+        start = time.time()
+        self.assertTrue(chain_head.wait_for_height(3, timeout=3))
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(3, chain_head.height())
+        self.assertFalse(chain_head.wait_for_height(4, timeout=0.2))
+
+
+if __name__ == "__main__":
+    unittest.main()
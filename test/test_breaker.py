@@ -0,0 +1,73 @@
+from src.api.breaker import CircuitBreaker, NeighbourBreakers, CLOSED, OPEN, HALF_OPEN
+from src.api.routing import Neighbour
+import unittest
+import time
+import gc
+
+UP = Neighbour("192.168.1.100", "5000", "c", "a")
+DOWN = Neighbour("192.168.1.200", "5000", "c", "a")
+
+
+class TestBreakerMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_opens_after_failures(self):
+        breaker = CircuitBreaker(failures=2, cooldown=60)
+        self.assertFalse(breaker.failure())
+        breaker.success()  # only failures in a row count
+        self.assertFalse(breaker.failure())
+        self.assertEqual(CLOSED, breaker.state)
+        self.assertTrue(breaker.failure())
+        self.assertEqual(OPEN, breaker.state)
+        self.assertFalse(breaker.allow())
+        self.assertEqual({'state': OPEN, 'failures': 2, 'trips': 1}, breaker.stats())
+
+    def test_half_open(self):
+        breaker = CircuitBreaker(failures=1, cooldown=0.05)
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.1)
+        self.assertEqual(HALF_OPEN, breaker.state)
+
+        # one trial request at a time, a failed trial opens the breaker again
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.failure()
+        self.assertEqual(OPEN, breaker.state)
+        self.assertEqual(2, breaker.stats()['trips'])
+
+        # a trial that succeeds closes it
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow())
+        breaker.success()
+        self.assertEqual(CLOSED, breaker.state)
+        self.assertTrue(breaker.allow() and breaker.allow())
+
+    def test_release(self):
+        breaker = CircuitBreaker(failures=1, cooldown=0.05)
+        breaker.release()  # nothing to release on a closed breaker
+        self.assertEqual({'state': CLOSED, 'failures': 0, 'trips': 0}, breaker.stats())
+
+        # a trial request that was not sent lets the next one through without closing or opening the breaker
+        breaker.failure()
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.release()
+        self.assertEqual(HALF_OPEN, breaker.state)
+        self.assertTrue(breaker.allow())
+
+    def test_neighbour_breakers(self):
+        breakers = NeighbourBreakers(failures=1, cooldown=60)
+        self.assertEqual((UP, DOWN), breakers.available((UP, DOWN)))
+        breakers.failure(DOWN)
+        self.assertEqual((UP,), breakers.available((UP, DOWN)))
+        self.assertFalse(breakers.allow(DOWN))
+        self.assertTrue(breakers.allow(UP))
+        self.assertEqual(OPEN, breakers.stats()['192.168.1.200:5000']['state'])
+
+
+if __name__ == '__main__':
+    unittest.main()
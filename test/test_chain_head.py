@@ -0,0 +1,108 @@
+from src.ChainHead import ChainHead, CHAIN_HEAD_REQUEST
+from mock import Mock
+import unittest
+import time
+import gc
+
+
+# stands in for SawtoothContainer.sawtooth_api, the chain grows by one block every time grow() is called
+# while failing is set every request gets the error the REST API returns when the validator can not be reached
+class FakeSawtoothApi:
+    def __init__(self, blocks=0):
+        self.blocks = blocks
+        self.requests = []
+        self.failing = False
+
+    def grow(self):
+        self.blocks += 1
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if self.failing:
+            return {'error': {'code': 15}}
+        if self.blocks == 0:
+            return {'data': []}
+        return {'data': [{'header': {'block_num': str(self.blocks - 1)},
+                          'header_signature': 'block{}'.format(self.blocks - 1)}],
+                'paging': {'limit': 1}}
+
+
+class TestChainHeadMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_height(self):
+        api = FakeSawtoothApi()
+        head = ChainHead(api, ttl=0)
+        self.assertEqual(0, head.height())
+        self.assertIsNone(head.block_id())
+
+        api.grow()  # genesis
+        self.assertEqual(1, head.height())
+        self.assertEqual('block0', head.block_id())
+        self.assertEqual(CHAIN_HEAD_REQUEST, api.requests[-1])
+
+        # a failed request does not lose the last known head
+        api.failing = True
+        api.grow()
+        self.assertEqual((0, 'block0'), head.refresh())
+        self.assertEqual(1, head.height())
+        self.assertEqual('block0', head.block_id())
+        api.failing = False
+        self.assertEqual((1, 'block1'), head.refresh())
+
+        # nothing known yet reads as an empty chain
+        head = ChainHead(lambda request: {'error': {'code': 15}}, ttl=0)
+        self.assertEqual(0, head.height())
+
+    def test_ttl(self):
+        api = FakeSawtoothApi(blocks=3)
+        head = ChainHead(api, ttl=60)
+        self.assertEqual(3, head.height())
+        api.grow()
+        self.assertEqual(3, head.height())  # still cached
+        self.assertEqual(1, len(api.requests))
+        head.invalidate()
+        self.assertEqual(4, head.height())
+        self.assertEqual(2, len(api.requests))
+
+    def test_current_height(self):
+        api = FakeSawtoothApi(blocks=3)
+        head = ChainHead(api, ttl=60)
+        self.assertEqual(3, head.height())
+        api.grow()
+        self.assertEqual(3, head.height())  # still cached
+        self.assertEqual(4, head.current_height())
+
+        # block commit events keep the head current, the REST API is not asked
+        subscriber = Mock(spec=['alive'])
+        subscriber.alive.return_value = True
+        head = ChainHead(api, ttl=60, block_events=lambda: subscriber)
+        self.assertEqual(4, head.height())
+        requests = len(api.requests)
+        head.observe(4, 'block4')
+        self.assertEqual(5, head.current_height())
+        self.assertEqual(requests, len(api.requests))
+
+    def test_wait_for_height(self):
+        api = FakeSawtoothApi(blocks=1)
+        head = ChainHead(api)
+        self.assertTrue(head.wait_for_height(1, timeout=0))
+
+        start = time.time()
+        self.assertFalse(head.wait_for_height(2, timeout=0.2, poll=0.05))
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+        # the chain grows while waiting
+        class GrowingApi(FakeSawtoothApi):
+            def __call__(self, request):
+                self.grow()
+                return super().__call__(request)
+
+        head = ChainHead(GrowingApi(blocks=1))
+        self.assertTrue(head.wait_for_height(4, timeout=5, poll=0.01))
+
+
+if __name__ == "__main__":
+    unittest.main()
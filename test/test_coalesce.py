@@ -0,0 +1,59 @@
+from src.api.coalesce import SingleFlight
+import threading
+import unittest
+import time
+import gc
+
+
+class TestCoalesceMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_concurrent_reads_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def read():
+            calls.append(1)
+            release.wait()
+            return '999'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do(('get', 'a', 'k'), read)))
+                   for _ in range(10)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)  # let every thread join the call in flight
+        release.set()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(['999'] * 10, results)
+        self.assertEqual({'calls': 1, 'shared': 9, 'ratio': 10.0}, flight.stats())
+
+        # once the call finished the next read makes a new one
+        self.assertEqual('999', flight.do(('get', 'a', 'k'), read))
+        self.assertEqual(2, len(calls))
+
+    def test_different_keys(self):
+        flight = SingleFlight()
+        self.assertEqual('1', flight.do(('get', 'a', 'k'), lambda: '1'))
+        self.assertEqual('2', flight.do(('get', 'b', 'k'), lambda: '2'))
+        self.assertEqual(1.0, flight.stats()['ratio'])
+
+    def test_exception(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError("container unreachable")
+
+        with self.assertRaises(ValueError):
+            flight.do('key', fail)
+        self.assertEqual('ok', flight.do('key', lambda: 'ok'))
+
+
+if __name__ == "__main__":
+    unittest.main()
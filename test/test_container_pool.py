@@ -0,0 +1,68 @@
+from src.ContainerPool import ContainerPool
+import unittest
+import gc
+
+
+# stands in for SawtoothContainer, counts how often it was reset
+class StandInContainer:
+    def __init__(self, network, fail_reset=False):
+        self.network = network
+        self.resets = 0
+        self.fail_reset = fail_reset
+
+    def reset(self):
+        if self.fail_reset:
+            raise RuntimeError("reset failed")
+        self.resets += 1
+
+
+class TestContainerPoolMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_acquire_release(self):
+        pool = ContainerPool(StandInContainer)
+        first = pool.acquire(4, 'bridge')
+        self.assertEqual(4, len(first))
+        self.assertEqual(4, len(set(id(c) for c in first)))
+        self.assertEqual(0, pool.idle('bridge'))
+
+        pool.release(first, 'bridge')
+        self.assertEqual(4, pool.idle('bridge'))
+        for c in first:
+            self.assertEqual(1, c.resets)
+
+        # released containers are handed out before new ones are made
+        second = pool.acquire(6, 'bridge')
+        self.assertEqual(6, len(second))
+        self.assertEqual(set(id(c) for c in first), set(id(c) for c in second[:4]))
+        self.assertEqual({'created': 6, 'reused': 4, 'idle': 0}, pool.stats())
+
+    def test_networks(self):
+        pool = ContainerPool(StandInContainer)
+        pool.warm(3, 'a')
+        self.assertEqual(3, pool.idle('a'))
+        self.assertEqual(0, pool.idle('b'))
+        containers = pool.acquire(2, 'b')
+        self.assertEqual(['b', 'b'], [c.network for c in containers])
+        self.assertEqual(3, pool.idle('a'))
+
+        pool.warm(2, 'a')  # already warm
+        self.assertEqual(3, pool.idle('a'))
+        pool.clear()
+        self.assertEqual(0, pool.idle('a'))
+
+    def test_max_idle(self):
+        pool = ContainerPool(StandInContainer, max_idle=2)
+        pool.release(pool.acquire(5, 'bridge'), 'bridge')
+        self.assertEqual(2, pool.idle('bridge'))
+
+    def test_failed_reset(self):
+        pool = ContainerPool(lambda network: StandInContainer(network, fail_reset=True))
+        pool.release(pool.acquire(3, 'bridge'), 'bridge')
+        self.assertEqual(0, pool.idle('bridge'))
+
+
+if __name__ == "__main__":
+    unittest.main()
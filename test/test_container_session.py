@@ -0,0 +1,72 @@
+from src.ContainerSession import ContainerSession, ContainerSessionError, CommandNotSent, quote_command, FRAME_HEADER
+import subprocess
+import threading
+import unittest
+import socket
+import struct
+import gc
+
+
+# stands in for the attached shell of a container: runs every line it gets with a local sh and sends the output
+# back split over docker stream frames
+def stand_in_shell(sock):
+    lines = sock.makefile('rb')
+    for line in lines:
+        output = subprocess.run(['/bin/sh', '-c', line.decode('utf-8')], stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT).stdout
+        half = len(output) // 2
+        for part in (output[:half], output[half:]):
+            sock.sendall(struct.pack(FRAME_HEADER, 1, len(part)) + part)
+    sock.close()
+
+
+class TestContainerSessionMethods(unittest.TestCase):
+
+    def setUp(self):
+        session_end, shell_end = socket.socketpair()
+        self.shell = threading.Thread(target=stand_in_shell, args=(shell_end,), daemon=True)
+        self.shell.start()
+        self.session = ContainerSession(session_end, timeout=5)
+
+    def tearDown(self) -> None:
+        self.session.close()
+        gc.collect()
+
+    def test_run(self):
+        self.assertEqual('hello', self.session.run('echo hello'))
+        self.assertEqual('', self.session.run('true'))
+        self.assertEqual('a\nb', self.session.run('printf "a\\nb"'))
+        # commands are not run by a shell, the same as exec_run
+        self.assertEqual('$HOME', self.session.run("echo '$HOME'"))
+        self.assertEqual('["key1", "key2"]', self.session.run('echo \'["key1", "key2"]\''))
+        # stderr is part of the output
+        self.assertIn('No such file', self.session.run('ls /does/not/exist'))
+        # commands run one after another on the same stream
+        for i in range(20):
+            self.assertEqual(str(i), self.session.run('echo {}'.format(i)))
+
+    def test_shell_commands(self):
+        self.assertEqual('test', self.session.run('/bin/sh -c "echo test | cat"'))
+
+    def test_closed(self):
+        self.session.close()
+        with self.assertRaises(CommandNotSent):
+            self.session.run('echo hello')
+
+    def test_timeout_is_not_command_not_sent(self):
+        # the command reached the shell, it must not be run again some other way
+        session_end, shell_end = socket.socketpair()
+        threading.Thread(target=stand_in_shell, args=(shell_end,), daemon=True).start()
+        session = ContainerSession(session_end, timeout=0.2)
+        with self.assertRaises(ContainerSessionError) as raised:
+            session.run('sleep 1')
+        self.assertNotIsInstance(raised.exception, CommandNotSent)
+        self.assertTrue(session.closed())
+
+    def test_quote_command(self):
+        self.assertEqual("sawset genesis -A '[\"a\", \"b\"]'", quote_command("sawset genesis -A '[\"a\", \"b\"]'"))
+        self.assertEqual("echo 'a  b'", quote_command('echo "a  b"'))
+
+
+if __name__ == "__main__":
+    unittest.main()
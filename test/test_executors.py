@@ -0,0 +1,62 @@
+from src.api.executors import QuorumExecutor, QuorumExecutors, QuorumBusy, QuorumTimeout
+import threading
+import unittest
+import time
+import gc
+
+
+class TestExecutorMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_run(self):
+        executor = QuorumExecutor('a')
+        self.assertEqual(3, executor.run(lambda: 1 + 2))
+        with self.assertRaises(ZeroDivisionError):
+            executor.run(lambda: 1 / 0)
+        self.assertEqual({'in_flight': 0, 'completed': 2, 'rejected': 0, 'timed_out': 0}, executor.stats())
+
+    def test_full_queue_is_turned_away(self):
+        release = threading.Event()
+        executor = QuorumExecutor('a', workers=1, queue_size=1)
+        running = executor.submit(release.wait)
+        queued = executor.submit(release.wait)
+        with self.assertRaises(QuorumBusy):
+            executor.submit(release.wait)
+        self.assertEqual(1, executor.stats()['rejected'])
+
+        # slots come back once the calls finish
+        release.set()
+        self.assertTrue(executor.wait(running) and executor.wait(queued))
+        self.assertTrue(executor.run(lambda: True))
+
+    def test_timeout(self):
+        release = threading.Event()
+        executor = QuorumExecutor('a', timeout=0.05)
+        with self.assertRaises(QuorumTimeout):
+            executor.run(release.wait)
+        self.assertEqual(1, executor.stats()['timed_out'])
+        self.assertEqual(1, executor.stats()['in_flight'])  # the call still holds its worker
+        release.set()
+
+    def test_slow_quorum_does_not_block_others(self):
+        release = threading.Event()
+        executors = QuorumExecutors(workers=2, queue_size=0)
+        slow = [executors.submit('a', release.wait) for _ in range(2)]
+        with self.assertRaises(QuorumBusy):
+            executors.submit('a', release.wait)
+
+        start = time.time()
+        self.assertEqual('b', executors.run('b', lambda: 'b'))
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(['a', 'b'], sorted(executors.stats().keys()))
+
+        release.set()
+        for future in slow:
+            executors.wait('a', future)
+        self.assertEqual(0, executors.stats()['a']['in_flight'])
+
+
+if __name__ == '__main__':
+    unittest.main()
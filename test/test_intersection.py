@@ -1,4 +1,4 @@
-from src.Intersection import Intersection
+from src.Intersection import Intersection, IntersectionError, run_per_committee
 from src.SawtoothPBFT import SawtoothContainer, DEFAULT_DOCKER_NETWORK
 from src.util import make_sawtooth_committee
 from src.util import stop_all_containers
@@ -60,6 +60,23 @@ class TestIntersectionMethods(unittest.TestCase):
         inter = Intersection(a, b, id_a, id_b)
         self.assertEqual(inter.attached_network(), 'host')
 
+    def test_peer_setup_many(self):
+        containers = {'1': SawtoothContainer(), '2': SawtoothContainer(), '3': SawtoothContainer()}
+        inter = Intersection(instances=containers)
+
+        self.assertEqual(['1', '2', '3'], inter.committee_ids())
+        self.assertEqual('1', inter.committee_id_a)
+        self.assertEqual('2', inter.committee_id_b)
+        for committee_id, container in containers.items():
+            self.assertTrue(inter.in_committee(committee_id))
+            self.assertEqual(container.ip(), inter.ip(committee_id))
+            self.assertEqual(container.val_key(), inter.val_key(committee_id))
+            self.assertEqual(container.user_key(), inter.user_key(committee_id))
+        self.assertTrue(inter.in_committee(3))  # ids are compared as strings
+        self.assertFalse(inter.in_committee('4'))
+        self.assertIsNone(inter.ip('4'))
+        self.assertEqual(inter.attached_network(), DEFAULT_DOCKER_NETWORK)
+
     def test_committee_setup_single(self):
         id_a = '1'
         id_b = '2'
@@ -183,6 +200,35 @@ class TestIntersectionMethods(unittest.TestCase):
                 if ip != inter.ip(id_b):
                     self.assertIn("tcp://{}:8800".format(ip), intersections_config)
 
+    def test_read_cache(self):
+        intersections = make_peer_committees(4)
+        id_a = intersections[0].committee_id_a
+        tx = Transaction(id_a, 'test', '999')
+        intersections[0].submit(tx)
+        self.assertTrue(check_for_confirmation([i.instance_a for i in intersections], 2, 'test'))
+
+        # the second read at the same height does not go to the container
+        self.assertEqual('999', intersections[0].get_tx(tx))
+        self.assertEqual('999', intersections[0].get_tx(tx))
+        self.assertEqual(1, intersections[0].read_cache_stats()[id_a]['hits'])
+
+        # a new block makes the cached value stale
+        intersections[0].submit(Transaction(id_a, 'test2', '1'))
+        self.assertTrue(check_for_confirmation([i.instance_a for i in intersections], 3, 'test2'))
+        self.assertEqual('999', intersections[0].get_tx(tx))
+        self.assertEqual(1, intersections[0].read_cache_stats()[id_a]['hits'])
+
+    def test_run_per_committee(self):
+        self.assertEqual({'a': 1, 'b': 2}, run_per_committee({'a': lambda: 1, 'b': lambda: 2}))
+
+        # a failing committee does not stop the others, the error names it and keeps the rest of the results
+        def fail():
+            raise ValueError('down')
+        with self.assertRaises(IntersectionError) as context:
+            run_per_committee({'a': lambda: 1, 'b': fail})
+        self.assertEqual({'a': 1}, context.exception.results)
+        self.assertEqual(['b'], list(context.exception.errors.keys()))
+
     # test that peer can leave a committee with cooperatively
     def test_peer_leave(self):
         intersections = make_peer_committees(7)
@@ -0,0 +1,90 @@
+from src.intkey import INTKEY_NAMESPACE, intkey_address, intkey_payload, cbor_encode, make_intkey_transaction
+from src.intkey import make_batch_list, cbor_decode, decode_intkey_state, check_intkey_transaction
+from src.proto import encode_varint, string_field
+from src.signing import Secp256k1Signer, SECP256K1_ORDER
+from src.structures import Transaction
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+import unittest
+import gc
+
+# a key as written by 'sawtooth keygen'
+PRIVATE_KEY = "2f1e7b7a130d7ba9da0068b3bb0ba1d79e7e77110302c9f746c3c2a63fe40088"
+
+
+class TestIntkeyMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.signer = Secp256k1Signer.from_hex(PRIVATE_KEY)
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_address(self):
+        self.assertEqual('1cf126', INTKEY_NAMESPACE)
+        address = intkey_address('test')
+        self.assertEqual(70, len(address))
+        self.assertTrue(address.startswith(INTKEY_NAMESPACE))
+
+    def test_payload(self):
+        # same bytes as cbor.dumps({'Verb': 'set', 'Name': 'a', 'Value': 1}) in the intkey cli
+        self.assertEqual('a3645665726263736574644e616d6561616556616c756501', intkey_payload('set', 'a', 1).hex())
+        self.assertEqual('1903e7', cbor_encode(999).hex())
+        self.assertEqual('1a00010000', cbor_encode(65536).hex())
+
+    def test_cbor_decode(self):
+        value = {'Verb': 'set', 'Name': 'test', 'Value': 2 ** 32 - 1, 'list': [-1, b'raw', None, True, False]}
+        self.assertEqual(value, cbor_decode(cbor_encode(value)))
+        # state written by the intkey transaction processor, two keys whose addresses collide
+        self.assertEqual({'a': 1, 'b': 999}, decode_intkey_state(bytes.fromhex('a2616101616219' + '03e7')))
+
+    def test_proto(self):
+        self.assertEqual('ac02', encode_varint(300).hex())
+        self.assertEqual('0a0474657374', string_field(1, 'test').hex())
+
+    def test_signature(self):
+        self.assertEqual(PRIVATE_KEY, self.signer.private_key_hex())
+        self.assertEqual(66, len(self.signer.public_key_hex()))
+        self.assertIn(self.signer.public_key_hex()[:2], ['02', '03'])
+
+        signature = self.signer.sign(b'header')
+        self.assertEqual(128, len(signature))
+        r, s = int(signature[:64], 16), int(signature[64:], 16)
+        self.assertLessEqual(s, SECP256K1_ORDER // 2)  # sawtooth only accepts low-S signatures
+        public_key = ec.derive_private_key(int(PRIVATE_KEY, 16), ec.SECP256K1(), default_backend()).public_key()
+        public_key.verify(encode_dss_signature(r, s), b'header', ec.ECDSA(hashes.SHA256()))
+
+    def test_transaction(self):
+        transaction, transaction_id = make_intkey_transaction(self.signer, Transaction('a', 'test', '999'))
+        self.assertIn(intkey_address('test').encode('utf-8'), transaction)
+        self.assertIn(intkey_payload('set', 'test', 999), transaction)
+        self.assertIn(transaction_id.encode('utf-8'), transaction)
+
+        with self.assertRaises(ValueError):
+            make_intkey_transaction(self.signer, Transaction('a', 'test', '-1'))
+        with self.assertRaises(ValueError):
+            make_intkey_transaction(self.signer, Transaction('a', 'test', 'not a number'))
+
+    def test_check_transaction(self):
+        self.assertEqual(999, check_intkey_transaction(Transaction('a', 'test', '999')))
+        for value in ['-1', 'not a number', None, str(2 ** 32)]:
+            with self.assertRaises(ValueError):
+                check_intkey_transaction(Transaction('a', 'test', value))
+
+    def test_batch_list(self):
+        txs = [Transaction('a', 'tx_{}'.format(i), '999') for i in range(5)]
+        batch_list, batch_ids = make_batch_list(self.signer, txs, batch_size=2)
+        self.assertEqual(5, len(batch_ids))
+        # 5 transactions in batches of at most 2 is 3 batches: [0, 1], [2, 3], [4]
+        self.assertEqual(3, len(set(batch_ids)))
+        self.assertEqual(batch_ids[0], batch_ids[1])
+        self.assertEqual(batch_ids[2], batch_ids[3])
+        self.assertNotEqual(batch_ids[3], batch_ids[4])
+        for batch_id in set(batch_ids):
+            self.assertIn(batch_id.encode('utf-8'), batch_list)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+from src.ReadCache import ReadCache
+import unittest
+import gc
+
+
+class TestReadCacheMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_hit_until_next_block(self):
+        cache = ReadCache()
+        self.assertEqual((False, None), cache.get('k', 2))
+        cache.put('k', '1', 2)
+        self.assertEqual((True, '1'), cache.get('k', 2))
+        self.assertEqual((True, '1'), cache.get('k', 2))
+
+        # a new block may have changed the key
+        self.assertEqual((False, None), cache.get('k', 3))
+        self.assertEqual({'hits': 2, 'misses': 2, 'evictions': 0, 'size': 0}, cache.stats())
+
+        # reads from an older height are never kept
+        cache.put('k', '0', 2)
+        self.assertEqual((False, None), cache.get('k', 3))
+        cache.put('k', '2', 3)
+        self.assertEqual((True, '2'), cache.get('k', 3))
+
+    def test_lru(self):
+        cache = ReadCache(capacity=2)
+        cache.put('a', '1', 1)
+        cache.put('b', '2', 1)
+        cache.get('a', 1)  # b is now the least recently used
+        cache.put('c', '3', 1)
+        self.assertEqual((True, '1'), cache.get('a', 1))
+        self.assertEqual((False, None), cache.get('b', 1))
+        self.assertEqual((True, '3'), cache.get('c', 1))
+        self.assertEqual(1, cache.stats()['evictions'])
+        self.assertEqual(2, cache.stats()['size'])
+
+        cache.clear()
+        self.assertEqual((False, None), cache.get('a', 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+from src.api.routing import RoutingIndex
+from src.api.constants import API_IP, PORT, QUORUM_ID
+import unittest
+import time
+import gc
+
+NEIGHBOURS_A = [{API_IP: "192.168.1.100", PORT: "5000", QUORUM_ID: "c"},
+                {API_IP: "192.168.1.200", PORT: "5001", QUORUM_ID: "d"}]
+NEIGHBOURS_B = [{API_IP: "192.168.1.300", PORT: "5002", QUORUM_ID: "c"}]
+
+
+class TestRoutingMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_set_quorum(self):
+        routing = RoutingIndex()
+        routing.set_quorum('a', NEIGHBOURS_A)
+        routing.set_quorum('b', NEIGHBOURS_B)
+        self.assertEqual(['192.168.1.100', '192.168.1.300'], [n.ip for n in routing.neighbours('c')])
+        self.assertEqual(['a'], [n.via for n in routing.neighbours('d')])
+        self.assertEqual((), routing.neighbours('e'))
+
+        # setting a quorum again only replaces the neighbours of that quorum
+        routing.set_quorum('a', NEIGHBOURS_A[:1])
+        self.assertEqual(2, len(routing.neighbours('c')))
+        self.assertEqual((), routing.neighbours('d'))
+        routing.set_quorum('b', [])
+        self.assertEqual(['192.168.1.100'], [n.ip for n in routing.neighbours('c')])
+
+    def test_remove_port(self):
+        routing = RoutingIndex()
+        routing.set_quorum('a', NEIGHBOURS_A)
+        routing.set_quorum('b', NEIGHBOURS_B)
+        routing.remove_port(5000)
+        self.assertEqual(['192.168.1.300'], [n.ip for n in routing.neighbours('c')])
+        self.assertEqual(1, len(routing.neighbours('d')))
+
+    def test_replace(self):
+        routing = RoutingIndex()
+        routing.set_quorum('a', NEIGHBOURS_A)
+        routing.replace({'b': NEIGHBOURS_B})
+        self.assertEqual((), routing.neighbours('d'))
+        self.assertEqual(['192.168.1.300'], [n.ip for n in routing.neighbours('c')])
+
+    def test_edges(self):
+        routing = RoutingIndex()
+        routing.set_quorum('a', NEIGHBOURS_A)
+        routing.set_quorum('b', NEIGHBOURS_B)
+        self.assertEqual([['a', 'b'], ['a', 'c'], ['a', 'd'], ['b', 'c']], routing.edges())
+        self.assertEqual(2, routing.learn([['c', 'e'], ['e', 'c'], ['e', 'f'], ['a', 'c']]))
+        self.assertEqual(0, routing.learn([['c', 'e']]))
+        self.assertEqual({('192.168.1.100', '5000'), ('192.168.1.200', '5001'), ('192.168.1.300', '5002')},
+                         routing.addresses())
+
+    def test_multi_hop_route(self):
+        routing = RoutingIndex()
+        routing.set_quorum('a', NEIGHBOURS_A)
+        routing.set_quorum('b', NEIGHBOURS_B)
+        self.assertEqual(routing.neighbours('c'), routing.route('c'))
+        self.assertEqual(1, routing.hops('d'))
+        self.assertEqual((), routing.route('e'))
+        self.assertIsNone(routing.hops('e'))
+
+        # e is only reached through c, f is one hop further
+        routing.learn([['c', 'e'], ['e', 'f']])
+        self.assertEqual(['192.168.1.100', '192.168.1.300'], sorted(n.ip for n in routing.route('e')))
+        self.assertEqual(2, routing.hops('e'))
+        self.assertEqual(3, routing.hops('f'))
+        self.assertEqual(sorted(routing.route('e')), sorted(routing.route('f')))
+
+        # every neighbour starting a shortest path is a candidate, longer paths are not
+        routing.learn([['d', 'e'], ['d', 'g'], ['g', 'f']])
+        self.assertEqual(3, len(routing.route('e')))
+        self.assertEqual(['192.168.1.200'], [n.ip for n in routing.route('g')])
+        self.assertEqual(3, routing.hops('f'))
+
+        # membership changes take effect on the next route
+        routing.remove_port(5001)
+        self.assertEqual(4, routing.hops('g'))
+        routing.replace({'a': NEIGHBOURS_A})
+        self.assertEqual((), routing.route('e'))
+
+    def test_missed(self):
+        routing = RoutingIndex(miss_ttl=0.1)
+        routing.set_quorum('a', NEIGHBOURS_A)
+        routing.miss('e')
+        self.assertTrue(routing.missed('e'))
+        self.assertFalse(routing.missed('f'))
+        time.sleep(0.2)
+        self.assertFalse(routing.missed('e'))
+
+        # a miss is forgotten as soon as something new is known
+        routing = RoutingIndex(miss_ttl=60)
+        routing.set_quorum('a', NEIGHBOURS_A)
+        routing.miss('e')
+        routing.learn([['a', 'c']])  # nothing new
+        self.assertTrue(routing.missed('e'))
+        routing.learn([['c', 'e']])
+        self.assertFalse(routing.missed('e'))
+        routing.miss('e')
+        routing.set_quorum('b', NEIGHBOURS_B)
+        self.assertFalse(routing.missed('e'))
+
+
+if __name__ == '__main__':
+    unittest.main()
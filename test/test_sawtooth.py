@@ -2,12 +2,20 @@ import unittest
 import warnings
 import time
 import docker as docker_api
+import json
+from unittest.mock import patch
 from src.SawtoothPBFT import SawtoothContainer
 from src.SawtoothPBFT import VALIDATOR_KEY
 from src.SawtoothPBFT import USER_KEY
+from src.SawtoothPBFT import DOCKER_IMAGE
 from src.SawtoothPBFT import DEFAULT_DOCKER_NETWORK
 from src.SawtoothPBFT import IDEAL_VIEW_CHANGE_MILSEC
+from src.SawtoothPBFT import API_MODE_EXEC, INTKEY_MISSING_VALUE, STATE_LOOKUP_LIMIT
+from src.structures import Transaction
+from src.SawtoothRest import SawtoothRestClient
+from src.ContainerSession import ContainerSessionError
 from src.util import stop_all_containers
+from src.Teardown import teardown_manager
 from src.util import get_container_ids
 from src.util import make_sawtooth_committee
 from src.util import check_for_confirmation
@@ -72,6 +80,30 @@ class TestSawtoothMethods(unittest.TestCase):
         # clean up
         docker.close()
 
+    def test_start_container_host_keys(self):
+        docker = docker_api.from_env()
+
+        # keys made on the host end up in the container with the modes keygen gives them
+        sawtooth_instance = SawtoothContainer(host_keys=True)
+        container = docker.containers.get(sawtooth_instance.id())
+        container_val_key = container.exec_run("cat {val_pub}".format(val_pub=VALIDATOR_KEY["pub"])) \
+            .output.decode('utf-8').strip()
+        container_user_key = container.exec_run("cat {user_pub}".format(user_pub=USER_KEY["pub"])) \
+            .output.decode('utf-8').strip()
+        self.assertEqual(sawtooth_instance.val_key(), container_val_key)
+        self.assertEqual(sawtooth_instance.user_key(), container_user_key)
+        for path, mode in ((USER_KEY["priv"], '600'), (USER_KEY["pub"], '644'),
+                           (VALIDATOR_KEY["priv"], '600'), (VALIDATOR_KEY["pub"], '644')):
+            self.assertEqual(mode, container.exec_run("stat -c %a {}".format(path)).output.decode('utf-8').strip())
+
+        # existing directories keep their mode
+        image_mode = docker.containers.run(DOCKER_IMAGE, "stat -c %a /etc/sawtooth", remove=True).decode('utf-8')
+        self.assertEqual(image_mode.strip(),
+                         container.exec_run("stat -c %a /etc/sawtooth").output.decode('utf-8').strip())
+
+        # clean up
+        docker.close()
+
     def test_kill_container(self):
         docker = docker_api.from_env()
 
@@ -86,15 +118,30 @@ class TestSawtoothMethods(unittest.TestCase):
 
         # test that if one instance is stop only one instance stops
         del sawtooth_instance
+        teardown_manager().drain()  # containers are removed in the background
         self.assertEqual(1, len(docker.containers.list()))
         self.assertIn(sawtooth_instance_2nd.id(), get_container_ids())
 
         del sawtooth_instance_2nd
+        teardown_manager().drain()
         self.assertEqual(0, len(docker.containers.list()))
 
         # clean up
         docker.close()
 
+    def test_failed_start_container(self):
+        docker = docker_api.from_env()
+
+        # the container is made before the session fails to open, it is still torn down
+        with patch('src.SawtoothPBFT.ContainerSession.open', side_effect=ContainerSessionError('no shell')):
+            with self.assertRaises(ContainerSessionError):
+                SawtoothContainer(command_session=True)
+        gc.collect()
+        teardown_manager().drain()
+        self.assertEqual(0, len(docker.containers.list(all=True)))
+
+        docker.close()
+
     def test_committee_init_setup(self):
         docker = docker_api.from_env()
 
@@ -118,9 +165,11 @@ class TestSawtoothMethods(unittest.TestCase):
             for process in p.top()['Processes']:
                 process_names.append(process[-1])
             self.assertIn('sawtooth-validator', [i for i in process_names if 'sawtooth-validator' in i][0])
-            self.assertIn('/usr/bin/python3 /usr/bin/sawtooth-rest-api -v', process_names)
-            self.assertIn('settings-tp -v', process_names)
-            self.assertIn('/usr/bin/python3 /usr/bin/intkey-tp-python -v', process_names)
+            # the services connect to the component endpoint on the container ip
+            for service in ['/usr/bin/python3 /usr/bin/sawtooth-rest-api -v --bind 0.0.0.0:8008 --connect',
+                            'settings-tp -v --connect',
+                            '/usr/bin/python3 /usr/bin/intkey-tp-python -v --connect']:
+                self.assertIn(service, [i for i in process_names if service in i][0])
             self.assertIn('pbft-engine -vv --connect',
                           [i for i in process_names if 'pbft-engine -vv --connect' in i][0])
 
@@ -132,6 +181,14 @@ class TestSawtoothMethods(unittest.TestCase):
             blocks = p.blocks()['data']
             self.assertEqual(1, len(blocks))
 
+        # the REST API answers on the container ip (from the host) and on localhost (inside the container)
+        for p in peers:
+            rest = SawtoothRestClient(p.ip())
+            self.assertEqual(1, len(rest.get('/blocks')['data']))
+            rest.close()
+            local = docker.containers.get(p.id()).exec_run('curl -sS http://localhost:8008/blocks')
+            self.assertEqual(1, len(json.loads(local.output.decode('utf-8'))['data']))
+
         # makes sure all peers are configured to work with each other (this is not a test of connectivity just config)
         ips = [p.ip() for p in peers]
         admin = peers[0].admin_key()  # peer 0 made genesis so it has the admin key make sure all other peers get it
@@ -154,6 +211,29 @@ class TestSawtoothMethods(unittest.TestCase):
             blockchain_size = len(p.blocks()['data'])
             self.assertEqual(number_of_tx, blockchain_size, p.ip())
 
+    def test_get_txs(self):
+        # one peer reads through docker exec, the others straight from the REST API
+        peers = [SawtoothContainer(api_mode=API_MODE_EXEC)] + [SawtoothContainer() for _ in range(3)]
+        peers[0].make_genesis([p.val_key() for p in peers], [p.user_key() for p in peers])
+        committee_ips = [p.ip() for p in peers]
+        for p in peers:
+            p.join_sawtooth(committee_ips)
+        self.assertTrue(check_for_confirmation(peers, 1))
+
+        # more keys than are always looked up one by one, the first read of them pages through the state
+        values = {'test{}'.format(i): str(i) for i in range(STATE_LOOKUP_LIMIT * 2 + 1)}
+        batch_ids = peers[1].submit_txs([Transaction(key=key, value=value) for key, value in values.items()])
+        self.assertEqual(1, len(set(batch_ids)))  # packed in one sawtooth batch
+        self.assertTrue(all(at is not None for at in peers[1].wait_for_txs(values, 30).values()))
+
+        expected = dict(values, missing=None)
+        self.assertEqual(expected, peers[1].get_txs(list(expected)))
+        self.assertEqual(expected, peers[0].get_txs(list(expected)))
+        # a few keys are looked up one by one
+        self.assertEqual({'test0': '0', 'missing': None}, peers[1].get_txs(['test0', 'missing']))
+        self.assertEqual(INTKEY_MISSING_VALUE, peers[0].get_tx('missing'))
+        self.assertEqual(INTKEY_MISSING_VALUE, peers[1].get_tx('missing'))
+
     def test_high_transaction_load(self):
         peers = make_sawtooth_committee(5)
         number_of_tx = 1
@@ -344,6 +424,24 @@ class TestSawtoothMethods(unittest.TestCase):
                     if ip != p.ip():  # the peer it's self is not reported in the list
                         self.assertIn("tcp://{}:8800".format(ip), peers_config)
 
+    def test_reset(self):  # a reset container can be part of a new committee with the same keys
+        peers = make_sawtooth_committee(4)
+        keys = [p.val_key() for p in peers]
+        peers[0].submit_tx('test', '999')
+        self.assertTrue(check_for_confirmation(peers, 2, 'test'))
+
+        for p in peers:
+            p.reset()
+            self.assertEqual(0, p.chain_head().height())
+        self.assertEqual(keys, [p.val_key() for p in peers])
+
+        committee_ips = [p.ip() for p in peers]
+        peers[0].make_genesis(keys, [p.user_key() for p in peers])
+        for p in peers:
+            p.join_sawtooth(committee_ips)
+        self.assertTrue(check_for_confirmation(peers, 1))
+        self.assertEqual("No such key", peers[0].get_tx('test'))
+
     def test_new_peer_replace_old(self):  # make sure that if all original peers crash the committee can proceed
         peers = make_sawtooth_committee(7)
         blockchain_size = 1
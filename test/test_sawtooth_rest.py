@@ -0,0 +1,77 @@
+from src.SawtoothRest import SawtoothRestClient, SawtoothRestUnavailable, SawtoothRestResponseError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+import socket
+import unittest
+import json
+import gc
+
+
+# stands in for the sawtooth REST API, answers each GET with the next (status, body) in responses
+def make_stand_in_api(responses: list):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the sawtooth REST API
+
+        def do_GET(self):
+            status, body = responses.pop(0)
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class TestSawtoothRestMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.server = None
+
+    def tearDown(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        gc.collect()
+
+    def test_get(self):
+        self.server = make_stand_in_api([(200, {'data': [1, 2, 3]})])
+        client = SawtoothRestClient('127.0.0.1', port=self.server.server_port)
+        self.assertEqual({'data': [1, 2, 3]}, client.get('/blocks'))
+        client.close()
+
+    def test_retry_when_not_ready(self):
+        # sawtooth answers 503 until the validator is up
+        self.server = make_stand_in_api([(503, {'error': {}}), (503, {'error': {}}), (200, {'data': []})])
+        client = SawtoothRestClient('127.0.0.1', port=self.server.server_port, retries=2, backoff=0.01)
+        self.assertEqual({'data': []}, client.get('/blocks'))
+        client.close()
+
+    def test_error_status(self):
+        self.server = make_stand_in_api([(404, {'error': {'code': 75}})])
+        client = SawtoothRestClient('127.0.0.1', port=self.server.server_port, backoff=0.01)
+        with self.assertRaises(SawtoothRestResponseError) as error:
+            client.get('/state/abc')
+        self.assertEqual(404, error.exception.status_code)
+        self.assertEqual({'error': {'code': 75}}, error.exception.body)
+        client.close()
+
+    def test_unavailable(self):
+        # nothing is listening on the port
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        client = SawtoothRestClient('127.0.0.1', port=port, retries=1, backoff=0.01)
+        with self.assertRaises(SawtoothRestUnavailable):
+            client.get('/blocks')
+        client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
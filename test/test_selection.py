@@ -0,0 +1,51 @@
+from src.api.selection import NeighbourSelector, FAILURE_LATENCY
+from src.api.routing import Neighbour
+import random
+import unittest
+import gc
+
+FAST = Neighbour("192.168.1.100", "5000", "c", "a")
+SLOW = Neighbour("192.168.1.200", "5000", "c", "a")
+
+
+class TestSelectionMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_prefers_faster_neighbour(self):
+        selector = NeighbourSelector(explore=0, rng=random.Random(1))
+        selector.finish(FAST, selector.start(FAST) - 0.01)
+        selector.finish(SLOW, selector.start(SLOW) - 1)
+        picks = [selector.choose((FAST, SLOW)) for _ in range(20)]
+        self.assertEqual([FAST] * 20, picks)
+
+    def test_prefers_less_busy_neighbour(self):
+        selector = NeighbourSelector(explore=0, rng=random.Random(1))
+        selector.finish(FAST, selector.start(FAST) - 0.1)
+        selector.finish(SLOW, selector.start(SLOW) - 0.2)
+        for _ in range(3):
+            selector.start(FAST)  # never finished, still in flight
+        self.assertEqual(SLOW, selector.choose((FAST, SLOW)))
+
+    def test_unmeasured_neighbour_is_tried(self):
+        selector = NeighbourSelector(explore=0, rng=random.Random(1))
+        selector.finish(FAST, selector.start(FAST) - 0.01)
+        self.assertEqual(SLOW, selector.choose((FAST, SLOW)))
+        with self.assertRaises(IndexError):
+            selector.choose(())
+
+    def test_stats(self):
+        selector = NeighbourSelector()
+        selector.finish(FAST, selector.start(FAST), failed=True)
+        selector.finish(SLOW, selector.start(SLOW) - 10, measure=False)
+        stats = selector.stats()
+        self.assertGreaterEqual(stats["192.168.1.100:5000"]['latency'], FAILURE_LATENCY)
+        self.assertEqual(1, stats["192.168.1.100:5000"]['failures'])
+        self.assertIsNone(stats["192.168.1.200:5000"]['latency'])
+        self.assertEqual(0, stats["192.168.1.200:5000"]['in_flight'])
+        self.assertEqual(1, stats["192.168.1.200:5000"]['requests'])
+
+
+if __name__ == '__main__':
+    unittest.main()
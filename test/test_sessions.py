@@ -0,0 +1,61 @@
+from src.api.sessions import NeighbourSessions, NeighbourBusy
+from mock import patch
+import threading
+import unittest
+import time
+import gc
+
+
+class TestSessionMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    @patch('requests.Session.post')
+    def test_one_pool_per_neighbour(self, mock_post):
+        sessions = NeighbourSessions(timeout=(1, 2))
+        sessions.post('http://192.168.1.100:5000/submit/', json={})
+        sessions.post('http://192.168.1.100:5000/get/', json={})
+        sessions.post('http://192.168.1.200:5000/submit/', json={})
+        self.assertEqual(3, mock_post.call_count)
+        self.assertEqual((1, 2), mock_post.call_args[1]['timeout'])
+        self.assertEqual({'neighbours': 2, 'requests': 3, 'opened': 2, 'evicted': 0, 'busy': 0}, sessions.stats())
+
+        # a timeout given with the request is kept
+        sessions.post('http://192.168.1.200:5000/wait/', json={}, timeout=5)
+        self.assertEqual(5, mock_post.call_args[1]['timeout'])
+
+    @patch('requests.Session.post')
+    def test_full_pool(self, mock_post):
+        release = threading.Event()
+        mock_post.side_effect = lambda url, **kwargs: release.wait() if url.endswith('/slow/') else 'ok'
+        sessions = NeighbourSessions(pool_size=1, acquire_timeout=0.1)
+        held = threading.Thread(target=sessions.post, args=('http://192.168.1.100:5000/slow/',), kwargs={'held': True})
+        held.start()
+        time.sleep(0.05)
+
+        # held requests have their own connections, the others are not stuck behind them
+        self.assertEqual('ok', sessions.post('http://192.168.1.100:5000/submit/'))
+
+        # a request that finds every connection taken is given up instead of waiting for one
+        with self.assertRaises(NeighbourBusy):
+            sessions.post('http://192.168.1.100:5000/wait/', held=True)
+        self.assertEqual(1, sessions.stats()['busy'])
+        release.set()
+        held.join()
+        self.assertEqual('ok', sessions.post('http://192.168.1.100:5000/wait/', held=True))
+
+    @patch('requests.Session.get')
+    def test_idle_eviction(self, mock_get):
+        sessions = NeighbourSessions(idle_timeout=0.05)
+        sessions.get('http://192.168.1.100:5000/')
+        time.sleep(0.1)
+        sessions.get('http://192.168.1.200:5000/')
+        self.assertEqual(1, sessions.stats()['neighbours'])
+        self.assertEqual(1, sessions.stats()['evicted'])
+        sessions.close()
+        self.assertEqual(0, sessions.stats()['neighbours'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+from src.Teardown import TeardownManager, EXPERIMENT_LABEL
+import docker.errors
+from mock import patch
+import threading
+import unittest
+import time
+import gc
+
+
+# stands in for a docker container, remove takes delay sec
+class StandInContainer:
+    def __init__(self, container_id, labels=None, delay=0.0, gone=False):
+        self.id = container_id
+        self.labels = {} if labels is None else labels
+        self.delay = delay
+        self.gone = gone
+        self.removed = False
+
+    def remove(self, force=False):
+        if self.gone:
+            raise docker.errors.NotFound("no such container")
+        time.sleep(self.delay)
+        self.removed = force
+
+
+# stands in for docker.from_env(), only containers.list is used
+class StandInClient:
+    def __init__(self, containers):
+        self.containers = self
+        self.all = containers
+        self.filters = None
+
+    def list(self, all=False, filters=None):
+        self.filters = filters
+        label = filters.get('label') if filters else None
+        if label is None:
+            return list(self.all)
+        if '=' not in label:
+            return [c for c in self.all if label in c.labels]
+        key, value = label.split('=', 1)
+        return [c for c in self.all if c.labels.get(key) == value]
+
+
+class TestTeardownMethods(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        gc.collect()
+
+    def test_enqueue_is_cheap(self):
+        manager = TeardownManager(workers=8)
+        containers = [StandInContainer(str(i), delay=0.2) for i in range(16)]
+        start = time.time()
+        for c in containers:
+            manager.enqueue(c)
+        self.assertLess(time.time() - start, 0.1)  # nothing waits on docker
+
+        report = manager.drain()
+        self.assertEqual(16, report['containers'])
+        # 16 removals of 0.2 sec with 8 at a time
+        self.assertLess(report['seconds'], 16 * 0.2 / 2)
+        self.assertTrue(all(c.removed for c in containers))
+        self.assertEqual(0, manager.pending())
+
+    def test_bounded(self):
+        running = []
+        most = [0]
+        lock = threading.Lock()
+
+        class CountingContainer(StandInContainer):
+            def remove(self, force=False):
+                with lock:
+                    running.append(self)
+                    most[0] = max(most[0], len(running))
+                time.sleep(0.05)
+                with lock:
+                    running.remove(self)
+
+        manager = TeardownManager(workers=3)
+        for i in range(12):
+            manager.enqueue(CountingContainer(str(i)))
+        manager.drain()
+        self.assertEqual(3, most[0])
+
+    def test_already_removed(self):
+        manager = TeardownManager()
+        manager.enqueue(StandInContainer('a', gone=True))
+        self.assertEqual(1, manager.drain()['containers'])
+
+    def test_after_fork(self):
+        manager = TeardownManager(workers=1)
+        blocked = threading.Event()
+        parent = StandInContainer('parent')
+        parent.remove = lambda force=False: blocked.wait(5)  # holds the only worker of the parent
+        manager.enqueue(parent)
+
+        # a forked child has another pid and none of the threads of the parent, it gets workers of its own
+        with patch('src.Teardown.os.getpid', return_value=-1):
+            self.assertEqual(0, manager.pending())
+            child = StandInContainer('child')
+            manager.enqueue(child)
+            self.assertEqual(1, manager.drain(timeout=1)['containers'])
+            self.assertTrue(child.removed)
+        blocked.set()
+
+    def test_teardown_experiment(self):
+        first = [StandInContainer(str(i), {EXPERIMENT_LABEL: 'first'}) for i in range(3)]
+        second = [StandInContainer(str(i), {EXPERIMENT_LABEL: 'second'}) for i in range(3, 5)]
+        other = StandInContainer('other')
+        client = StandInClient(first + second + [other])
+        manager = TeardownManager(client)
+
+        self.assertEqual(3, manager.teardown('first')['containers'])
+        self.assertTrue(all(c.removed for c in first))
+        self.assertFalse(any(c.removed for c in second))
+
+        self.assertEqual(5, manager.teardown()['containers'])  # every sawtooth container
+        self.assertFalse(other.removed)
+        self.assertEqual(6, manager.teardown(everything=True)['containers'])
+        self.assertTrue(other.removed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,17 @@
 from src.util import stop_all_containers
 from src.util import make_intersecting_committees
 from src.util import make_intersecting_committees_on_host
+from src.util import make_sawtooth_committee, wait_for_genesis
 from src.api.api_util import forward
 from src.api.api_util import get_plain_text
 from src.api import create_app
 from src.api.constants import QUORUMS, QUORUM_ID, PORT, TRANSACTION_VALUE, TRANSACTION_KEY, API_IP
-from src.api.constants import ROUTE_EXECUTED_CORRECTLY
+from src.api.constants import ROUTE_EXECUTED_CORRECTLY, TRANSACTION_STATUS, ROUTING, HOPS_HEADER, BREAKERS
+from src.api.constants import SESSIONS, SELECTOR
+from src.api.sessions import NeighbourSessions
 from src.structures import Transaction
 import unittest
-from mock import patch
+from mock import patch, Mock
 import warnings
 import time
 import docker as docker_api
@@ -16,6 +19,7 @@ import json
 import gc
 import psutil
 import requests
+import threading
 
 TRANSACTION_C_JSON = json.loads(json.dumps({QUORUM_ID: "c",
                                             TRANSACTION_KEY: "test",
@@ -140,7 +144,37 @@ class TestUtilMethods(unittest.TestCase):
         for p in peers:
             del p
 
-    @patch('requests.post')
+    @patch('src.util.teardown_manager')
+    def test_stop_all_containers_scope(self, manager):
+        # only sawtooth containers unless every container is asked for
+        stop_all_containers()
+        manager.return_value.teardown.assert_called_with(None, everything=False)
+        stop_all_containers('first')
+        manager.return_value.teardown.assert_called_with('first', everything=False)
+        stop_all_containers(everything=True)
+        manager.return_value.teardown.assert_called_with(None, everything=True)
+
+    def test_wait_for_genesis_timeout(self):
+        # a peer that never gets the genesis block (ex: its validator crashed)
+        peer = Mock()
+        peer.chain_head.return_value.wait_for_height.side_effect = lambda height, timeout: time.sleep(timeout)
+        start = time.time()
+        with self.assertRaises(TimeoutError):
+            wait_for_genesis(peer, timeout=0.2)
+        self.assertLess(time.time() - start, 1)
+
+    @patch('src.util.wait_for_genesis', side_effect=TimeoutError("no genesis"))
+    def test_committee_without_genesis(self, _):
+        # the committee is given up and its containers go back to the pool
+        pool = Mock()
+        peers = [Mock() for _ in range(4)]
+        pool.acquire.return_value = list(peers)
+        with self.assertRaises(TimeoutError):
+            make_sawtooth_committee(4, pool=pool)
+        pool.release.assert_called_once()
+        self.assertEqual(peers, pool.release.call_args[0][0])
+
+    @patch('requests.Session.post')
     def test_forwarding(self, mock_post):
         # making test app and setting up test envi
         app = create_app()
@@ -149,13 +183,14 @@ class TestUtilMethods(unittest.TestCase):
         app.config[QUORUMS]["a"] = [{API_IP: "192.168.1.200", PORT: "5000", QUORUM_ID: "c"},
                                     {API_IP: "192.168.1.300", PORT: "5000", QUORUM_ID: "d"},
                                     {API_IP: "192.168.1.400", PORT: "5000", QUORUM_ID: "e"}]
+        app.config[ROUTING].set_quorum("a", app.config[QUORUMS]["a"])
         mock_post.return_value = '<Response [200]>'
         forward(app, 'submit/', 'c', TRANSACTION_C_JSON)
         self.assertEqual(2, len(mock_post.call_args))
         self.assertEqual('http://192.168.1.200:5000/submit/', mock_post.call_args[0][0])
         self.assertEqual(TRANSACTION_C_JSON, mock_post.call_args[1]['json'])
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_forwarding_randomness(self, mock_post):
         # making test app and setting up test envi
         app = create_app()
@@ -165,6 +200,7 @@ class TestUtilMethods(unittest.TestCase):
                                     {API_IP: "192.168.1.200", PORT: "5000", QUORUM_ID: "c"},
                                     {API_IP: "192.168.1.300", PORT: "5000", QUORUM_ID: "d"},
                                     {API_IP: "192.168.1.400", PORT: "5000", QUORUM_ID: "e"}]
+        app.config[ROUTING].set_quorum("a", app.config[QUORUMS]["a"])
         mock_post.return_value = '<Response [200]>'
         selected_neighbours = []
         for _ in range(10):
@@ -178,6 +214,106 @@ class TestUtilMethods(unittest.TestCase):
         
         self.assertEqual(len(selected_neighbours), 2)
 
+    @patch('requests.Session.get')
+    @patch('requests.Session.post')
+    def test_forwarding_multi_hop(self, mock_post, mock_get):
+        app = create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        app.config[QUORUMS]["a"] = [{API_IP: "192.168.1.200", PORT: "5000", QUORUM_ID: "c"},
+                                    {API_IP: "192.168.1.300", PORT: "5000", QUORUM_ID: "d"}]
+        app.config[ROUTING].set_quorum("a", app.config[QUORUMS]["a"])
+        mock_post.return_value = '<Response [200]>'
+
+        # f is not a quorum of any neighbour, the intersections are asked for and the request goes to the one in c
+        mock_get.return_value.text = json.dumps([["c", "e"], ["e", "f"]])
+        forward(app, 'submit/', 'f', TRANSACTION_C_JSON)
+        self.assertEqual('http://192.168.1.200:5000/submit/', mock_post.call_args[0][0])
+        self.assertEqual('1', mock_post.call_args[1]['headers'][HOPS_HEADER])
+        self.assertEqual(3, app.config[ROUTING].hops('f'))
+
+        # a quorum that can not be found is not looked for again right away
+        mock_get.reset_mock()
+        with self.assertRaises(IndexError):
+            forward(app, 'submit/', 'g', TRANSACTION_C_JSON)
+        self.assertEqual(2, mock_get.call_count)  # one per neighbour
+        self.assertEqual({'visited': '192.168.1.200:5000,192.168.1.300:5000'}, mock_get.call_args[1]['params'])
+        with self.assertRaises(IndexError):
+            forward(app, 'submit/', 'g', TRANSACTION_C_JSON)
+        self.assertEqual(2, mock_get.call_count)
+
+        # a request that already went through too many peers is dropped
+        mock_post.reset_mock()
+        self.assertIn("ERROR", forward(app, 'submit/', 'f', TRANSACTION_C_JSON, hops=8))
+        mock_post.assert_not_called()
+
+    @patch('requests.Session.post')
+    def test_forwarding_failover(self, mock_post):
+        app = create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        app.config[QUORUMS]["a"] = [{API_IP: "192.168.1.100", PORT: "5000", QUORUM_ID: "c"},
+                                    {API_IP: "192.168.1.200", PORT: "5000", QUORUM_ID: "c"}]
+        app.config[ROUTING].set_quorum("a", app.config[QUORUMS]["a"])
+
+        def post(url, **kwargs):
+            if url.startswith('http://192.168.1.200'):
+                raise requests.exceptions.ConnectTimeout(url)
+            return Mock(text=ROUTE_EXECUTED_CORRECTLY, spec=['text'])
+
+        # every request gets through, the neighbour that is down is skipped once its breaker opens
+        mock_post.side_effect = post
+        for _ in range(10):
+            self.assertEqual(ROUTE_EXECUTED_CORRECTLY, forward(app, 'submit/', 'c', TRANSACTION_C_JSON))
+        self.assertEqual('http://192.168.1.100:5000/submit/', mock_post.call_args[0][0])
+
+        mock_post.side_effect = requests.exceptions.ConnectionError
+        self.assertIn("ERROR", forward(app, 'submit/', 'c', TRANSACTION_C_JSON))
+
+    @patch('requests.Session.post')
+    def test_forwarding_read_timeout_is_not_retried(self, mock_post):
+        app = create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        app.config[QUORUMS]["a"] = [{API_IP: "192.168.1.100", PORT: "5000", QUORUM_ID: "c"},
+                                    {API_IP: "192.168.1.200", PORT: "5000", QUORUM_ID: "c"}]
+        app.config[ROUTING].set_quorum("a", app.config[QUORUMS]["a"])
+
+        # the neighbour may have applied the submit before timing out, sending it to the other one could apply it twice
+        mock_post.side_effect = requests.exceptions.ReadTimeout
+        self.assertIn("ERROR", forward(app, 'submit/', 'c', TRANSACTION_C_JSON))
+        self.assertEqual(1, mock_post.call_count)
+        self.assertEqual(1, sum(b['failures'] for b in app.config[BREAKERS].stats().values()))
+
+    @patch('requests.Session.post')
+    def test_forwarding_full_pool_is_not_a_failure(self, mock_post):
+        app = create_app()
+        app.config['TESTING'] = True
+        app.config['DEBUG'] = False
+        app.config[SESSIONS] = NeighbourSessions(pool_size=1, acquire_timeout=0.05)
+        app.config[QUORUMS]["a"] = [{API_IP: "192.168.1.100", PORT: "5000", QUORUM_ID: "c"}]
+        app.config[ROUTING].set_quorum("a", app.config[QUORUMS]["a"])
+
+        # one forward holds the only connection to the neighbour
+        answer = threading.Event()
+        mock_post.side_effect = lambda *args, **kwargs: answer.wait(5) and Mock(text="done", spec=['text'])
+        held = threading.Thread(target=forward, args=(app, 'submit/', 'c', TRANSACTION_C_JSON))
+        held.start()
+        while mock_post.call_count == 0:
+            time.sleep(0.01)
+
+        # the full pool is on this side, the neighbour is not to blame for it
+        for _ in range(5):
+            self.assertIn("ERROR", forward(app, 'submit/', 'c', TRANSACTION_C_JSON))
+        self.assertEqual(1, mock_post.call_count)
+        self.assertEqual({'state': 'closed', 'failures': 0, 'trips': 0},
+                         app.config[BREAKERS].stats()['192.168.1.100:5000'])
+        self.assertEqual(0, app.config[SELECTOR].stats()['192.168.1.100:5000']['failures'])
+
+        answer.set()
+        held.join()
+        self.assertEqual("done", forward(app, 'submit/', 'c', TRANSACTION_C_JSON))
+
     def test_intersecting_committees_on_host(self):
         peers = make_intersecting_committees_on_host(5, 1)
         for p in peers:
@@ -201,7 +337,7 @@ class TestUtilMethods(unittest.TestCase):
             url = "http://localhost:{port}/submit/".format(port=peers[submit_to].port)
             result = requests.post(url, json=tx.to_json())
 
-            self.assertEqual(ROUTE_EXECUTED_CORRECTLY, get_plain_text(result))
+            self.assertEqual(ROUTE_EXECUTED_CORRECTLY, json.loads(get_plain_text(result))[TRANSACTION_STATUS])
             time.sleep(3)  # wait for network to confirm
 
             # get peers in committee
@@ -237,7 +373,7 @@ class TestUtilMethods(unittest.TestCase):
         url = "http://localhost:{port}/submit/".format(port=peers[submit_to].port)
         result = requests.post(url, json=tx.to_json())
 
-        self.assertEqual(ROUTE_EXECUTED_CORRECTLY, get_plain_text(result))
+        self.assertEqual(ROUTE_EXECUTED_CORRECTLY, json.loads(get_plain_text(result))[TRANSACTION_STATUS])
         time.sleep(3)  # wait for network to confirm
 
         # get peers in committee